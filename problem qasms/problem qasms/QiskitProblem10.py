@@ -1,12 +1,24 @@
+import contextlib
 import numpy as np
 import subprocess
 import tempfile
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from qiskit import QuantumCircuit, qasm2
-from qiskit.quantum_info import Operator
 from qiskit.compiler import transpile
-from qiskit.circuit.library import UnitaryGate
-from scipy.linalg import cossin
+from qiskit.circuit.library import CXGate, UnitaryGate
+from qiskit.quantum_info import Operator
+from qiskit.synthesis import OneQubitEulerDecomposer, TwoQubitBasisDecomposer
+from scipy.linalg import cossin, schur
+from gridsynth_cache import GridSynthCache, default_cache_path
+from clifford_t_db import default_db_path, open_database
+from exact_synthesis import exact_synthesis
+from instrument import count, recording, span, stage
+from error_budget import PrecisionCurves, allocate_bits, fidelity_budget, rz_error, with_bits
+from tensor_sim import circuit_gates, simulate_gates, trace_fidelity
+from normal_form import SINGLE_QUBIT_GATES, compress_circuit, normal_form_gates
+from phase_folding import fold_phases
 U = np.array([
     [0.1448081895 + 0.1752383997j, -0.5189281551 - 0.5242425896j, 
      -0.1495585824 + 0.312754999j, 0.1691348143 - 0.5053863118j],
@@ -27,90 +39,182 @@ def matrix_to_su2(U_2x2):
     return SU, global_phase
 
 
-def su2_to_axis_angle(SU_matrix):
+_zyz = OneQubitEulerDecomposer('ZYZ')
+
+
+def zyz_angles(U_2x2):
     """
-    Convert SU(2) matrix to axis-angle representation for GridSynth
-    SU(2) = exp(i * theta/2 * (n_x*X + n_y*Y + n_z*Z))
+    (a, b, c) with U_2x2 = e^{i phase} Rz(a) Ry(b) Rz(c).
+
+    GridSynth approximates Rz rotations only, so a general single-qubit
+    block is three Rz syntheses with Ry(b) = S H Rz(b) H S^dag.
     """
-    # Extract the rotation axis and angle
-    # SU(2) = [[a, -b*], [b, a*]] where |a|^2 + |b|^2 = 1
-    
-    a = SU_matrix[0, 0]
-    b = SU_matrix[1, 0]
-    
-    # Angle of rotation
-    theta = 2 * np.arctan2(np.abs(b), np.abs(a))
-    
-    # If theta is very small, it's essentially identity
-    if theta < 1e-10:
-        return 0, 0, 0, 0
-    
-    # Rotation axis (Bloch sphere coordinates)
-    # This is a simplified conversion - GridSynth expects specific format
-    
-    # For GridSynth, we need to express as rotation around axis
-    # Let's use the trace formula: Tr(U) = 2*cos(theta/2)
-    trace = np.trace(SU_matrix)
-    theta = 2 * np.arccos(np.real(trace) / 2)
-    
-    if abs(theta) < 1e-10:
-        return 0, 0, 0, 0
-    
-    # Extract axis from the anti-hermitian part
-    U_minus_Udag = SU_matrix - SU_matrix.conj().T
-    
-    nx = np.imag(U_minus_Udag[0, 1])
-    ny = np.real(U_minus_Udag[0, 1])  
-    nz = np.imag(U_minus_Udag[0, 0])
-    
-    # Normalize
-    norm = np.sqrt(nx**2 + ny**2 + nz**2)
-    if norm > 1e-10:
-        nx, ny, nz = nx/norm, ny/norm, nz/norm
-    
-    return theta, nx, ny, nz
+    theta, phi, lam = _zyz.angles(U_2x2)
+    return phi, theta, lam
+
+
+# Command-line formats to try, in order; the angle is appended last
+GRIDSYNTH_FLAGS = [
+    ['-b', '10', '-p'],
+    [],
+    ['-p'],
+]
+
+_gridsynth_cache = None
+
+
+def get_gridsynth_cache():
+    """Shared on-disk GridSynth cache, or None if $GRIDSYNTH_CACHE is empty"""
+    global _gridsynth_cache
+    if _gridsynth_cache is None and default_cache_path():
+        _gridsynth_cache = GridSynthCache()
+    return _gridsynth_cache
+
+
+_gridsynth_flags = None
+
+
+def detect_gridsynth_flags(timeout=10):
+    """
+    Probe GRIDSYNTH_FLAGS once and remember the first format that works.
+
+    Returns the flag list, or None if gridsynth is unavailable.
+    """
+    global _gridsynth_flags
+    if _gridsynth_flags is None:
+        _gridsynth_flags = False
+        for flags in GRIDSYNTH_FLAGS:
+            try:
+                result = subprocess.run(
+                    ['gridsynth'] + flags + ['0.5'],
+                    capture_output=True,
+                    text=True,
+                    timeout=timeout
+                )
+            except Exception:
+                continue
+            if result.returncode == 0:
+                _gridsynth_flags = flags
+                break
+    return _gridsynth_flags if _gridsynth_flags is not False else None
+
+
+def _run_gridsynth(flags, theta, timeout, running, lock):
+    """Run one gridsynth job, killing it on timeout; returns stdout or None"""
+    count('gridsynth.subprocesses')
+    proc = subprocess.Popen(
+        ['gridsynth'] + flags + [str(theta)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    with lock:
+        running.add(proc)
+    try:
+        with span('gridsynth', theta=theta):
+            stdout, _ = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        count('gridsynth.timeouts')
+        proc.kill()
+        proc.wait()
+        proc.stdout.close()
+        proc.stderr.close()
+        return None
+    finally:
+        with lock:
+            running.discard(proc)
+    return stdout.strip() if proc.returncode == 0 else None
+
+
+def call_gridsynth_batch(jobs, precision=1e-10, cache=None, max_workers=None, timeout=10, bits=None):
+    """
+    Synthesize many rotations concurrently.
+
+    jobs is a list of (theta, nx, ny, nz).  Cached angles are answered
+    without a subprocess; the remaining distinct angles run on a bounded
+    pool of at most max_workers (default: CPU count) gridsynth processes,
+    each killed after timeout seconds.  Interrupting the batch cancels
+    pending jobs and kills running ones.  bits optionally gives each job
+    its own -b precision in place of the default.
 
+    Returns a gate list (or None on failure) per job.
+    """
+    if cache is None:
+        cache = get_gridsynth_cache()
+    if bits is None:
+        bits = [None] * len(jobs)
+
+    outputs = {}
+    pending = []
+    for (theta, nx, ny, nz), b in zip(jobs, bits):
+        print(f"   Calling GridSynth: theta={theta:.6f}, axis=({nx:.3f}, {ny:.3f}, {nz:.3f})")
+        if (theta, b) in outputs or (theta, b) in pending:
+            continue
+        flag_sets = GRIDSYNTH_FLAGS if b is None else [
+            f for f in (with_bits(f, b) for f in GRIDSYNTH_FLAGS) if f is not None
+        ]
+        hit = cache.get_any(theta, precision, flag_sets) if cache is not None else None
+        if hit is not None:
+            count('gridsynth.cache_hits')
+            outputs[theta, b] = hit[1]
+            print(f"   GridSynth cache hit: {hit[1][:100]}...")
+        else:
+            count('gridsynth.cache_misses')
+            pending.append((theta, b))
+
+    flags = detect_gridsynth_flags() if pending else None
+    if flags is not None:
+        running = set()
+        lock = threading.Lock()
+        workers = min(len(pending), max_workers or os.cpu_count() or 1)
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = {}
+            for theta, b in pending:
+                # without a -b format the precision cannot be chosen
+                job_flags = flags if b is None else with_bits(flags, b) or flags
+                future = executor.submit(_run_gridsynth, job_flags, theta, timeout, running, lock)
+                futures[future] = (theta, b, job_flags)
+            for future in as_completed(futures):
+                theta, b, job_flags = futures[future]
+                output = future.result()
+                if output is None:
+                    continue
+                print(f"   GridSynth output: {output[:100]}...")
+                outputs[theta, b] = output
+                if cache is not None:
+                    cache.put(theta, precision, job_flags, output)
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            with lock:
+                for proc in running:
+                    proc.kill()
+            raise
+        executor.shutdown()
+
+    results = []
+    for (theta, _, _, _), b in zip(jobs, bits):
+        if (theta, b) in outputs:
+            results.append(parse_gridsynth_output(outputs[theta, b]))
+        else:
+            print(f"   ✗ GridSynth call failed")
+            results.append(None)
+    return results
 
-def call_gridsynth(theta, nx, ny, nz, precision=1e-10):
+
+def call_gridsynth(theta, nx, ny, nz, precision=1e-10, cache=None):
     """
     Call gridsynth command line tool
     
     GridSynth typical usage:
     gridsynth -b 10 -p angle
     
-    where angle is the rotation angle
+    where angle is the rotation angle. The command format is detected once
+    by detect_gridsynth_flags(). Results are looked up in and saved to the
+    on-disk cache (get_gridsynth_cache() unless one is passed in), so
+    repeated angles skip the subprocess entirely.
     """
-    
-    print(f"   Calling GridSynth: theta={theta:.6f}, axis=({nx:.3f}, {ny:.3f}, {nz:.3f})")
-    
-    # GridSynth usually takes angle as input
-    # Try different command formats:
-    
-    commands_to_try = [
-        ['gridsynth', '-b', '10', '-p', str(theta)],
-        ['gridsynth', str(theta)],
-        ['gridsynth', '-p', str(theta)],
-    ]
-    
-    for cmd in commands_to_try:
-        try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            if result.returncode == 0:
-                output = result.stdout.strip()
-                print(f"   GridSynth output: {output[:100]}...")
-                return parse_gridsynth_output(output)
-            
-        except Exception as e:
-            continue
-    
-    print(f"   ✗ GridSynth call failed")
-    return None
+    return call_gridsynth_batch([(theta, nx, ny, nz)], precision, cache)[0]
 
 
 def parse_gridsynth_output(output):
@@ -153,156 +257,550 @@ def parse_gridsynth_output(output):
     return gates
 
 
-def decompose_single_qubit_with_gridsynth(U_2x2, label=""):
-    """
-    Decompose a single-qubit unitary using GridSynth CLI
-    """
-    print(f"\n   Decomposing {label}...")
-    
-    # Convert to SU(2)
-    SU, global_phase = matrix_to_su2(U_2x2)
-    
-    # Convert to axis-angle
-    theta, nx, ny, nz = su2_to_axis_angle(SU)
-    
-    # Call GridSynth
-    gates = call_gridsynth(theta, nx, ny, nz)
-    
-    if gates is None:
-        print(f"   ✗ GridSynth failed, using Qiskit fallback")
-        # Fallback: use Qiskit
-        qc_temp = QuantumCircuit(1)
-        qc_temp.append(UnitaryGate(U_2x2), [0])
-        qc_temp = qc_temp.decompose().decompose()
-        
+def qiskit_fallback_gates(U_2x2, optimization_level=3):
+    """Clifford+T gate names for U_2x2 from a Qiskit transpile"""
+    qc_temp = QuantumCircuit(1)
+    qc_temp.append(UnitaryGate(U_2x2), [0])
+    qc_temp = qc_temp.decompose().decompose()
+    
+    count('qiskit.fallbacks')
+    with span('fallback transpile', level=optimization_level):
         transpiled = transpile(
             qc_temp,
             basis_gates=['h', 's', 'sdg', 't', 'tdg'],
-            optimization_level=3
+            optimization_level=optimization_level
         )
-        
-        # Extract gates
-        gates = []
-        for instr in transpiled.data:
-            gates.append(instr.operation.name)
-    
-    t_count = gates.count('t') + gates.count('tdg')
-    print(f"   ✓ Got {len(gates)} gates ({t_count} T gates)")
     
+    # Extract gates
+    gates = []
+    for instr in transpiled.data:
+        gates.append(instr.operation.name)
     return gates
 
 
-def compile_with_gridsynth_cli(U_matrix):
+_precision_curves = None
+
+
+def get_precision_curves():
+    """T-count / error curves shared by every allocation in this process"""
+    global _precision_curves
+    if _precision_curves is None:
+        flags = next(f for f in GRIDSYNTH_FLAGS if '-b' in f)
+        _precision_curves = PrecisionCurves(get_gridsynth_cache(), flags, parse_gridsynth_output)
+    return _precision_curves
+
+
+def allocate_precision(jobs, fidelity):
+    """GridSynth bits per job so the rotations together keep the given fidelity"""
+    thetas = [theta for theta, _, _, _ in jobs]
+    budget = fidelity_budget(fidelity)
+    bits, t_pred, e_pred = allocate_bits(thetas, budget, get_precision_curves())
+    if len(bits):
+        print(f"   Error budget {budget:.3e} over {len(jobs)} rotations: "
+              f"{bits.min()}-{bits.max()} bits, predicted T-count {t_pred.sum():.0f}")
+    return [int(b) for b in bits]
+
+
+def decompose_single_qubits_with_gridsynth(blocks, max_workers=None, fidelity=None,
+                                           pipeline='full'):
     """
-    Compile 2-qubit unitary using CS decomposition + GridSynth CLI
+    Decompose several single-qubit unitaries with one concurrent GridSynth batch
+
+    blocks is a list of (label, U_2x2); returns a gate list per block.
+    Blocks that are not exact Clifford+T are split into Rz(a) Ry(b) Rz(c)
+    and the nonzero angles of all blocks go to GridSynth together.  With a
+    target fidelity each rotation gets the precision from allocate_bits
+    instead of the fixed -b 10.  The fast pipeline only looks for exact
+    blocks of low denominator exponent and falls back to a level-1
+    transpile.
     """
-    print("="*80)
-    print("COMPILATION WITH GRIDSYNTH CLI")
-    print("="*80)
-    
-    # Step 1: Cosine-Sine Decomposition
-    print("\n1. Cosine-Sine Decomposition...")
-    (u1, u2), theta, (v1h, v2h) = cossin(U_matrix, p=2, q=2, separate=True)
-    
-    v1 = v1h.T.conj()
-    v2 = v2h.T.conj()
-    
-    print(f"   Decomposed into 4 single-qubit unitaries + {len(theta)} rotations")
-    
-    # Step 2: Decompose each single-qubit unitary with GridSynth
-    print("\n2. Decomposing single-qubit gates with GridSynth...")
-    
-    single_qubits = [
-        ('V1', v1, 0),
-        ('V2', v2, 1),
-        ('U1', u1, 0),
-        ('U2', u2, 1)
-    ]
-    
-    gate_sequences = {}
-    total_t = 0
+    options = PIPELINES[pipeline]
+    jobs = []
+    plans = []
+    for label, U_2x2 in blocks:
+        print(f"\n   Decomposing {label}...")
+        
+        # Blocks over Z[1/sqrt2, i] are synthesized exactly, no subprocess
+        gates = exact_synthesis(U_2x2, max_sde=options['exact_sde'])
+        if gates is not None:
+            count('blocks.exact')
+            print(f"   ✓ Exact Clifford+T block")
+            plans.append([g for g, _ in gates])
+            continue
+        
+        # Time order Rz(c), Ry(b), Rz(a); None marks a GridSynth sequence
+        a, b, c = zyz_angles(U_2x2)
+        plan = []
+        for angle, before, after in ((c, [], []), (b, ['sdg', 'h'], ['h', 's']), (a, [], [])):
+            if abs(angle) < 1e-12:
+                continue
+            plan += before + [len(jobs)] + after
+            jobs.append((angle, 0, 0, 1))
+        plans.append(plan)
     
-    for name, U_2x2, qubit in single_qubits:
-        gates = decompose_single_qubit_with_gridsynth(U_2x2, label=name)
-        gate_sequences[name] = (gates, qubit)
+    # Call GridSynth
+    bits = allocate_precision(jobs, fidelity) if fidelity is not None else None
+    results = call_gridsynth_batch(jobs, max_workers=max_workers, bits=bits) if jobs else []
+    if bits is not None:
+        curves = get_precision_curves()
+        error = 0.0
+        for (theta, _, _, _), b, gates in zip(jobs, bits, results):
+            if gates is not None:
+                curves.measure(theta, b, gates)
+                error += rz_error(gates, theta)
+        mark = "✓" if error <= fidelity_budget(fidelity) else "✗"
+        print(f"   {mark} Summed rotation error {error:.3e} (budget {fidelity_budget(fidelity):.3e})")
+    
+    sequences = []
+    for (label, U_2x2), plan in zip(blocks, plans):
+        parts = [results[g] if isinstance(g, int) else [g] for g in plan]
+        if any(part is None for part in parts):
+            print(f"   ✗ GridSynth failed for {label}, using Qiskit fallback")
+            # Fallback: use Qiskit
+            gates = qiskit_fallback_gates(U_2x2, options['fallback_level'])
+        else:
+            gates = [g for part in parts for g in part]
+        
+        # Canonical T-optimal form of the whole word, in one pass
+        if set(gates) <= SINGLE_QUBIT_GATES:
+            gates = normal_form_gates(gates)
         
         t_count = gates.count('t') + gates.count('tdg')
-        total_t += t_count
-    
-    print(f"\n   Total T-gates from single-qubit: {total_t}")
-    
-    # Step 3: Handle controlled rotations
-    print("\n3. Decomposing controlled rotations...")
-    
-    qc_rot = QuantumCircuit(2)
-    for angle in theta:
-        qc_rot.cry(2*angle, 0, 1)
-    
-    qc_rot_decomposed = qc_rot.decompose().decompose()
-    
-    rot_transpiled = transpile(
-        qc_rot_decomposed,
-        basis_gates=['cx', 'h', 's', 'sdg', 't', 'tdg'],
-        optimization_level=3
-    )
-    
-    rot_ops = rot_transpiled.count_ops()
-    t_rot = rot_ops.get('t', 0) + rot_ops.get('tdg', 0)
-    print(f"   Rotations: {t_rot} T gates, {rot_ops.get('cx', 0)} CNOTs")
-    
-    # Step 4: Build full circuit
-    print("\n4. Building full circuit...")
-    
-    qc = QuantumCircuit(2)
-    
-    # Apply V gates
-    for gate in gate_sequences['V1'][0]:
-        getattr(qc, gate)(0)
-    
-    for gate in gate_sequences['V2'][0]:
-        getattr(qc, gate)(1)
-    
-    # Add rotation circuit
-    qc.compose(rot_transpiled, inplace=True)
-    
-    # Apply U gates
-    for gate in gate_sequences['U1'][0]:
-        getattr(qc, gate)(0)
-    
-    for gate in gate_sequences['U2'][0]:
-        getattr(qc, gate)(1)
-    
-    # Final optimization
-    print("\n5. Final optimization...")
-    final = transpile(
-        qc,
-        basis_gates=['cx', 'h', 's', 'sdg', 't', 'tdg'],
-        optimization_level=3
-    )
+        print(f"   ✓ {label}: got {len(gates)} gates ({t_count} T gates)")
+        sequences.append(gates)
     
+    return sequences
+
+
+def decompose_single_qubit_with_gridsynth(U_2x2, label=""):
+    """
+    Decompose a single-qubit unitary using GridSynth CLI
+    """
+    return decompose_single_qubits_with_gridsynth([(label, U_2x2)])[0]
+
+
+# Generic real weight for combining the Hermitian parts in demultiplex
+_MIX = 0.6180339887498949
+
+
+def demultiplex(A, B):
+    """
+    Split stacks of blocks as diag(A, B) = (I x V)(D + D^dag)(I x W).
+
+    The top qubit selects A or B; V and W act on the qubits below and D is
+    diagonal, so D + D^dag is a multiplexed Rz on the top qubit.  A B^dag =
+    V D^2 V^dag: its Hermitian and anti-Hermitian parts commute, so one
+    batched eigh of a generic mix of them diagonalizes every block at
+    once.  Blocks where that mix is degenerate fall back to a Schur form.
+
+    Returns (V, d, W) with d the diagonal entries of D.
+    """
+    X = A @ B.conj().swapaxes(-1, -2)
+    Xh = X.conj().swapaxes(-1, -2)
+    _, V = np.linalg.eigh((X + Xh) / 2 + _MIX * (X - Xh) / 2j)
+    T = V.conj().swapaxes(-1, -2) @ X @ V
+    d2 = np.diagonal(T, axis1=-2, axis2=-1).copy()
+    off = np.abs(T - d2[..., None] * np.eye(T.shape[-1])).max(axis=(-2, -1))
+    for k in np.flatnonzero(off > 1e-9):
+        T_k, V[k] = schur(X[k], output='complex')
+        d2[k] = np.diag(T_k)
+    d = np.sqrt(d2)
+    W = d[..., :, None] * (V.conj().swapaxes(-1, -2) @ B)
+    return V, d, W
+
+
+def multiplexed_rotation(axis, angles, target, controls):
+    """
+    Gray-code network for a rotation about axis whose angle depends on controls.
+
+    angles[i] is the angle for control value i (bit m of i on controls[m]).
+    Step j rotates by alpha_j and then CNOTs the control where the Gray
+    codes g_j and g_{j+1} differ, so control value b sees
+    sum_j alpha_j (-1)^{b.g_j}; alpha is the inverse Walsh-Hadamard
+    transform of angles.  At most 2^k rotations and 2^k CNOTs, no
+    ancilla; zero alpha_j drop their rotation and merge the CNOTs around it.
+
+    Returns ops (axis, angle, qubit) and ('cx', control, target).
+    """
+    k = len(controls)
+    if k == 0:
+        return [(axis, float(angles[0]), target)]
+    size = 1 << k
+    gray = np.arange(size) ^ (np.arange(size) >> 1)
+    parity = np.bitwise_count(np.arange(size)[:, None] & gray[None, :]) & 1
+    alpha = (1 - 2 * parity.astype(float)).T @ np.asarray(angles) / size
+    ops = []
+    # CNOTs onto one target commute, so those between two rotations
+    # reduce to the controls that occur an odd number of times
+    pending = 0
+    for j in range(size):
+        if abs(alpha[j]) > 1e-12:
+            ops += [('cx', controls[m], target) for m in range(k) if pending >> m & 1]
+            ops.append((axis, float(alpha[j]), target))
+            pending = 0
+        pending ^= int(gray[j] ^ gray[(j + 1) % size])
+    ops += [('cx', controls[m], target) for m in range(k) if pending >> m & 1]
+    return ops
+
+
+_kak = TwoQubitBasisDecomposer(CXGate())
+
+
+def two_qubit_ops(U_4x4):
+    """KAK decomposition of a 2-qubit unitary as ('u', ...) / ('cx', ...) ops"""
+    with span('kak'):
+        qc = _kak(U_4x4)
+    ops = []
+    for instr in qc.data:
+        qubits = [qc.find_bit(q).index for q in instr.qubits]
+        if instr.operation.name == 'cx':
+            ops.append(('cx', *qubits))
+        else:
+            ops.append(('u', Operator(instr.operation).data, qubits[0]))
+    return ops
+
+
+def quantum_shannon_decomposition(U_matrix):
+    """
+    Recursive cosine-sine / Shannon decomposition of an n-qubit unitary.
+
+    U = diag(L1, L2) CS diag(R1, R2) with the top qubit selecting the
+    blocks; CS is a multiplexed Ry on the top qubit and each block-diagonal
+    factor is demultiplexed into two (n-1)-qubit unitaries around a
+    multiplexed Rz.  The tree is processed level by level: the cossin
+    calls of a level run back to back and the demultiplexing of the level
+    is one batched eigendecomposition.  Recursion stops at 2-qubit blocks,
+    which the KAK decomposition writes with at most 3 CNOTs.
+
+    Returns ops in time order: ('u', U_2x2, qubit), ('ry' | 'rz', angle,
+    qubit) and ('cx', control, target), equal to U_matrix up to phase.
+    Targets given to a few digits are first replaced by the nearest
+    unitary, which cossin and KAK both assume.
+    """
+    u, _, vh = np.linalg.svd(np.asarray(U_matrix, dtype=complex))
+    U_matrix = u @ vh
+    n = U_matrix.shape[0].bit_length() - 1
+    # levels[m]: (K, 2^m, 2^m) unitaries on qubits 0..m-1
+    levels = {n: U_matrix[None]}
+    angles = {}
+    for m in range(n, 2, -1):
+        half = 1 << (m - 1)
+        with span('cossin', qubits=m, blocks=len(levels[m])):
+            parts = [cossin(M, p=half, q=half, separate=True) for M in levels[m]]
+        u1, u2 = (np.array([u[i] for u, _, _ in parts]) for i in (0, 1))
+        v1h, v2h = (np.array([v[i] for _, _, v in parts]) for i in (0, 1))
+        theta = np.array([t for _, t, _ in parts])
+        # right factor first in time: diag(v1h, v2h), then CS, then diag(u1, u2)
+        with span('demultiplex', qubits=m):
+            Vr, dr, Wr = demultiplex(v1h, v2h)
+            Vl, dl, Wl = demultiplex(u1, u2)
+        children = np.stack([Wr, Vr, Wl, Vl], axis=1)
+        levels[m - 1] = children.reshape(-1, half, half)
+        # D + D^dag is diag(d, d*) on the top qubit = Rz(-2 arg d)
+        angles[m] = (-2 * np.angle(dr), 2 * theta, -2 * np.angle(dl))
+
+    def emit(m, k):
+        if m == 1:
+            return [('u', levels[1][k], 0)]
+        if m == 2:
+            return two_qubit_ops(levels[2][k])
+        rz_r, ry, rz_l = (a[k] for a in angles[m])
+        controls = list(range(m - 1))
+        return (emit(m - 1, 4 * k)
+                + multiplexed_rotation('rz', rz_r, m - 1, controls)
+                + emit(m - 1, 4 * k + 1)
+                + multiplexed_rotation('ry', ry, m - 1, controls)
+                + emit(m - 1, 4 * k + 2)
+                + multiplexed_rotation('rz', rz_l, m - 1, controls)
+                + emit(m - 1, 4 * k + 3))
+
+    return emit(n, 0)
+
+
+def rotation_matrix(axis, angle):
+    if axis == 'rz':
+        return np.diag([np.exp(-0.5j * angle), np.exp(0.5j * angle)])
+    c, s = np.cos(angle / 2), np.sin(angle / 2)
+    return np.array([[c, -s], [s, c]], dtype=complex)
+
+
+def fuse_single_qubit_blocks(ops):
+    """
+    Multiply consecutive single-qubit ops per qubit into one 2x2 block.
+
+    Returns ('u', U_2x2, qubit) / ('cx', control, target) ops.  Blocks
+    equal to the identity up to phase are dropped, and a CNOT directly
+    following the same CNOT cancels with it.
+    """
+    out = []
+    pending = {}
+    last = {}
+
+    def flush(q):
+        M = pending.pop(q, None)
+        if M is None or abs(abs(np.trace(M)) - 2) < 1e-12:
+            return
+        last[q] = len(out)
+        out.append(('u', M, q))
+
+    for op in ops:
+        if op[0] == 'cx':
+            _, c, t = op
+            flush(c)
+            flush(t)
+            i = last.get(c)
+            if i is not None and i == last.get(t) and out[i] == op:
+                out[i] = None
+                last.pop(c)
+                last.pop(t)
+                continue
+            last[c] = last[t] = len(out)
+            out.append(op)
+            continue
+        M = op[1] if op[0] == 'u' else rotation_matrix(op[0], op[1])
+        q = op[2]
+        pending[q] = M @ pending[q] if q in pending else M
+    for q in list(pending):
+        flush(q)
+    return [op for op in out if op is not None]
+
+
+# Settings per compile pipeline: 'full' finishes with a level-3 transpile,
+# 'fast' with the linear passes of fast_optimize
+PIPELINES = {
+    'full': {'exact_sde': 16, 'fallback_level': 3},
+    'fast': {'exact_sde': 4, 'fallback_level': 1},
+}
+
+# Gates that commute with a CNOT through its control or its target wire
+COMMUTES_ON_CONTROL = {'t', 'tdg', 's', 'sdg', 'z', 'rz', 'p', 'u1', 'id'}
+COMMUTES_ON_TARGET = {'x', 'id'}
+
+# Paulis written in the cx, h, s, sdg, t, tdg basis (time order)
+BASIS_WORDS = {'z': ['s', 's'], 'x': ['h', 's', 's', 'h'], 'y': ['s', 's', 'h', 's', 's', 'h']}
+
+
+def cancel_cnots(gates):
+    """
+    Cancel pairs of equal CNOTs separated only by gates that commute with them.
+
+    On the control wire diagonal gates and CNOTs with the same control
+    commute, on the target wire X and CNOTs with the same target.  Each
+    wire keeps the positions of its surviving gates, so a CNOT looks back
+    past commuting gates to a partner in one pass over the circuit.
+    gates are (name, params, qubits) tuples.
+    """
+    out = []
+    wires = {}
+
+    def look_back(q, gate, role):
+        for k in range(len(wires.get(q, ())) - 1, -1, -1):
+            other = out[wires[q][k]]
+            if other == gate:
+                return k
+            name, _, qubits = other
+            if name == 'cx':
+                if qubits.index(q) != role:
+                    return None
+            elif name not in (COMMUTES_ON_TARGET if role else COMMUTES_ON_CONTROL):
+                return None
+        return None
+
+    for gate in gates:
+        name, _, qubits = gate
+        if name == 'cx':
+            c, t = qubits
+            kc, kt = look_back(c, gate, 0), look_back(t, gate, 1)
+            if kc is not None and kt is not None and wires[c][kc] == wires[t][kt]:
+                out[wires[c][kc]] = None
+                del wires[c][kc], wires[t][kt]
+                continue
+        for q in qubits:
+            wires.setdefault(q, []).append(len(out))
+        out.append(gate)
+    return [gate for gate in out if gate is not None]
+
+
+def to_basis(gates):
+    """Rewrite Pauli gates into the cx, h, s, sdg, t, tdg basis"""
+    out = []
+    for gate in gates:
+        name, _, qubits = gate
+        if name in BASIS_WORDS:
+            out += [(g, (), qubits) for g in BASIS_WORDS[name]]
+        else:
+            out.append(gate)
+    return out
+
+
+def fast_optimize(gates):
+    """
+    Linear-time replacement for the final level-3 transpile.
+
+    Single-qubit runs go to normal form, phases on equal parities are
+    merged, CNOT pairs cancel through commuting gates, and the result is
+    put in the cx, h, s, sdg, t, tdg basis with one more normal-form pass.
+    """
+    gates = compress_circuit(gates)
+    gates = fold_phases(gates)
+    gates = cancel_cnots(gates)
+    return compress_circuit(to_basis(gates))
+
+
+def report_timings(timings):
+    """Print the wall time of each compile stage"""
+    print("\nStage timings:")
+    for stage, seconds in timings.items():
+        print(f"   {stage:<24} {seconds * 1e3:9.1f} ms")
+    print(f"   {'total':<24} {sum(timings.values()) * 1e3:9.1f} ms")
+
+
+def report_circuit(final, U_matrix):
+    """Print gate counts and the fidelity of final against U_matrix; returns them as a dict"""
     ops = final.count_ops()
-    t_total = ops.get('t', 0) + ops.get('tdg', 0)
+    metrics = {
+        't_count': ops.get('t', 0) + ops.get('tdg', 0),
+        'cx_count': ops.get('cx', 0),
+        'depth': final.depth(),
+        'gates': sum(ops.values()),
+    }
     
     print("\n" + "="*80)
     print("FINAL RESULTS")
     print("="*80)
-    print(f"  T-count: {t_total}")
-    print(f"  CNOTs: {ops.get('cx', 0)}")
-    print(f"  Depth: {final.depth()}")
-    print(f"  Total gates: {sum(ops.values())}")
+    print(f"  T-count: {metrics['t_count']}")
+    print(f"  CNOTs: {metrics['cx_count']}")
+    print(f"  Depth: {metrics['depth']}")
+    print(f"  Total gates: {metrics['gates']}")
     
     # Verify
-    print("\n6. Verifying...")
-    compiled_op = Operator(final)
-    target_op = Operator(U_matrix)
-    fidelity = np.abs(np.trace(compiled_op.data.conj().T @ target_op.data)) / 4
-    print(f"   Fidelity: {fidelity:.10f}")
+    print("\nVerifying...")
+    compiled = simulate_gates(circuit_gates(final), final.num_qubits)
+    metrics['fidelity'] = float(trace_fidelity(compiled, np.asarray(U_matrix)))
+    print(f"   Fidelity: {metrics['fidelity']:.10f}")
+    return metrics
+
+
+def compile_with_gridsynth_cli(U_matrix, fidelity=None, pipeline='full', max_workers=None,
+                               report=None):
+    """
+    Compile an n-qubit unitary using Shannon decomposition + GridSynth CLI
+
+    1- and 2-qubit targets over Z[1/sqrt2, i] are synthesized exactly
+    (exact_synthesis.py) or looked up in the Clifford+T database.  Exact
+    synthesis stops at two qubits, so 3+ qubit targets, exactly
+    representable ones like CCZ or Toffoli included, always go through the
+    Shannon decomposition and approximate GridSynth rotations.
+
+    With a target fidelity (e.g. 1 - 1e-6) the GridSynth precision of each
+    rotation comes from the error-budget allocator.  pipeline='fast'
+    replaces every level-3 transpile with fast_optimize and direct
+    circuit construction; see PIPELINES.  max_workers bounds the
+    concurrent gridsynth processes.  If report is a dict it receives the
+    report_circuit metrics and the stage timings.
+    """
+    if report is None:
+        report = {}
+    U_matrix = np.asarray(U_matrix, dtype=complex)
+    n = U_matrix.shape[0].bit_length() - 1
+    timings = {}
+    print("="*80)
+    print(f"COMPILATION WITH GRIDSYNTH CLI ({n} qubits, {pipeline} pipeline)")
+    print("="*80)
+    
+    # Step 0: exactly representable 1- and 2-qubit targets skip CSD, GridSynth
+    # and transpile; 2-qubit ones come T- and CNOT-optimal from the database
+    # if it is built.  Larger targets have no exact path yet
+    exact = None
+    if n == 2 and os.path.exists(default_db_path()):
+        with stage(timings, 'database lookup'):
+            found = open_database().lookup(U_matrix)
+        if found is not None:
+            print(f"\n0. Found in the Clifford+T database: T={found['t_count']}, CX={found['cx_count']}")
+            exact = found['gates']
+    if exact is None and n <= 2:
+        with stage(timings, 'exact synthesis'):
+            exact = exact_synthesis(U_matrix, max_sde=PIPELINES[pipeline]['exact_sde'])
+        if exact is not None:
+            print("\n0. Target is over Z[1/√2, i]: exact synthesis")
+    if exact is not None:
+        final = QuantumCircuit(n)
+        for g in exact:
+            getattr(final, g[0])(*g[1:])
+        with stage(timings, 'verification'):
+            report.update(report_circuit(final, U_matrix), timings=timings)
+        report_timings(timings)
+        return final
+    
+    # Step 1: Recursive cosine-sine / Shannon decomposition
+    print("\n1. Quantum Shannon decomposition...")
+    with stage(timings, 'shannon decomposition', qubits=n):
+        ops = fuse_single_qubit_blocks(quantum_shannon_decomposition(U_matrix))
+    blocks = [op for op in ops if op[0] == 'u']
+    count('blocks', len(blocks))
+    print(f"   Decomposed into {len(blocks)} single-qubit blocks + "
+          f"{len(ops) - len(blocks)} CNOTs")
+    
+    # Step 2: every single-qubit block, multiplexor rotations included, in
+    # one GridSynth batch
+    print("\n2. Decomposing single-qubit blocks with GridSynth...")
+    with stage(timings, 'single-qubit synthesis', blocks=len(blocks)):
+        sequences = iter(decompose_single_qubits_with_gridsynth(
+            [(f"block {i} (q{q})", M) for i, (_, M, q) in enumerate(blocks)],
+            max_workers=max_workers, fidelity=fidelity, pipeline=pipeline
+        ))
+    
+    # Step 3: Build full circuit
+    print("\n3. Building full circuit...")
+    with stage(timings, 'circuit assembly'):
+        gates = []
+        for op in ops:
+            if op[0] == 'cx':
+                gates.append(('cx', (), (op[1], op[2])))
+            else:
+                gates += [(g, (), (op[2],)) for g in next(sequences)]
+    count('gates.emitted', len(gates))
+    count('t_count.before_optimization', sum(1 for g in gates if g[0] in ('t', 'tdg')))
+
+    # Final optimization
+    print("\n4. Final optimization...")
+    with stage(timings, 'final optimization', pipeline=pipeline):
+        if pipeline == 'fast':
+            gates = fast_optimize(gates)
+        final = QuantumCircuit(n)
+        for name, _, qubits in gates:
+            getattr(final, name)(*qubits)
+        if pipeline == 'full':
+            final = transpile(
+                final,
+                basis_gates=['cx', 'h', 's', 'sdg', 't', 'tdg'],
+                optimization_level=3
+            )
+
+    with stage(timings, 'verification'):
+        report.update(report_circuit(final, U_matrix), timings=timings)
+    count('t_count.after_optimization', report['t_count'])
+    report_timings(timings)
     
     return final
 
 
 # Main execution
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile U with the GridSynth CLI")
+    parser.add_argument('--fidelity', type=float,
+                        help="target fidelity; splits the error budget over the rotations "
+                             "instead of using -b 10 for each")
+    parser.add_argument('--pipeline', choices=sorted(PIPELINES), default='full',
+                        help="'fast' skips the level-3 transpiles for linear passes")
+    parser.add_argument('--trace', help="write stage spans and counters to this JSON file "
+                                        "plus a Chrome trace next to it")
+    args = parser.parse_args()
+    if args.fidelity is not None and not 0 < args.fidelity < 1:
+        parser.error("--fidelity must lie in (0, 1); no finite precision reaches fidelity 1")
+
     print("="*80)
     print("TESTING GRIDSYNTH CLI")
     print("="*80)
@@ -323,7 +821,9 @@ if __name__ == "__main__":
     print("COMPILING RANDOM UNITARY")
     print("="*80)
     
-    circuit = compile_with_gridsynth_cli(U)
+    # without --trace, $PIPELINE_TRACE (see instrument.py) still records the run
+    with recording(args.trace) if args.trace else contextlib.nullcontext():
+        circuit = compile_with_gridsynth_cli(U, fidelity=args.fidelity, pipeline=args.pipeline)
     
     if circuit:
         # Save result
@@ -0,0 +1,292 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import numpy as np
+from instrument import recording, span
+
+
+TARGET_SUFFIXES = ('.npy', '.npz', '.json')
+# Pauli programs up to this many qubits are verified on the full unitary,
+# larger ones on random states
+MAX_DENSE_PAULI_QUBITS = 10
+PAULI_SAMPLES = 16
+
+
+def find_targets(paths, exclude=()):
+    """
+    Target files under the given paths, in a stable order.
+
+    A directory contributes every .npy / .npz / .json file below it,
+    except inside or at the exclude paths (the tool's own output, metrics
+    and traces); a .txt manifest lists one path per line (relative to the
+    manifest, '#' starts a comment); anything else is taken as a target
+    file.  A file reached twice is listed once.
+    """
+    found = []
+    seen = set()
+    excluded = {os.path.realpath(p) for p in exclude if p}
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs[:] = sorted(d for d in dirs
+                                 if os.path.realpath(os.path.join(root, d)) not in excluded)
+                found += [os.path.join(root, f) for f in sorted(files)
+                          if f.endswith(TARGET_SUFFIXES)
+                          and os.path.realpath(os.path.join(root, f)) not in excluded]
+        elif path.endswith('.txt'):
+            base = os.path.dirname(path)
+            with open(path) as f:
+                lines = [line.split('#', 1)[0].strip() for line in f]
+            found += find_targets([os.path.join(base, line) for line in lines if line], exclude)
+        else:
+            found.append(path)
+    unique = []
+    for path in found:
+        key = os.path.realpath(path)
+        if key not in seen:
+            seen.add(key)
+            unique.append(path)
+    return unique
+
+
+def json_matrix(data):
+    """Complex matrix from nested lists of numbers or [re, im] pairs"""
+    M = np.asarray(data, dtype=float)
+    if M.ndim == 3 and M.shape[-1] == 2:
+        return M[..., 0] + 1j * M[..., 1]
+    return M.astype(complex)
+
+
+def load_targets(path):
+    """
+    (name, kind, data) for every target in a file.
+
+    kind 'unitary' carries a 2^n x 2^n matrix: a .npy array, each array of
+    a .npz, or a JSON matrix (a list of rows, or an object with a
+    'unitary' or 'real' / 'imag' entry).  kind 'pauli' carries (n, terms)
+    for a Pauli-rotation program like challenge12.json.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if path.endswith('.npy'):
+        return [(stem, 'unitary', np.load(path))]
+    if path.endswith('.npz'):
+        with np.load(path) as archive:
+            return [(f"{stem}_{key}", 'unitary', archive[key]) for key in archive.files]
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict) and 'terms' in data:
+        from pauli_program import load_pauli_program
+        return [(stem, 'pauli', load_pauli_program(path))]
+    if isinstance(data, dict) and 'unitary' in data:
+        return [(stem, 'unitary', json_matrix(data['unitary']))]
+    if isinstance(data, dict) and 'real' in data and 'imag' in data:
+        return [(stem, 'unitary', np.asarray(data['real']) + 1j * np.asarray(data['imag']))]
+    if isinstance(data, dict):
+        raise ValueError(f"{path} is not a target: expected 'terms', 'unitary' or 'real' / 'imag'")
+    return [(stem, 'unitary', json_matrix(data))]
+
+
+def compile_unitary(U, options):
+    """(qasm_text, metrics) for a target matrix via QiskitProblem10.py"""
+    from qiskit import qasm2
+    from QiskitProblem10 import compile_with_gridsynth_cli
+    U = np.asarray(U, dtype=complex)
+    if U.ndim != 2 or U.shape[0] != U.shape[1] or U.shape[0] & (U.shape[0] - 1):
+        raise ValueError(f"target of shape {U.shape} is not a qubit unitary")
+    report = {}
+    circuit = compile_with_gridsynth_cli(U, options['fidelity'], options['pipeline'],
+                                         options['gridsynth_workers'], report)
+    report['qubits'] = circuit.num_qubits
+    return qasm2.dumps(circuit), report
+
+
+def compile_pauli(program):
+    """(qasm_text, metrics) for a Pauli-rotation program via pauli_compiler.py"""
+    from pauli_compiler import compile_pauli_rotations, gates_to_qasm
+    from tensor_sim import pauli_program_residual, sampled_pauli_fidelity, simulate_gates
+    n, terms = program
+    with span('pauli compile', qubits=n, terms=len(terms)):
+        gates = compile_pauli_rotations(n, terms)
+    circuit = [(name, (), qubits) for name, qubits in gates]
+    with span('verification'):
+        if n <= MAX_DENSE_PAULI_QUBITS:
+            W = pauli_program_residual(simulate_gates(circuit, n), n, terms)
+            fidelity = abs(np.trace(W)) / W.shape[0]
+        else:
+            fidelity = sampled_pauli_fidelity(circuit, n, terms, PAULI_SAMPLES)
+    levels = [0] * n
+    for _, qubits in gates:
+        level = max(levels[q] for q in qubits) + 1
+        for q in qubits:
+            levels[q] = level
+    metrics = {
+        'qubits': n,
+        't_count': sum(1 for name, _ in gates if name in ('t', 'tdg')),
+        'cx_count': sum(1 for name, _ in gates if name == 'cx'),
+        'depth': max(levels, default=0),
+        'gates': len(gates),
+        'fidelity': float(fidelity),
+    }
+    return gates_to_qasm(gates, n), metrics
+
+
+def compile_target(name, kind, data, output_dir, options):
+    """
+    Compile one target and write <output_dir>/<name>.qasm.
+
+    Everything the compilers print is swallowed; failures are reported in
+    the returned metrics instead of raised, so one bad target does not
+    stop a batch.  kind 'invalid' carries the error of a file that could
+    not be loaded.  With options['trace_dir'] set, the compile is recorded
+    to <trace_dir>/<name>.json and a Chrome trace, and its counters are
+    added to the metrics.
+    """
+    start = time.perf_counter()
+    metrics = {'name': name, 'kind': kind}
+    trace = options.get('trace_dir') and os.path.join(options['trace_dir'], name + '.json')
+    try:
+        tracing = recording(trace) if trace else contextlib.nullcontext()
+        with contextlib.redirect_stdout(io.StringIO()), tracing as recorder:
+            if kind == 'invalid':
+                raise ValueError(data)
+            if kind == 'pauli':
+                text, report = compile_pauli(data)
+            else:
+                text, report = compile_unitary(data, options)
+        path = os.path.join(output_dir, name + '.qasm')
+        with open(path, 'w') as f:
+            f.write(text)
+        metrics.update(report, qasm=path)
+        if trace:
+            metrics.update(counters=recorder.counters, trace=trace)
+    except Exception as e:
+        metrics['error'] = f"{type(e).__name__}: {e}"
+    metrics['seconds'] = time.perf_counter() - start
+    return metrics
+
+
+def _warm_worker():
+    # Pay the Qiskit / scipy import once per worker, not once per target
+    import QiskitProblem10  # noqa: F401
+    import pauli_compiler  # noqa: F401
+
+
+def run_batch(targets, output_dir, options, workers=None):
+    """
+    Compile (source, name, kind, data) targets on one pool of warm workers.
+
+    Workers import the compilers once and share the on-disk GridSynth
+    cache, so per-target overhead is the compile itself.  At most 2
+    targets per worker are in flight; with workers=1 everything runs in
+    this process.  Returns the metrics in target order.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    results = [None] * len(targets)
+
+    def record(i, metrics):
+        metrics['source'] = targets[i][0]
+        results[i] = metrics
+        status = f"✗ {metrics['error']}" if 'error' in metrics else (
+            f"✓ T={metrics['t_count']} CX={metrics['cx_count']} "
+            f"F={metrics['fidelity']:.8f}")
+        print(f"  [{sum(r is not None for r in results)}/{len(targets)}] "
+              f"{metrics['name']}: {status} ({metrics['seconds']:.2f} s)", flush=True)
+
+    if workers == 1:
+        for i, (_, name, kind, data) in enumerate(targets):
+            record(i, compile_target(name, kind, data, output_dir, options))
+        return results
+
+    pending = {}
+    queue = iter(enumerate(targets))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker) as executor:
+        while True:
+            while len(pending) < 2 * workers:
+                item = next(queue, None)
+                if item is None:
+                    break
+                i, (_, name, kind, data) = item
+                pending[executor.submit(compile_target, name, kind, data, output_dir, options)] = i
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                record(pending.pop(future), future.result())
+    return results
+
+
+def summarize(results):
+    ok = [r for r in results if 'error' not in r]
+    return {
+        'targets': len(results),
+        'compiled': len(ok),
+        'failed': len(results) - len(ok),
+        't_count': sum(r['t_count'] for r in ok),
+        'cx_count': sum(r['cx_count'] for r in ok),
+        'min_fidelity': min((r['fidelity'] for r in ok), default=None),
+        'seconds': sum(r['seconds'] for r in results),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile directories of target unitaries and Pauli programs to QASM")
+    parser.add_argument('inputs', nargs='+', help="target files, directories or .txt manifests")
+    parser.add_argument('-o', '--output-dir', default='compiled', help="QASM output directory")
+    parser.add_argument('--metrics', help="metrics JSON (default: <output-dir>/metrics.json)")
+    parser.add_argument('--workers', type=int, help="worker processes (default: all cores)")
+    parser.add_argument('--pipeline', choices=['fast', 'full'], default='fast')
+    parser.add_argument('--fidelity', type=float, help="target fidelity for the GridSynth error budget")
+    parser.add_argument('--trace-dir', help="record spans and counters per target here (JSON + Chrome trace)")
+    args = parser.parse_args()
+
+    workers = args.workers or os.cpu_count() or 1
+    options = {
+        'pipeline': args.pipeline,
+        'fidelity': args.fidelity,
+        # gridsynth processes per compile, so workers do not oversubscribe the cores
+        'gridsynth_workers': max(1, (os.cpu_count() or 1) // workers),
+        'trace_dir': args.trace_dir,
+    }
+    if args.trace_dir:
+        os.makedirs(args.trace_dir, exist_ok=True)
+    metrics_path = args.metrics or os.path.join(args.output_dir, 'metrics.json')
+    targets = []
+    names = set()
+    for path in find_targets(args.inputs, exclude=(args.output_dir, metrics_path, args.trace_dir)):
+        try:
+            loaded = load_targets(path)
+        except (OSError, ValueError, KeyError) as e:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            loaded = [(stem, 'invalid', f"cannot load {path}: {e}")]
+        for name, kind, data in loaded:
+            unique, k = name, 1
+            while unique in names:
+                k += 1
+                unique = f"{name}_{k}"
+            names.add(unique)
+            targets.append((path, unique, kind, data))
+
+    print("=" * 80)
+    print(f"BATCH COMPILE: {len(targets)} targets, {workers} workers, {args.pipeline} pipeline")
+    print("=" * 80)
+    start = time.perf_counter()
+    results = run_batch(targets, args.output_dir, options, workers)
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(results)
+    summary['wall_seconds'] = elapsed
+    with open(metrics_path, 'w') as f:
+        json.dump({'options': options, 'summary': summary, 'targets': results}, f, indent=2)
+
+    print(f"\n{'✓' if not summary['failed'] else '✗'} {summary['compiled']}/{summary['targets']} "
+          f"compiled in {elapsed:.2f} s; total T-count {summary['t_count']}, "
+          f"CNOTs {summary['cx_count']}")
+    print(f"  Metrics: {metrics_path}")
+    sys.exit(1 if summary['failed'] else 0)
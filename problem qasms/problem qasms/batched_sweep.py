@@ -0,0 +1,67 @@
+import numpy as np
+from two_qubit_words import SINGLE_QUBIT_MATRICES, CX_01, CX_10
+
+
+CX_MATRICES = {'cx_01': CX_01, 'cx_10': CX_10}
+
+
+def sequence_matrices(gates, depth):
+    """
+    2x2 matrices of every sequence in itertools.product(gates, repeat=depth).
+
+    Returned as an (len(gates)**depth, 2, 2) stack in the same order as
+    itertools.product, each sequence applied left to right.  Each prefix
+    product is computed once and extended by one einsum per level.
+    """
+    G = np.array([SINGLE_QUBIT_MATRICES[g] for g in gates])
+    mats = np.eye(2, dtype=complex)[None]
+    for _ in range(depth):
+        # index n * len(gates) + g, so the last gate varies fastest
+        mats = np.einsum('gij,njk->ngik', G, mats).reshape(-1, 2, 2)
+    return mats
+
+
+def pattern_unitary(cx_seq):
+    """4x4 unitary of a list like ['cx_01', 'cx_10'] applied left to right"""
+    U = np.eye(4, dtype=complex)
+    for g in cx_seq:
+        U = CX_MATRICES[g] @ U
+    return U
+
+
+def sweep_matches(target, gates, depth, cx_patterns, tol=0.01, rtol=1e-5,
+                  chunk_size=1 << 18, rows=None):
+    """
+    Test every (seq_q0, seq_q1, cx_seq) circuit against target in batches.
+
+    The circuit is seq_q0 on q[0] and seq_q1 on q[1] followed by cx_seq,
+    i.e. U = P kron(A1, A0).  CX patterns are permutation matrices, so
+    U ~ target elementwise exactly when kron(A1, A0) ~ P^T target, and
+    each chunk of Kronecker products is formed by one einsum and compared
+    with one vectorized allclose-style reduction per pattern.
+
+    Returns a list of (i0, i1, p) indices into the product sequences and
+    cx_patterns, ordered like the nested loops in testproblem9.py.
+    rows=(start, stop) restricts seq_q0 to that index range, so the sweep
+    can be split into independent shards.
+    """
+    target = np.asarray(target, dtype=complex)
+    mats = sequence_matrices(gates, depth)
+    n = len(mats)
+    first, last = rows if rows is not None else (0, n)
+    residuals = [pattern_unitary(p).T @ target for p in cx_patterns]
+    bounds = [tol + rtol * np.abs(R) for R in residuals]
+
+    matches = []
+    step = max(1, chunk_size // n)
+    for start in range(first, last, step):
+        A0 = mats[start:min(start + step, last)]
+        # K[a, b] = kron(A1_b, A0_a), laid out as (a, b, i1, i0, j1, j0)
+        K = np.einsum('bij,akl->abikjl', mats, A0).reshape(len(A0), n, 4, 4)
+        hits = []
+        for p, (R, bound) in enumerate(zip(residuals, bounds)):
+            ok = (np.abs(K - R) <= bound).all(axis=(-2, -1))
+            for a, b in zip(*np.nonzero(ok)):
+                hits.append((start + int(a), int(b), p))
+        matches.extend(sorted(hits))
+    return matches
@@ -0,0 +1,656 @@
+import atexit
+import contextlib
+import functools
+import glob
+import io
+import json
+import math
+import os
+import platform
+import shutil
+import stat
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(HERE, 'benchmark_baseline.json')
+CHALLENGE12 = os.path.join(HERE, '..', '..', 'challenge12.json')
+
+# A stand-in for the GridSynth binary: valid output, no number theory
+GRIDSYNTH_STUB = "#!/bin/sh\necho 'HTSHTHTSHTHT'\n"
+# The same stand-in, logging one line per call next to itself
+GRIDSYNTH_COUNTING_STUB = ("#!/bin/sh\necho \"$@\" >> \"$(dirname \"$0\")/calls.log\"\n"
+                           "echo 'HTSHTHTSHTHT'\n")
+
+
+def random_phase_table(n, seed=0):
+    """f(x) table of a random CNOT+T phase polynomial on n qubits"""
+    from phase_polynomial import evaluate_phase_polynomial
+    c = np.random.default_rng(seed).integers(0, 8, 1 << n)
+    c[0] = 0
+    return evaluate_phase_polynomial(c)
+
+
+@functools.lru_cache(maxsize=None)
+def random_clifford_t(n, gates, seed=0):
+    """Random (name, params, qubits) tuple over h, s, t, tdg and cx, generated once"""
+    rng = np.random.default_rng(seed)
+    out = []
+    for _ in range(gates):
+        if n > 1 and rng.random() < 0.4:
+            a, b = rng.choice(n, 2, replace=False)
+            out.append(('cx', (), (int(a), int(b))))
+        else:
+            out.append((str(rng.choice(['h', 's', 't', 'tdg'])), (), (int(rng.integers(n)),)))
+    return tuple(out)
+
+
+# Each benchmark takes its parameters as keywords and returns the number of
+# candidates (table entries, circuits, gates, ...) it processed
+
+def bench_phase_polynomial(qubits):
+    """problem11part3.py: Mobius solve plus the Reed-Muller T-count search"""
+    from phase_polynomial import solve_phase_polynomial
+    solve_phase_polynomial(random_phase_table(qubits))
+    return 1 << qubits
+
+
+def bench_sweep(depth):
+    """testproblem9.py: every (seq_q0, seq_q1, cx pattern) product circuit"""
+    from batched_sweep import sweep_matches
+    from scriptfor9withquantum import U_target
+    gates = ['h', 's', 'sdg', 't', 'tdg']
+    patterns = [['cx_01'], ['cx_10']]
+    sweep_matches(U_target, gates, depth, patterns)
+    return len(gates) ** (2 * depth) * len(patterns)
+
+
+def bench_mitm(depth):
+    """scriptfor9withquantum.py: meet-in-the-middle over hashed half words"""
+    from two_qubit_words import build_word_table, meet_in_the_middle
+    from scriptfor9withquantum import U_target
+    table = build_word_table((depth + 1) // 2)
+    meet_in_the_middle(U_target, depth, table=table)
+    return len(table[1])
+
+
+def bench_cost_table(t_count, cx_count):
+    """testproblem9.py: distinct unitaries in (T-count, CNOT count) order"""
+    from two_qubit_words import CostOrderedTable
+    return len(CostOrderedTable(t_count, cx_count).build())
+
+
+def bench_insertion(depth):
+    """scriptfor9withquantum.py: brute-force gate insertion into the base circuit"""
+    import scriptfor9withquantum as s9
+    s9.insertion_search(s9.U_target, depth)
+    slots, choices = len(s9.base_circuit_list) + 1, len(s9.insertion_gates())
+    return sum(math.comb(slots + k - 1, k) * choices ** k for k in range(1, depth + 1))
+
+
+_stub_dir = None
+
+
+def gridsynth_stub_dir():
+    """Temporary directory holding the stub binary and a warm cache, made once"""
+    global _stub_dir
+    if _stub_dir is None:
+        _stub_dir = tempfile.mkdtemp(prefix='gridsynth-bench-')
+        atexit.register(shutil.rmtree, _stub_dir, True)
+        stub = os.path.join(_stub_dir, 'gridsynth')
+        with open(stub, 'w') as f:
+            f.write(GRIDSYNTH_STUB)
+        os.chmod(stub, os.stat(stub).st_mode | stat.S_IEXEC)
+    return _stub_dir
+
+
+def bench_gridsynth_compile(qubits, cache, pipeline='full'):
+    """
+    QiskitProblem10.py compile_with_gridsynth_cli against a stub gridsynth.
+
+    Two qubits compiles the script's U, more qubits a fixed Haar-random
+    unitary.  With cache=True the SQLite cache outlives the call, so every
+    run after the warm-up measures a fully cached compile.  pipeline picks
+    the level-3 transpile ('full') or the linear passes ('fast').
+    """
+    import QiskitProblem10 as p10
+    if qubits == 2:
+        U = p10.U
+    else:
+        from scipy.stats import unitary_group
+        U = unitary_group.rvs(1 << qubits, random_state=qubits)
+    tmp = gridsynth_stub_dir()
+    saved = {k: os.environ.get(k) for k in ('PATH', 'GRIDSYNTH_CACHE')}
+    os.environ['PATH'] = tmp + os.pathsep + os.environ.get('PATH', '')
+    os.environ['GRIDSYNTH_CACHE'] = os.path.join(tmp, 'cache.sqlite') if cache else ''
+    p10._gridsynth_flags = None
+    p10._gridsynth_cache = None
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            p10.compile_with_gridsynth_cli(U, pipeline=pipeline)
+    finally:
+        if p10._gridsynth_cache is not None:
+            p10._gridsynth_cache.close()
+        p10._gridsynth_flags = None
+        p10._gridsynth_cache = None
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+    return 1 << qubits
+
+
+def bench_gridsynth_cache(angles):
+    """
+    gridsynth_cache.py through call_gridsynth_batch, against a stub
+    gridsynth that logs its calls, in a fresh cache of max_entries=angles.
+
+    Checks that a second batch of the same angles is answered from the
+    cache without running the stub, that one more entry evicts the least
+    recently used angle, and that at -b 60 two angles 3e-11 apart (closer
+    than 1e-10, farther than 2^-60) get separate keys.  A failed check
+    raises ValueError.
+    """
+    import QiskitProblem10 as p10
+    from gridsynth_cache import GridSynthCache
+    tmp = tempfile.mkdtemp(prefix='gridsynth-cache-bench-')
+    stub = os.path.join(tmp, 'gridsynth')
+    with open(stub, 'w') as f:
+        f.write(GRIDSYNTH_COUNTING_STUB)
+    os.chmod(stub, os.stat(stub).st_mode | stat.S_IEXEC)
+
+    def calls():
+        log = os.path.join(tmp, 'calls.log')
+        if not os.path.exists(log):
+            return 0
+        with open(log) as f:
+            return sum(1 for _ in f)
+
+    def batch(thetas, bits=None):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return p10.call_gridsynth_batch([(t, 0.0, 0.0, 1.0) for t in thetas], cache=cache,
+                                            bits=bits and [bits] * len(thetas))
+
+    saved_path = os.environ.get('PATH', '')
+    os.environ['PATH'] = tmp + os.pathsep + saved_path
+    p10._gridsynth_flags = None
+    cache = GridSynthCache(os.path.join(tmp, 'cache.sqlite'), max_entries=angles)
+    try:
+        thetas = [float(t) for t in np.random.default_rng(angles).uniform(-np.pi, np.pi, angles)]
+        first = batch(thetas)
+        before = calls()
+        if batch(thetas) != first or calls() != before or cache.hits != angles:
+            raise ValueError(f"cached angles ran gridsynth again ({calls() - before} calls, "
+                             f"{cache.hits} hits)")
+
+        flags = p10.detect_gridsynth_flags()
+        for t in thetas[1:] + thetas[:1]:
+            cache.get(t, 1e-10, flags)
+        cache.put(np.pi / 7, 1e-10, flags, 'H')
+        if len(cache) != angles or cache.peek(thetas[1], 1e-10, flags) is not None \
+                or cache.peek(thetas[0], 1e-10, flags) is None:
+            raise ValueError(f"put past max_entries={angles} did not evict the least recently used entry")
+
+        # off a 1e-10 rounding boundary, so precision-only keys would merge them
+        theta = round(thetas[0], 6)
+        batch([theta], bits=60)
+        before = calls()
+        near = theta + 3e-11
+        batch([near], bits=60)
+        if calls() != before + 1:
+            raise ValueError("-b 60 key merged angles 3e-11 apart")
+    finally:
+        cache.close()
+        p10._gridsynth_flags = None
+        os.environ['PATH'] = saved_path
+        shutil.rmtree(tmp, True)
+    return 2 * angles + 2
+
+
+# Trace fidelity below which a file and its phase-folded rewrite disagree
+FILE_FIDELITY_TOL = 1e-9
+
+
+def bench_verify_files():
+    """
+    tensor_sim.py: verify every .qasm file under problem qasms.
+
+    The files carry no target unitaries, so each one is checked against
+    its own phase-folded rewrite (phase_folding.optimize_qasm): both are
+    simulated and their trace fidelity compared.  A file that drifts
+    from its rewrite raises ValueError; the lowest fidelity is reported.
+    """
+    from tensor_sim import qasm_unitary, trace_fidelity
+    from phase_folding import optimize_qasm
+    gates = 0
+    worst = 1.0
+    for path in sorted(glob.glob(os.path.join(HERE, '*.qasm'))):
+        with open(path) as f:
+            U, n = qasm_unitary(f, [])
+        with open(path) as f:
+            text, report = optimize_qasm(f)
+        V, _ = qasm_unitary(text.splitlines(), [])
+        fid = trace_fidelity(U, V)
+        if fid < 1 - FILE_FIDELITY_TOL:
+            raise ValueError(f"{os.path.basename(path)} differs from its phase-folded rewrite "
+                             f"(trace fidelity {fid:.12f})")
+        worst = min(worst, fid)
+        gates += report['gates_before']
+    return gates, {'min_fidelity': worst}
+
+
+def bench_verify_random(qubits, gates):
+    """tensor_sim.py: unitary of a random Clifford+T circuit"""
+    from tensor_sim import simulate_gates
+    simulate_gates(random_clifford_t(qubits, gates), qubits)
+    return gates
+
+
+def bench_analyze_files():
+    """qasm_stream.py: resource counts of every .qasm file"""
+    from qasm_stream import analyze_qasm_file
+    paths = sorted(glob.glob(os.path.join(HERE, '*.qasm')))
+    for path in paths:
+        analyze_qasm_file(path)
+    return len(paths)
+
+
+def bench_exact_synthesis(depth):
+    """exact_synthesis.py: ring-form synthesis of a random depth-gate word"""
+    from two_qubit_words import DEFAULT_GATES, word_unitary
+    from exact_synthesis import exact_synthesis
+    rng = np.random.default_rng(depth)
+    word = [DEFAULT_GATES[i] for i in rng.integers(len(DEFAULT_GATES), size=depth)]
+    exact_synthesis(word_unitary(word))
+    return 1
+
+
+def bench_pauli_compiler(qubits, terms):
+    """pauli_compiler.py: challenge12.json-shaped programs resampled to terms"""
+    from pauli_program import load_pauli_program
+    from pauli_compiler import compile_pauli_rotations
+    n, program = load_pauli_program(CHALLENGE12)
+    if qubits != n:
+        raise ValueError(f"challenge12.json has {n} qubits")
+    rng = np.random.default_rng(0)
+    compile_pauli_rotations(n, [program[i] for i in rng.integers(len(program), size=terms)])
+    return terms
+
+
+def bench_pauli_layers(qubits, terms, weight=3, identity=0, parallel=True):
+    """
+    pauli_compiler.py: a random program of weight-w Paulis, most pairs of
+    which do not commute, scheduled into layers and compiled.  identity
+    of the terms are all-identity (global phase) rotations.
+    """
+    from pauli_compiler import compile_pauli_rotations
+    rng = np.random.default_rng(0)
+    program = []
+    for _ in range(terms):
+        pauli = ['I'] * qubits
+        for q in rng.choice(qubits, size=weight, replace=False):
+            pauli[q] = 'XYZ'[rng.integers(3)]
+        program.append((''.join(pauli), int(rng.integers(1, 8)) * np.pi / 8))
+    for i in rng.choice(terms, size=identity, replace=False):
+        program[i] = ('I' * qubits, 5 * np.pi / 8)
+    compile_pauli_rotations(qubits, program, optimize=False, parallel=parallel)
+    return terms
+
+
+def bench_pauli_program(qubits, terms, samples=None):
+    """pauli_program.py: matrix-free Pauli-rotation target, unitary or random states"""
+    from pauli_program import apply_pauli_rotations, pauli_program_unitary, random_states
+    rng = np.random.default_rng(qubits)
+    program = [(''.join(rng.choice(list('IXYZ'), qubits)), k * np.pi / 8)
+               for k in rng.integers(1, 16, size=terms)]
+    if samples is None:
+        pauli_program_unitary(qubits, program)
+        return terms * (1 << qubits)
+    apply_pauli_rotations(random_states(qubits, samples, 0), qubits, program)
+    return terms * samples
+
+
+def bench_gray_synth(qubits):
+    """parity_network.py: CNOT+T network for a random diagonal phase table"""
+    from phase_polynomial import evaluate_phase_polynomial
+    from parity_network import synthesize_diagonal
+    rng = np.random.default_rng(qubits)
+    c = rng.integers(0, 8, 1 << qubits)
+    c[0] = 0
+    synthesize_diagonal(evaluate_phase_polynomial(c))
+    return 1 << qubits
+
+
+def bench_phase_folding(qubits, gates):
+    """phase_folding.py: T-merging pass over a random Clifford+T circuit"""
+    from phase_folding import fold_phases
+    fold_phases(random_clifford_t(qubits, gates))
+    return gates
+
+
+def bench_normal_form(length):
+    """normal_form.py: Matsumoto-Amano form of a random H/S/T word"""
+    from normal_form import normal_form_gates
+    normal_form_gates([name for name, _, _ in random_clifford_t(1, length)])
+    return length
+
+
+def bench_error_budget(rotations):
+    """error_budget.py: precision allocation for random angles at fidelity 1 - 1e-6"""
+    from error_budget import PrecisionCurves, allocate_bits, fidelity_budget
+    thetas = np.random.default_rng(rotations).uniform(-np.pi, np.pi, rotations)
+    allocate_bits(thetas, fidelity_budget(1 - 1e-6), PrecisionCurves())
+    return rotations
+
+
+def bench_stabilizer(qubits, gates, clifford=True):
+    """
+    stabilizer.py: equivalence of a random circuit with a rewrite of it.
+
+    Clifford: t -> s, checked against itself.  Otherwise every s of the
+    second copy becomes t t, so the Clifford frames differ.
+    """
+    from stabilizer import verify_equivalent
+    circuit = random_clifford_t(qubits, gates)
+    if clifford:
+        circuit = [({'t': 's', 'tdg': 'sdg'}.get(name, name), params, qs) for name, params, qs in circuit]
+        verify_equivalent(circuit, circuit, qubits)
+        return 2 * gates
+    rewrite = []
+    for gate in circuit:
+        rewrite += [('t', (), gate[2])] * 2 if gate[0] == 's' else [gate]
+    verify_equivalent(circuit, rewrite, qubits)
+    return len(circuit) + len(rewrite)
+
+
+@functools.lru_cache(maxsize=None)
+def clifford_t_db_path(max_t):
+    """Database of T-count <= max_t in a temporary directory, built once"""
+    from clifford_t_db import build_database
+    tmp = tempfile.mkdtemp(prefix='clifford-t-bench-')
+    atexit.register(shutil.rmtree, tmp, True)
+    return build_database(os.path.join(tmp, 'db.npy'), max_t, verbose=False)
+
+
+def bench_clifford_t_db(max_t, lookups=0):
+    """
+    clifford_t_db.py: build the database, or with lookups > 0 look up
+    random Clifford+T words of T-count <= max_t in one built beforehand.
+    """
+    from clifford_t_db import CLIFFORD_GATES, CliffordTDatabase, build_database
+    from two_qubit_words import word_unitary
+    if not lookups:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = build_database(os.path.join(tmp, 'db.npy'), max_t, verbose=False)
+            return len(np.load(path, mmap_mode='r'))
+    db = CliffordTDatabase(clifford_t_db_path(max_t))
+    rng = np.random.default_rng(max_t)
+    for _ in range(lookups):
+        word = [CLIFFORD_GATES[i] for i in rng.integers(len(CLIFFORD_GATES), size=12)]
+        for q in rng.integers(2, size=max_t):
+            word.insert(int(rng.integers(len(word) + 1)), ('t', int(q)))
+        if db.lookup(word_unitary(word)) is None:
+            raise RuntimeError("database lookup missed a Clifford+T word")
+    return lookups
+
+
+BENCHMARKS = {
+    'phase_polynomial': bench_phase_polynomial,
+    'sweep': bench_sweep,
+    'mitm': bench_mitm,
+    'cost_table': bench_cost_table,
+    'insertion': bench_insertion,
+    'gridsynth_compile': bench_gridsynth_compile,
+    'gridsynth_cache': bench_gridsynth_cache,
+    'verify_files': bench_verify_files,
+    'verify_random': bench_verify_random,
+    'analyze_files': bench_analyze_files,
+    'exact_synthesis': bench_exact_synthesis,
+    'pauli_compiler': bench_pauli_compiler,
+    'pauli_layers': bench_pauli_layers,
+    'pauli_program': bench_pauli_program,
+    'gray_synth': bench_gray_synth,
+    'phase_folding': bench_phase_folding,
+    'normal_form': bench_normal_form,
+    'error_budget': bench_error_budget,
+    'stabilizer': bench_stabilizer,
+    'clifford_t_db': bench_clifford_t_db,
+}
+
+# (benchmark, parameters) per profile; 'quick' is a smoke run
+SUITES = {
+    'quick': [
+        ('phase_polynomial', {'qubits': 4}),
+        ('phase_polynomial', {'qubits': 8}),
+        ('sweep', {'depth': 3}),
+        ('mitm', {'depth': 6}),
+        ('cost_table', {'t_count': 1, 'cx_count': 2}),
+        ('insertion', {'depth': 1}),
+        ('gridsynth_compile', {'qubits': 2, 'cache': False}),
+        ('gridsynth_compile', {'qubits': 3, 'cache': False}),
+        ('gridsynth_compile', {'qubits': 2, 'cache': True, 'pipeline': 'fast'}),
+        ('gridsynth_cache', {'angles': 16}),
+        ('verify_files', {}),
+        ('verify_random', {'qubits': 5, 'gates': 1000}),
+        ('analyze_files', {}),
+        ('exact_synthesis', {'depth': 10}),
+        ('pauli_compiler', {'qubits': 9, 'terms': 255}),
+        ('pauli_layers', {'qubits': 16, 'terms': 1000}),
+        ('pauli_layers', {'qubits': 4, 'terms': 100, 'identity': 3, 'parallel': False}),
+        ('pauli_layers', {'qubits': 4, 'terms': 100, 'identity': 3}),
+        ('pauli_program', {'qubits': 9, 'terms': 255}),
+        ('gray_synth', {'qubits': 8}),
+        ('phase_folding', {'qubits': 9, 'gates': 10_000}),
+        ('normal_form', {'length': 10_000}),
+        ('error_budget', {'rotations': 100}),
+        ('stabilizer', {'qubits': 64, 'gates': 1000}),
+        ('clifford_t_db', {'max_t': 3}),
+    ],
+    'full': [
+        ('phase_polynomial', {'qubits': 4}),
+        ('phase_polynomial', {'qubits': 8}),
+        ('phase_polynomial', {'qubits': 10}),
+        ('phase_polynomial', {'qubits': 14}),
+        ('sweep', {'depth': 3}),
+        ('sweep', {'depth': 4}),
+        ('mitm', {'depth': 8}),
+        ('mitm', {'depth': 10}),
+        ('cost_table', {'t_count': 1, 'cx_count': 2}),
+        ('cost_table', {'t_count': 2, 'cx_count': 3}),
+        ('cost_table', {'t_count': 3, 'cx_count': 3}),
+        ('insertion', {'depth': 1}),
+        ('insertion', {'depth': 3}),
+        ('insertion', {'depth': 4}),
+        ('gridsynth_compile', {'qubits': 2, 'cache': False}),
+        ('gridsynth_compile', {'qubits': 2, 'cache': True}),
+        ('gridsynth_compile', {'qubits': 3, 'cache': True}),
+        ('gridsynth_compile', {'qubits': 4, 'cache': True}),
+        ('gridsynth_compile', {'qubits': 2, 'cache': True, 'pipeline': 'fast'}),
+        ('gridsynth_compile', {'qubits': 3, 'cache': True, 'pipeline': 'fast'}),
+        ('gridsynth_compile', {'qubits': 4, 'cache': True, 'pipeline': 'fast'}),
+        ('gridsynth_cache', {'angles': 16}),
+        ('gridsynth_cache', {'angles': 256}),
+        ('verify_files', {}),
+        ('verify_random', {'qubits': 5, 'gates': 3000}),
+        ('verify_random', {'qubits': 7, 'gates': 3000}),
+        ('verify_random', {'qubits': 9, 'gates': 3000}),
+        ('analyze_files', {}),
+        ('exact_synthesis', {'depth': 10}),
+        ('exact_synthesis', {'depth': 30}),
+        ('pauli_compiler', {'qubits': 9, 'terms': 255}),
+        ('pauli_compiler', {'qubits': 9, 'terms': 100_000}),
+        ('pauli_layers', {'qubits': 16, 'terms': 1000}),
+        ('pauli_layers', {'qubits': 4, 'terms': 100, 'identity': 3, 'parallel': False}),
+        ('pauli_layers', {'qubits': 4, 'terms': 100, 'identity': 3}),
+        ('pauli_layers', {'qubits': 16, 'terms': 10_000}),
+        ('pauli_layers', {'qubits': 64, 'terms': 20_000}),
+        ('pauli_program', {'qubits': 9, 'terms': 255}),
+        ('pauli_program', {'qubits': 16, 'terms': 255, 'samples': 8}),
+        ('pauli_program', {'qubits': 20, 'terms': 100, 'samples': 4}),
+        ('gray_synth', {'qubits': 8}),
+        ('gray_synth', {'qubits': 12}),
+        ('phase_folding', {'qubits': 9, 'gates': 10_000}),
+        ('phase_folding', {'qubits': 20, 'gates': 100_000}),
+        ('normal_form', {'length': 10_000}),
+        ('normal_form', {'length': 1_000_000}),
+        ('error_budget', {'rotations': 100}),
+        ('error_budget', {'rotations': 10_000}),
+        ('stabilizer', {'qubits': 64, 'gates': 1000}),
+        ('stabilizer', {'qubits': 64, 'gates': 100_000}),
+        ('stabilizer', {'qubits': 1000, 'gates': 100_000}),
+        ('stabilizer', {'qubits': 9, 'gates': 3000, 'clifford': False}),
+        ('clifford_t_db', {'max_t': 3}),
+        ('clifford_t_db', {'max_t': 5}),
+        ('clifford_t_db', {'max_t': 5, 'lookups': 200}),
+    ],
+}
+
+
+def case_id(name, params):
+    return name + ''.join(f" {k}={v}" for k, v in params.items())
+
+
+def run_case(name, params, repeat=3):
+    """
+    Time one benchmark case.
+
+    A warm-up run loads imports and caches, a second run under tracemalloc
+    gives peak memory, then the best and median of repeat plain runs are
+    recorded.
+    """
+    fn = BENCHMARKS[name]
+    fn(**params)
+    tracemalloc.start()
+    try:
+        fn(**params)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        candidates = fn(**params)
+        times.append(time.perf_counter() - start)
+    # verifying benchmarks return (candidates, {check: value})
+    checks = {}
+    if isinstance(candidates, tuple):
+        candidates, checks = candidates
+    best = min(times)
+    return {
+        'case': case_id(name, params),
+        'benchmark': name,
+        'params': params,
+        'wall_s': best,
+        'median_s': float(np.median(times)),
+        'peak_mib': peak / 2 ** 20,
+        'candidates': candidates,
+        'candidates_per_s': candidates / best if best > 0 else None,
+        **({'checks': checks} if checks else {}),
+    }
+
+
+def machine_info():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+# Slowdowns below this many seconds are timer and scheduler noise
+MIN_DELTA_S = 0.02
+
+
+def compare(results, baseline, threshold=1.25, min_delta=MIN_DELTA_S):
+    """
+    Print each case's time against the baseline.
+
+    Returns the cases slower than threshold times their baseline by more
+    than the noise: the best-time slowdown must also exceed min_delta
+    seconds and the best-to-median spread of both runs, so sub-millisecond
+    cases and jittery ones pass an idle re-run.
+    """
+    base = {r['case']: r for r in baseline.get('results', [])}
+    regressions = []
+    for r in results:
+        old = base.get(r['case'])
+        if old is None:
+            print(f"  {r['case']:<45} {r['wall_s']:9.4f} s   (no baseline)")
+            continue
+        ratio = r['wall_s'] / old['wall_s'] if old['wall_s'] else float('inf')
+        spread = (old['median_s'] - old['wall_s']) + (r['median_s'] - r['wall_s'])
+        slower = ratio > threshold and r['wall_s'] - old['wall_s'] > max(min_delta, spread)
+        mark = '✗' if slower else '✓'
+        print(f"  {r['case']:<45} {r['wall_s']:9.4f} s   {ratio:5.2f}x baseline {mark}")
+        if slower:
+            regressions.append(r['case'])
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the solvers and verification paths")
+    parser.add_argument('--suite', choices=sorted(SUITES), default='quick')
+    parser.add_argument('-k', '--filter', help="only cases whose id contains this text")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('-o', '--output', help="write results JSON here")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="baseline JSON to compare against")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="add cases missing from the baseline; recorded cases are kept")
+    parser.add_argument('--replace-baseline', action='store_true',
+                        help="with --save-baseline, also re-record cases already in the baseline")
+    parser.add_argument('--threshold', type=float, default=1.25, help="slowdown ratio that counts as a regression")
+    parser.add_argument('--min-delta', type=float, default=MIN_DELTA_S,
+                        help="seconds a case must slow down by, on top of --threshold, to count")
+    args = parser.parse_args()
+
+    cases = [(name, params) for name, params in SUITES[args.suite]
+             if not args.filter or args.filter in case_id(name, params)]
+
+    print("=" * 80)
+    print(f"BENCHMARKS ({args.suite}, {len(cases)} cases)")
+    print("=" * 80)
+    results = []
+    for name, params in cases:
+        r = run_case(name, params, args.repeat)
+        rate = f"{r['candidates_per_s']:.3g}/s" if r['candidates_per_s'] else "-"
+        checks = ''.join(f"  {k}={v:.12g}" for k, v in r.get('checks', {}).items())
+        print(f"  {r['case']:<45} {r['wall_s']:9.4f} s  {r['peak_mib']:8.1f} MiB  {rate}{checks}")
+        results.append(r)
+
+    report = {'suite': args.suite, 'machine': machine_info(), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Wrote {args.output}")
+
+    if args.save_baseline:
+        # Merge into the existing file so quick and full cases share one
+        # baseline; recorded cases and the header stay put unless replaced,
+        # so a new benchmark does not silently move the old numbers
+        baseline = report
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        saved = {r['case']: r for r in baseline.get('results', [])}
+        added = [r for r in results if args.replace_baseline or r['case'] not in saved]
+        saved.update((r['case'], r) for r in added)
+        baseline['results'] = list(saved.values())
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"✓ Saved {len(added)} case(s) to baseline {args.baseline}")
+    elif os.path.exists(args.baseline):
+        print("\nAgainst baseline:")
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold, args.min_delta)
+        if regressions:
+            print(f"\n✗ {len(regressions)} regression(s)")
+            sys.exit(1)
@@ -0,0 +1,419 @@
+import hashlib
+import heapq
+import os
+import sys
+import time
+import numpy as np
+from two_qubit_words import DEFAULT_GATES, I2, X, Y, Z, equal_up_to_phase, word_unitary
+
+
+DEFAULT_DB_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'clifford_t', 'two_qubit.npy')
+DEFAULT_MAX_T = 5
+
+# Two-qubit Paulis, index 4 * p1 + p0 for p = I, X, Y, Z on q[1] and q[0]
+PAULIS = np.array([np.kron(a, b) for a in (I2, X, Y, Z) for b in (I2, X, Y, Z)])
+# Weight-one Paulis per qubit as (index, axis)
+LOCAL_PAULIS = {0: ((1, 'X'), (2, 'Y'), (3, 'Z')), 1: ((4, 'X'), (8, 'Y'), (12, 'Z'))}
+SQRT2 = np.sqrt(2)
+
+CLIFFORD_GATES = [g for g in DEFAULT_GATES if g[0] not in ('t', 'tdg')]
+GATE_CODES = {g: i + 1 for i, g in enumerate(DEFAULT_GATES)}
+
+# Record kinds in the table
+CLIFFORD, COSET, FRAME, META = 0, 1, 2, 3
+WORD_BYTES = 24
+RECORD = np.dtype([('key', 'S16'), ('kind', 'u1'), ('t_count', 'u1'), ('cx_count', 'u1'),
+                   ('length', 'u1'), ('word', 'u1', (WORD_BYTES,))])
+# Cosets expanded per batch while building
+CHUNK = 4096
+
+
+def default_db_path():
+    """Database location, overridable with $CLIFFORD_T_DB"""
+    return os.environ.get('CLIFFORD_T_DB') or DEFAULT_DB_PATH
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def channel_rep(U):
+    """16 x 16 Pauli transfer matrix M[i, j] = Tr(P_i U P_j U^dag) / 4"""
+    conjugated = U @ PAULIS @ U.conj().T
+    return np.einsum('iab,jba->ij', PAULIS, conjugated).real / 4
+
+
+def clifford_key(U):
+    """Key of a Clifford modulo phase: its signed-permutation transfer matrix"""
+    return _digest(b'C' + np.rint(channel_rep(U)[1:, 1:]).astype(np.int8).tobytes())
+
+
+def rotation(p):
+    """exp(-i pi/8 P_p), a T gate conjugated onto the Pauli P_p"""
+    return np.cos(np.pi / 8) * np.eye(4) - 1j * np.sin(np.pi / 8) * PAULIS[p]
+
+
+def _reduce(A, B, f):
+    """
+    Lowest-denominator form of stacked (A + sqrt2 B) / sqrt2^f.
+
+    (2A' + sqrt2 B) / sqrt2^f = (B + sqrt2 A') / sqrt2^(f-1), so a stack
+    entry is reduced while all of its A is even.
+    """
+    while True:
+        reducible = (f > 0) & np.all(A % 2 == 0, axis=(1, 2))
+        if not reducible.any():
+            return A, B, f
+        A, B = A.copy(), B.copy()
+        A[reducible], B[reducible] = B[reducible], A[reducible] // 2
+        f = f - reducible
+
+
+def _rotation_channel(p):
+    """Exact transfer matrix of rotation(p) as (A, B) with R = (A + sqrt2 B) / sqrt2"""
+    M = channel_rep(rotation(p))[1:, 1:]
+    # commuting Paulis stay (entry 1), anticommuting ones mix with weight 1/sqrt2
+    big = np.abs(M) > 0.9
+    return np.where(big, 0, np.rint(M * SQRT2)).astype(np.int64), np.rint(M * big).astype(np.int64)
+
+
+def coset_keys(A, B, f):
+    """
+    Keys of the cosets {C W} of stacked exact transfer matrices of W.
+
+    A Clifford C on the left permutes the rows of W's transfer matrix and
+    flips their signs, so rows are sign-normalized and sorted.  Matching
+    keys mean W2 = C W1 with C's transfer matrix a signed permutation,
+    which for Clifford+T unitaries makes C a Clifford.
+    """
+    n = len(f)
+    rows = np.empty((n, 15, 30), dtype=np.int64)
+    rows[:, :, 0::2] = A
+    rows[:, :, 1::2] = B
+    first = np.argmax(rows != 0, axis=2)
+    rows *= np.sign(np.take_along_axis(rows, first[..., None], axis=2))
+    rows = (rows + 128).astype(np.uint8).reshape(n, -1).view('S30').reshape(n, 15)
+    rows = np.sort(rows, axis=1)
+    return [_digest(bytes([f[i]]) + rows[i].tobytes()) for i in range(n)]
+
+
+def exact_channel(M, max_f):
+    """
+    Exact (A, B, f) of a float 15 x 15 transfer matrix over Z[1/sqrt2], or None.
+
+    Every entry times sqrt2^max_f must be some a + b sqrt2 whose Galois
+    conjugate a - b sqrt2 is also at most sqrt2^max_f in size (the
+    conjugate unitary's transfer matrix is orthogonal too); those bounds
+    leave one candidate per entry at the precision of a double.
+    """
+    y = M * SQRT2 ** max_f
+    bound = SQRT2 ** max_f + 1e-6
+    b = np.arange(-int(bound / SQRT2) - 1, int(bound / SQRT2) + 2)
+    a = y[..., None] - b * SQRT2
+    ok = (np.abs(a - np.rint(a)) < 1e-6) & (np.abs(np.rint(a) - b * SQRT2) <= bound)
+    if not np.all(ok.sum(axis=-1) == 1):
+        return None
+    pick = np.argmax(ok, axis=-1)[..., None]
+    A = np.rint(np.take_along_axis(a, pick, axis=-1))[..., 0].astype(np.int64)
+    B = b[pick[..., 0]]
+    return _reduce(A[None], B[None], np.array([max_f]))
+
+
+def _search_cliffords():
+    """
+    All 11,520 two-qubit Cliffords mod phase with CNOT-optimal words.
+
+    Dijkstra over (CNOTs, gates) from the identity with h / s / sdg on
+    either qubit and cx both ways.  Returns [(key, word, cx_count, U)]
+    in cost order.
+    """
+    matrices = [(gate, word_unitary([gate])) for gate in CLIFFORD_GATES]
+    found = set()
+    order = []
+    identity = np.eye(4, dtype=complex)
+    heap = [(0, 0, 0, clifford_key(identity), [], identity)]
+    tie = 1
+    while heap:
+        cx, length, _, key, word, U = heapq.heappop(heap)
+        if key in found:
+            continue
+        found.add(key)
+        order.append((key, word, cx, U))
+        for gate, G in matrices:
+            V = G @ U
+            next_key = clifford_key(V)
+            if next_key not in found:
+                heapq.heappush(heap, (cx + (gate[0] == 'cx'), length + 1, tie, next_key, word + [gate], V))
+                tie += 1
+    return order
+
+
+def frame(U):
+    """
+    Left-local class of a Clifford E: the Paulis E^dag Q E for one-qubit Q.
+
+    Any Pauli in the frame is a one-qubit rotation axis after E, so a T
+    rotation about it costs no CNOTs.  Returns one frozenset of indices
+    per qubit; local gates after E leave both unchanged.
+    """
+    M = channel_rep(U.conj().T)
+    return tuple(frozenset(int(np.argmax(np.abs(M[:, q]))) for q, _ in LOCAL_PAULIS[qubit])
+                 for qubit in (0, 1))
+
+
+def _record(key, kind, word=(), t_count=0, cx_count=0):
+    if len(word) > WORD_BYTES:
+        raise ValueError(f"word of length {len(word)} does not fit in {WORD_BYTES} bytes")
+    return (key, kind, t_count, cx_count, len(word), tuple(word) + (0,) * (WORD_BYTES - len(word)))
+
+
+def build_database(path=None, max_t=DEFAULT_MAX_T, verbose=True):
+    """
+    Enumerate every 2-qubit Clifford+T unitary of T-count <= max_t.
+
+    Unitaries of T-count k are C R(P_k) ... R(P_1) for Cliffords C and
+    T rotations R(P) = exp(-i pi/8 P), so the table holds the 11,520
+    Cliffords with CNOT-optimal words, and for every coset of T-count k
+    (found breadth-first over exact Z[1/sqrt2] transfer matrices) one
+    rotation word, plus the 20 left-local frames used by lookup.  Records
+    are sorted by key and saved as one .npy file for mmap loading.
+    """
+    path = path or default_db_path()
+    start = time.perf_counter()
+    cliffords = _search_cliffords()
+    records = [_record(key, CLIFFORD, [GATE_CODES[g] for g in word], cx_count=cx)
+               for key, word, cx, _ in cliffords]
+    frames = {}
+    for _, word, _, U in cliffords:
+        frames.setdefault(frame(U), word)
+    records += [_record(_digest(b'F%d' % i), FRAME, [GATE_CODES[g] for g in word])
+                for i, word in enumerate(frames.values())]
+    if verbose:
+        print(f"  {len(cliffords)} Cliffords, {len(frames)} frames "
+              f"({time.perf_counter() - start:.1f} s)", flush=True)
+
+    rotations = [_rotation_channel(p) for p in range(1, 16)]
+    A, B, f = _reduce(np.zeros((1, 15, 15), np.int64), np.eye(15, dtype=np.int64)[None], np.ones(1, np.int64))
+    seen = set(coset_keys(A, B, f))
+    records.append(_record(next(iter(seen)), COSET))
+    words = np.zeros((1, 0), dtype=np.uint8)
+    for t in range(1, max_t + 1):
+        last = t == max_t
+        kept_A, kept_B, kept_f, kept_words = [], [], [], []
+        for lo in range(0, len(f), CHUNK):
+            a, b, fc = A[lo:lo + CHUNK].astype(np.int64), B[lo:lo + CHUNK].astype(np.int64), f[lo:lo + CHUNK]
+            for p, (RA, RB) in enumerate(rotations, 1):
+                # W R(P): the new rotation acts first
+                na, nb, nf = _reduce(a @ RA + 2 * (b @ RB), a @ RB + b @ RA, fc + 1)
+                keys = coset_keys(na, nb, nf)
+                new = [i for i, key in enumerate(keys) if key not in seen]
+                seen.update(keys[i] for i in new)
+                word = np.concatenate([np.full((len(new), 1), p, np.uint8), words[lo:lo + CHUNK][new]], axis=1)
+                records += [_record(keys[i], COSET, w, t_count=t) for i, w in zip(new, word.tolist())]
+                if not last:
+                    kept_A.append(na[new].astype(np.int8))
+                    kept_B.append(nb[new].astype(np.int8))
+                    kept_f.append(nf[new])
+                    kept_words.append(word)
+        if not last:
+            A, B = np.concatenate(kept_A), np.concatenate(kept_B)
+            f, words = np.concatenate(kept_f), np.concatenate(kept_words)
+        if verbose:
+            print(f"  T-count {t}: {sum(1 for r in records if r[1] == COSET and r[2] == t)} cosets "
+                  f"({time.perf_counter() - start:.1f} s)", flush=True)
+
+    records.append(_record(_digest(b'meta'), META, t_count=max_t))
+    table = np.array(records, dtype=RECORD)
+    table.sort(order='key')
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    np.save(path, table)
+    return path
+
+
+class CliffordTDatabase:
+    """
+    Read-only view of a database written by build_database().
+
+    The table is memory-mapped, so opening costs one page read and
+    processes sharing a file share its pages; lookups are binary searches
+    over the sorted keys.  Frame tables for CNOT minimization are built
+    on first use.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_db_path()
+        self.table = np.load(self.path, mmap_mode='r')
+        self.keys = self.table['key']
+        meta = self._find(_digest(b'meta'))
+        self.max_t = int(meta['t_count'])
+        self._frames = None
+
+    def _find(self, key):
+        i = int(np.searchsorted(self.keys, key))
+        # S16 values drop trailing NUL bytes
+        if i < len(self.keys) and self.keys[i] == key.rstrip(b'\0'):
+            return self.table[i]
+        return None
+
+    @staticmethod
+    def _word(record):
+        return [DEFAULT_GATES[c - 1] for c in record['word'][:record['length']]]
+
+    def clifford(self, U):
+        """(CNOT-optimal word, cx_count) of a Clifford, or None"""
+        record = self._find(clifford_key(U))
+        if record is None:
+            return None
+        return self._word(record), int(record['cx_count'])
+
+    def frames(self):
+        """(representative unitaries, frames, pairwise (cx, length) costs)"""
+        if self._frames is None:
+            reps = []
+            i = 0
+            while (record := self._find(_digest(b'F%d' % i))) is not None:
+                reps.append(word_unitary(self._word(record)))
+                i += 1
+            cost = np.zeros((len(reps), len(reps), 2), dtype=int)
+            for a, Ea in enumerate(reps):
+                for b, Eb in enumerate(reps):
+                    word, cx = self.clifford(Eb @ Ea.conj().T)
+                    cost[a, b] = cx, len(word)
+            self._frames = reps, [frame(E) for E in reps], cost
+        return self._frames
+
+    def lookup(self, U):
+        """
+        T-optimal circuit for an exactly representable 2-qubit unitary.
+
+        The coset gives a minimal rotation word R(P_k) ... R(P_1) and the
+        residual Clifford C = U W^dag.  The circuit is D_k G_k ... G_1 D_0
+        with one-qubit T rotations G_j; D_j moves between Clifford frames
+        in which P_j is a one-qubit axis, and a shortest path over the 20
+        frames picks the fewest CNOTs (then gates) for that word.  Returns
+        {'gates', 't_count', 'cx_count'} in the ('h', 0) / ('cx', 0, 1)
+        format, or None if U is not Clifford+T within T-count max_t.
+        """
+        U = np.asarray(U, dtype=complex)
+        exact = exact_channel(channel_rep(U)[1:, 1:], self.max_t)
+        if exact is None:
+            return None
+        record = self._find(coset_keys(*exact)[0])
+        if record is None:
+            return None
+        paulis = [int(p) for p in record['word'][:record['length']]]
+        W = np.eye(4, dtype=complex)
+        for p in paulis:
+            W = rotation(p) @ W
+        C = U @ W.conj().T
+        if self.clifford(C) is None:
+            return None
+
+        reps, frames, cost = self.frames()
+        identity = frames.index(frame(np.eye(4)))
+        # best[c] = (cx, length, path) ending in frame c after each layer
+        best = {identity: (0, 0, [])}
+        for p in paulis:
+            step = {}
+            for c, (cx, length, path) in best.items():
+                for d in range(len(reps)):
+                    if p in frames[d][0] or p in frames[d][1]:
+                        candidate = (cx + cost[c, d, 0], length + cost[c, d, 1], path + [d])
+                        if d not in step or candidate[:2] < step[d][:2]:
+                            step[d] = candidate
+            best = step
+
+        def finish(c):
+            word, cx = self.clifford(C @ reps[c].conj().T)
+            return best[c][0] + cx, best[c][1] + len(word)
+
+        path = best[min(best, key=finish)][2]
+        gates = []
+        E = np.eye(4, dtype=complex)
+        for p, c in zip(paulis, path):
+            gates += self.clifford(reps[c] @ E.conj().T)[0]
+            E = reps[c]
+            gates += _t_rotation(E, p)
+        gates += self.clifford(C @ E.conj().T)[0]
+        if not equal_up_to_phase(word_unitary(gates), U):
+            return None
+        return {'gates': gates, 't_count': len(paulis),
+                'cx_count': sum(1 for g in gates if g[0] == 'cx')}
+
+
+def _t_rotation(E, p):
+    """Gates of E R(P_p) E^dag = exp(-i pi/8 s Q) for the one-qubit Q = s E P_p E^dag"""
+    column = channel_rep(E)[:, p]
+    q = int(np.argmax(np.abs(column)))
+    t = 't' if column[q] > 0 else 'tdg'
+    qubit = 0 if q < 4 else 1
+    axis = dict(LOCAL_PAULIS[qubit])[q]
+    if axis == 'Z':
+        return [(t, qubit)]
+    if axis == 'X':
+        return [('h', qubit), (t, qubit), ('h', qubit)]
+    # Y = S X S^dag
+    return [('sdg', qubit), ('h', qubit), (t, qubit), ('h', qubit), ('s', qubit)]
+
+
+_open = {}
+
+
+def open_database(path=None):
+    """Shared CliffordTDatabase per path within a process"""
+    path = path or default_db_path()
+    if path not in _open:
+        _open[path] = CliffordTDatabase(path)
+    return _open[path]
+
+
+def word_to_qasm(gates):
+    lines = ["OPENQASM 2.0;", 'include "qelib1.inc";', "", "qreg q[2];", ""]
+    for g in gates:
+        lines.append(f"{g[0]} " + ", ".join(f"q[{q}]" for q in g[1:]) + ";")
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or query the 2-qubit Clifford+T circuit database")
+    parser.add_argument('targets', nargs='*', help=".npy unitaries or .qasm circuits to look up")
+    parser.add_argument('--db', help=f"database file (default: $CLIFFORD_T_DB or {DEFAULT_DB_PATH})")
+    parser.add_argument('--build', action='store_true', help="enumerate and write the database first")
+    parser.add_argument('--max-t', type=int, default=DEFAULT_MAX_T, help="largest T-count to enumerate")
+    parser.add_argument('-o', '--output-dir', help="write <target>.qasm files here")
+    args = parser.parse_args()
+
+    if args.build:
+        print("=" * 80)
+        print(f"BUILDING CLIFFORD+T DATABASE (T-count <= {args.max_t})")
+        print("=" * 80)
+        path = build_database(args.db, args.max_t)
+        print(f"✓ Saved {path} ({os.path.getsize(path) / 2 ** 20:.1f} MiB)")
+
+    db = open_database(args.db)
+    failed = 0
+    for target in args.targets:
+        if target.endswith('.qasm'):
+            from tensor_sim import qasm_unitary
+            with open(target) as f:
+                U, n = qasm_unitary(f, [])
+            U = U.reshape(1 << n, 1 << n)
+        else:
+            U = np.load(target)
+        start = time.perf_counter()
+        result = db.lookup(U) if U.shape == (4, 4) else None
+        elapsed = (time.perf_counter() - start) * 1e3
+        if result is None:
+            failed += 1
+            print(f"✗ {target}: not a Clifford+T unitary of T-count <= {db.max_t}")
+            continue
+        print(f"✓ {target}: T={result['t_count']} CX={result['cx_count']} "
+              f"gates={len(result['gates'])} ({elapsed:.2f} ms)")
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+            stem = os.path.splitext(os.path.basename(target))[0]
+            with open(os.path.join(args.output_dir, stem + '.qasm'), 'w') as f:
+                f.write(word_to_qasm(result['gates']))
+    sys.exit(1 if failed else 0)
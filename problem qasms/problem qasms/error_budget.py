@@ -0,0 +1,151 @@
+import math
+import numpy as np
+from two_qubit_words import SINGLE_QUBIT_MATRICES
+
+
+# GridSynth precisions the allocator chooses from, in bits (epsilon = 2^-bits)
+MIN_BITS = 3
+MAX_BITS = 60
+
+# Ross-Selinger: an Rz approximation to epsilon costs about
+# 3.02 log2(1/epsilon) + 1.77 T gates on average
+T_PER_BIT = 3.02
+T_OFFSET = 1.77
+
+
+def fidelity_budget(fidelity):
+    """
+    Summed rotation error that keeps the trace fidelity at least fidelity.
+
+    Approximations with operator-norm errors eps_i (up to phase) put the
+    circuit within eta = sum eps_i of the target, and a unitary within eta
+    of a phase times U has |Tr(U^dag V)| / d >= 1 - eta^2 / 2.
+    """
+    return math.sqrt(2 * max(0.0, 1 - fidelity))
+
+
+def with_bits(flags, bits):
+    """GridSynth flags with the -b precision replaced, or None without -b"""
+    if '-b' not in flags:
+        return None
+    flags = list(flags)
+    flags[flags.index('-b') + 1] = str(bits)
+    return flags
+
+
+def rz_error(gates, theta):
+    """Operator-norm distance up to phase between a gate word and Rz(theta)"""
+    M = np.eye(2, dtype=complex)
+    for name in gates:
+        M = SINGLE_QUBIT_MATRICES[name] @ M
+    # min over phi of ||A - e^{i phi} B|| = sqrt(2 - |Tr(B^dag A)|) for 2x2
+    trace = M[0, 0] * np.exp(0.5j * theta) + M[1, 1] * np.exp(-0.5j * theta)
+    return math.sqrt(max(0.0, 2 - abs(trace)))
+
+
+def t_count(gates):
+    return sum(1 for name in gates if name in ('t', 'tdg'))
+
+
+class PrecisionCurves:
+    """
+    Memoized T-count and error of Rz(theta) for every precision in bits.
+
+    Points come from GridSynth output already in the cache, measured
+    exactly, and otherwise from the Ross-Selinger estimate with the
+    guaranteed error 2^-bits.  Multiples of pi/4 are exact at any
+    precision.  measure() replaces estimates with real results.  parse
+    turns raw cached output into gate names.
+    """
+
+    def __init__(self, cache=None, flags=None, parse=None, bits=(MIN_BITS, MAX_BITS)):
+        self.cache = cache
+        self.flags = flags
+        self.parse = parse
+        self.bits = np.arange(bits[0], bits[1] + 1)
+        self._points = {}
+
+    def _key(self, theta):
+        return round(float(theta), 12)
+
+    def estimate(self, theta):
+        """(t_counts, errors) arrays over self.bits without GridSynth"""
+        k = theta * 4 / np.pi
+        if abs(k - round(k)) < 1e-9:
+            t = float(round(k) % 2)
+            return np.full(len(self.bits), t), np.zeros(len(self.bits))
+        return T_PER_BIT * self.bits + T_OFFSET, np.exp2(-self.bits.astype(float))
+
+    def curve(self, theta):
+        key = self._key(theta)
+        if key not in self._points:
+            t, err = self.estimate(theta)
+            if self.cache is not None and self.flags is not None:
+                for i, bits in enumerate(self.bits):
+                    output = self.cache.peek(theta, 2.0 ** -float(bits), with_bits(self.flags, bits))
+                    if output is not None:
+                        gates = self.parse(output)
+                        t[i], err[i] = t_count(gates), rz_error(gates, theta)
+            self._points[key] = (t, err)
+        return self._points[key]
+
+    def measure(self, theta, bits, gates):
+        """Record a real GridSynth result for Rz(theta) at the given bits"""
+        t, err = self.curve(theta)
+        i = int(bits) - self.bits[0]
+        t[i], err[i] = t_count(gates), rz_error(gates, theta)
+
+    def curves(self, thetas):
+        """(t_counts, errors) of shape (len(thetas), len(self.bits))"""
+        points = [self.curve(theta) for theta in thetas]
+        return (np.array([t for t, _ in points]).reshape(len(thetas), -1),
+                np.array([e for _, e in points]).reshape(len(thetas), -1))
+
+
+def allocate_bits(thetas, budget, curves, iterations=60):
+    """
+    Precision per rotation minimizing the summed T-count within the budget.
+
+    Solves min sum T_i(b_i) subject to sum eps_i(b_i) <= budget by
+    Lagrangian relaxation: for a multiplier lam every rotation picks the
+    b minimizing T + lam * eps, all rotations at once, and lam is found by
+    bisection in log space.  Leftover budget is then spent greedily,
+    lowering the precision of the rotations that save the most T gates.
+
+    Returns (bits, predicted_t_counts, predicted_errors) arrays.  Raises
+    ValueError if even the most precise choice for every rotation does
+    not fit the budget.
+    """
+    if not len(thetas):
+        empty = np.zeros(0)
+        return empty.astype(int), empty, empty
+    T, E = curves.curves(thetas)
+    rows = np.arange(len(thetas))
+    floor = E.min(axis=1).sum()
+    if floor > budget:
+        raise ValueError(f"error budget {budget:.3e} is below the {floor:.3e} reachable with "
+                         f"{curves.bits[-1]}-bit rotations; lower the target fidelity")
+
+    def choose(lam):
+        return np.argmin(T + lam * E, axis=1)
+
+    lo, hi = 0.0, 80.0
+    if E[rows, choose(2.0 ** hi)].sum() <= budget:
+        for _ in range(iterations):
+            mid = (lo + hi) / 2
+            if E[rows, choose(2.0 ** mid)].sum() <= budget:
+                hi = mid
+            else:
+                lo = mid
+    idx = choose(2.0 ** hi)
+
+    # Greedy pass over the slack the relaxation leaves
+    slack = budget - E[rows, idx].sum()
+    for i in np.argsort(-(T[rows, idx] - T[rows, np.maximum(idx - 1, 0)])):
+        while idx[i] > 0:
+            extra = E[i, idx[i] - 1] - E[i, idx[i]]
+            if T[i, idx[i] - 1] > T[i, idx[i]] or extra > slack:
+                break
+            slack -= extra
+            idx[i] -= 1
+    return curves.bits[idx], T[rows, idx], E[rows, idx]
@@ -0,0 +1,345 @@
+import numpy as np
+from two_qubit_words import SINGLE_QUBIT_MATRICES, word_unitary
+
+
+# Elements of Z[omega], omega = e^{i pi/4}, are integer 4-vectors (a, b, c, d)
+# meaning a + b*omega + c*omega^2 + d*omega^3.  A matrix over Z[1/sqrt2, i]
+# is an integer array of such numerators with one common denominator sqrt2^k.
+
+SQRT2 = np.sqrt(2)
+
+
+def omega_mul(x, m=1):
+    """x * omega^m for numerators of shape (..., 4)"""
+    x = np.asarray(x)
+    m %= 8
+    if m >= 4:
+        x, m = -x, m - 4
+    return np.roll(x, m, axis=-1) * np.array([-1] * m + [1] * (4 - m))
+
+
+def sqrt2_mul(x):
+    """x * sqrt2, using sqrt2 = omega - omega^3"""
+    return omega_mul(x, 1) - omega_mul(x, 3)
+
+
+def to_complex(x):
+    """Complex value of numerators of shape (..., 4)"""
+    w = np.exp(1j * np.pi / 4 * np.arange(4))
+    return np.asarray(x) @ w
+
+
+def delta_valuation(x):
+    """
+    Largest v with (1 + omega)^v dividing x (None for x = 0).
+
+    x is divisible by delta = 1 + omega iff a + b + c + d is even, and
+    x / delta = y with 2*y0 = a + b - c + d, y1 = b - y0, y2 = c - y1,
+    y3 = d - y2.
+    """
+    a, b, c, d = (int(v) for v in x)
+    if a == b == c == d == 0:
+        return None
+    v = 0
+    while (a + b + c + d) % 2 == 0:
+        y0 = (a + b - c + d) // 2
+        y1 = b - y0
+        y2 = c - y1
+        a, b, c, d = y0, y1, y2, d - y2
+        v += 1
+    return v
+
+
+def entry_levels(col, k):
+    """delta-denominator exponent of each entry (2k - v_delta), -1 for zeros"""
+    levels = []
+    for x in col:
+        v = delta_valuation(x)
+        levels.append(-1 if v is None else 2 * k - v)
+    return levels
+
+
+def _ring_coefficients(values, tol):
+    """
+    Integers (p, q) with value ~ p + q / sqrt2 for each value, or None.
+
+    The search range for q is bounded by the magnitudes involved, which is
+    enough to make the representation unique at the tolerances used here.
+    """
+    bound = int(np.max(np.abs(values)) * SQRT2) + 2
+    q = np.arange(-bound, bound + 1)
+    residual = values[:, None] - q[None, :] / SQRT2
+    p = np.round(residual)
+    ok = np.abs(residual - p) < tol
+    if not ok.any(axis=1).all():
+        return None
+    idx = np.argmax(ok, axis=1)
+    rows = np.arange(len(values))
+    return p[rows, idx].astype(np.int64), q[idx]
+
+
+def ring_numerators(M, k, tol=1e-8):
+    """Numerators of M * sqrt2^k over Z[omega], or None if not integral"""
+    scaled = np.asarray(M).ravel() * SQRT2 ** k
+    re = _ring_coefficients(scaled.real, tol)
+    im = _ring_coefficients(scaled.imag, tol)
+    if re is None or im is None:
+        return None
+    # re = a + (b - d)/sqrt2, im = c + (b + d)/sqrt2
+    (a, u), (c, v) = re, im
+    if np.any((u + v) % 2):
+        return None
+    b = (u + v) // 2
+    d = (v - u) // 2
+    return np.stack([a, b, c, d], axis=-1).reshape(np.shape(M) + (4,))
+
+
+def _magnitudes_in_ring(U, tol, max_sde):
+    """Phase-independent filter: every |U_ij|^2 must lie in Z[1/sqrt2]"""
+    mag = (np.abs(U) ** 2).ravel()
+    for k in range(max_sde + 1):
+        if _ring_coefficients(mag * 2 ** k, tol) is not None:
+            return True
+    return False
+
+
+def exact_ring_form(U, tol=1e-8, max_sde=16):
+    """
+    Recognize U (up to global phase) as a matrix over Z[1/sqrt2, i].
+
+    The determinant of such a unitary is a power of omega, which leaves
+    8N candidate global phases for an N x N matrix; at most one class of
+    them (up to powers of omega) can work.  For each candidate the smallest
+    denominator exponent k <= max_sde with integral numerators is searched,
+    after a cheap rejection test on the entry magnitudes.
+
+    Returns (phase, k, numerators) with U ~ phase * numerators / sqrt2^k,
+    or None.
+    """
+    U = np.asarray(U, dtype=complex)
+    N = U.shape[0]
+    if not _magnitudes_in_ring(U, tol, max_sde):
+        return None
+    base = -np.angle(np.linalg.det(U)) / N
+    for l in range(8 * N):
+        phase = np.exp(1j * (base + np.pi * l / (4 * N)))
+        V = U * phase
+        for k in range(max_sde + 1):
+            A = ring_numerators(V, k, tol)
+            if A is not None:
+                return np.conj(phase), k, A
+    return None
+
+
+def _reduce_denominator(A, k):
+    """Divide out common factors of sqrt2 from all numerators"""
+    while k > 0 and np.all((A[..., 0] - A[..., 2]) % 2 == 0) \
+            and np.all((A[..., 1] - A[..., 3]) % 2 == 0):
+        A = sqrt2_mul(A) // 2
+        k -= 1
+    return A, k
+
+
+def _apply_h(A, k, i, j):
+    """H_[i,j] applied to rows i and j; all other rows gain a factor sqrt2"""
+    ri, rj = A[i].copy(), A[j].copy()
+    B = sqrt2_mul(A)
+    B[i], B[j] = ri + rj, ri - rj
+    return _reduce_denominator(B, k + 1)
+
+
+def column_reduce(A, k, paired=False):
+    """
+    Giles-Selinger column reduction of a unitary over Z[1/sqrt2, i].
+
+    Each column is driven to a unit vector by two-level H_[i,j] after a
+    relative omega^m phase on row j, picking the step that lowers the
+    column's (max delta-level, count at max) the most.  With paired=True
+    every omega^m on row j is balanced by omega^-m on another row, so all
+    phase operations have determinant one.
+
+    Returns the row operations G_1 ... G_r (with G_r ... G_1 U diagonal)
+    and the diagonal's omega exponents.  Operations are ('h', i, j),
+    ('x', i, j) and ('w', j, l, m) for omega^m on row j and omega^-m on
+    row l (l is None when unpaired).
+    """
+    A = np.array(A, dtype=np.int64)
+    N = A.shape[0]
+    ops = []
+
+    for c in range(N):
+        while True:
+            levels = entry_levels(A[c:, c], k)
+            top = max(levels)
+            if top <= 0:
+                break
+            score = (top, levels.count(top))
+            best = None
+            rows = [c + r for r, lv in enumerate(levels) if lv >= 0]
+            for i in rows:
+                for j in rows:
+                    if j <= i or top not in (levels[i - c], levels[j - c]):
+                        continue
+                    for m in range(8):
+                        B = A.copy()
+                        B[j] = omega_mul(B[j], m)
+                        B, k2 = _apply_h(B, k, i, j)
+                        lv = entry_levels(B[c:, c], k2)
+                        cand = (max(lv), lv.count(max(lv)))
+                        if cand < score and (best is None or cand < best[0]):
+                            best = (cand, i, j, m)
+            if best is None:
+                raise ValueError("column reduction failed; matrix is not unitary over the ring")
+            _, i, j, m = best
+            if m:
+                l = next(r for r in range(N) if r not in (i, j)) if paired else None
+                A[j] = omega_mul(A[j], m)
+                if l is not None:
+                    A[l] = omega_mul(A[l], -m)
+                ops.append(('w', j, l, m))
+            A, k = _apply_h(A, k, i, j)
+            ops.append(('h', i, j))
+
+        r = c + int(np.flatnonzero(np.any(A[c:, c] != 0, axis=-1))[0])
+        if r != c:
+            A[[c, r]] = A[[r, c]]
+            ops.append(('x', c, r))
+
+    if k != 0:
+        raise ValueError("column reduction left a nonzero denominator exponent")
+    # each diagonal entry is now a unit omega^p
+    units = [omega_mul(np.array([1, 0, 0, 0]), p) for p in range(8)]
+    diag = [next(p for p in range(8) if np.array_equal(A[r, r], units[p])) for r in range(N)]
+    return ops, diag
+
+
+def _phase_gates(m, q):
+    """omega^m on |1> of qubit q, i.e. T^m"""
+    table = {0: [], 1: ['t'], 2: ['s'], 3: ['s', 't'], 4: ['s', 's'],
+             5: ['sdg', 'tdg'], 6: ['sdg'], 7: ['tdg']}
+    return [(g, q) for g in table[m % 8]]
+
+
+def _controlled_phase_gates(k, c, t):
+    """diag(1, 1, 1, i^k) on (c, t)"""
+    k %= 4
+    if k == 0:
+        return []
+    if k == 2:
+        return [('h', t), ('cx', c, t), ('h', t)]
+    first, second = ('t', 'tdg') if k == 1 else ('tdg', 't')
+    return [(first, c), (first, t), ('cx', c, t), (second, t), ('cx', c, t)]
+
+
+def _controlled_gates(kind, param, c, t):
+    """Controlled single-qubit op with control c and target t (control on |1>)"""
+    if kind == 'x':
+        return [('cx', c, t)]
+    if kind == 'h':
+        return [('s', t), ('h', t), ('t', t), ('cx', c, t), ('tdg', t), ('h', t), ('sdg', t)]
+    # kind == 'd': diag(omega^a, omega^b) with b - a even
+    a, b = param
+    return _phase_gates(a, c) + _controlled_phase_gates((b - a) // 2, c, t)
+
+
+def two_level_gates(kind, i, j, param=None):
+    """
+    Gate list for a two-level operation on basis states i and j.
+
+    kind is 'h', 'x' (acting on (i, j) as H or X) or 'd' (diag(omega^a,
+    omega^b) with param = (a, b) and b - a even).  States differing in two
+    bits are first brought together with a CNOT.
+    """
+    pre = []
+    diff = i ^ j
+    if diff == 3:
+        # CX with control 0 maps |q1 q0> -> |q1^q0, q0>
+        perm = lambda s: s ^ ((s & 1) << 1)
+        pre = [('cx', 0, 1)]
+        i, j = perm(i), perm(j)
+        diff = i ^ j
+    t = diff.bit_length() - 1
+    c = 1 - t
+    conj = []
+    if (i >> t) & 1:
+        i, j = j, i
+        if kind == 'h':
+            conj.append(('x', t))
+        elif kind == 'd':
+            param = (param[1], param[0])
+    if not (i >> c) & 1:
+        conj.append(('x', c))
+    body = _controlled_gates(kind, param, c, t)
+    return pre + conj + body + conj[::-1] + pre[::-1]
+
+
+def exact_synthesis(U, tol=1e-8, max_sde=16):
+    """
+    Exact Clifford+T circuit for a 1- or 2-qubit unitary over Z[1/sqrt2, i].
+
+    Returns a gate list in the ('h', 0) / ('cx', 0, 1) format that equals U
+    up to global phase, or None if U is not exactly representable.  On two
+    qubits this needs det U to be a power of i (ancilla-free circuits cannot
+    produce an odd power of omega).  Larger unitaries return None even when
+    exactly representable (CCZ, Toffoli): their two-level steps would need
+    multi-controlled H / X and paired omega phases, which are not built here.
+    """
+    U = np.asarray(U, dtype=complex)
+    N = U.shape[0]
+    if N not in (2, 4):
+        return None
+    form = exact_ring_form(U, tol, max_sde)
+    if form is None:
+        return None
+    _, k, A = form
+    try:
+        ops, diag = column_reduce(A, k, paired=(N == 4))
+    except ValueError:
+        return None
+
+    # U = G_1^dag ... G_r^dag D: apply D first, then G_r^dag, ..., G_1^dag
+    if N == 2:
+        gates = _phase_gates(diag[1] - diag[0], 0)
+        for kind, *args in reversed(ops):
+            if kind == 'w':
+                j, _, m = args
+                gates += _phase_gates(-m if j == 1 else m, 0)
+            else:
+                gates.append((kind, 0))
+        return gates
+
+    # Fold the diagonal into pairwise phases diag(omega^-p, omega^p) plus a
+    # final i^q on |11>
+    gates = []
+    carry = 0
+    for r in range(N - 1):
+        p = (diag[r] + carry) % 8
+        if p:
+            gates += two_level_gates('d', r, r + 1, (p, -p))
+        carry = p
+    total = diag[N - 1] + carry
+    if total % 2:
+        return None
+    gates += _controlled_phase_gates(total // 2, 0, 1)
+
+    for kind, *args in reversed(ops):
+        if kind == 'w':
+            j, l, m = args
+            # inverse of omega^m on j and omega^-m on l
+            i, jj = min(j, l), max(j, l)
+            gates += two_level_gates('d', i, jj, (-m, m) if i == j else (m, -m))
+        else:
+            gates += two_level_gates(kind, *args)
+    return gates
+
+
+def verify_exact(U, gates, n, atol=1e-8):
+    """True if the gate list reproduces U up to global phase"""
+    if n == 1:
+        V = np.eye(2, dtype=complex)
+        for g, _ in gates:
+            V = SINGLE_QUBIT_MATRICES[g] @ V
+    else:
+        V = word_unitary(gates)
+    overlap = np.trace(V.conj().T @ U)
+    return np.isclose(abs(overlap), U.shape[0], atol=atol)
@@ -0,0 +1,147 @@
+import hashlib
+import math
+import os
+import sqlite3
+import time
+
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'gridsynth', 'cache.sqlite')
+
+
+def default_cache_path():
+    """Cache location, overridable with $GRIDSYNTH_CACHE ('' disables caching)"""
+    return os.environ.get('GRIDSYNTH_CACHE', DEFAULT_CACHE_PATH)
+
+
+# Extra decimal digits of the cached angle beyond the synthesis precision, so
+# reusing a neighbouring angle's sequence adds at most 1e-3 of its error
+GUARD_DIGITS = 3
+
+
+def precision_digits(precision):
+    """Decimal digits needed to resolve an angle to the given precision"""
+    return max(0, int(math.ceil(-math.log10(precision)))) if precision > 0 else 16
+
+
+def flag_precision(flags, default):
+    """Synthesis precision set by GridSynth flags (-b bits or -d digits), else default"""
+    flags = list(flags)
+    for flag, base in (('-b', 2.0), ('-d', 10.0)):
+        if flag in flags and flags.index(flag) + 1 < len(flags):
+            return base ** -float(flags[flags.index(flag) + 1])
+    return default
+
+
+class GridSynthCache:
+    """
+    Content-addressed SQLite store of raw GridSynth output.
+
+    Entries are keyed by (angle rounded GUARD_DIGITS past the precision,
+    precision, command-line flags), so repeat compilations of the same
+    rotation skip the subprocess.  The precision is the one the flags ask
+    GridSynth for (-b bits is 2^-bits); the precision argument only
+    applies to flags that do not set one.  The store is bounded to max_entries and
+    evicts the least recently used results first.  hits / misses count
+    lookups made through this instance.
+    """
+
+    def __init__(self, path=None, max_entries=100_000):
+        self.path = default_cache_path() if path is None else path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            if self.path != ':memory:':
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30)
+            # Each hit writes its LRU time; WAL with relaxed syncing keeps
+            # those commits off the disk's flush path
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                ' key TEXT PRIMARY KEY, angle TEXT, precision REAL, flags TEXT,'
+                ' output TEXT, last_used REAL)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS lru ON results(last_used)')
+        return self._conn
+
+    @staticmethod
+    def key(theta, precision, flags):
+        """Hash of the rounded angle, precision and flags"""
+        precision = flag_precision(flags, precision)
+        digits = precision_digits(precision) + GUARD_DIGITS
+        angle = f"{round(float(theta), digits):.{digits}f}"
+        text = f"{angle}|{precision!r}|{' '.join(flags)}"
+        return hashlib.sha256(text.encode()).hexdigest(), angle
+
+    def _lookup(self, key):
+        conn = self._connect()
+        row = conn.execute('SELECT output FROM results WHERE key = ?', (key,)).fetchone()
+        if row is not None:
+            with conn:
+                conn.execute('UPDATE results SET last_used = ? WHERE key = ?', (time.time(), key))
+        return row
+
+    def get_any(self, theta, precision, flag_sets):
+        """(flags, output) for the first flag set with a cached result, or None"""
+        for flags in flag_sets:
+            row = self._lookup(self.key(theta, precision, flags)[0])
+            if row is not None:
+                self.hits += 1
+                return flags, row[0]
+        self.misses += 1
+        return None
+
+    def get(self, theta, precision, flags):
+        """Cached output string, or None on a miss"""
+        hit = self.get_any(theta, precision, [flags])
+        return None if hit is None else hit[1]
+
+    def peek(self, theta, precision, flags):
+        """Cached output string or None, without counting a lookup or touching its LRU time"""
+        row = self._connect().execute(
+            'SELECT output FROM results WHERE key = ?', (self.key(theta, precision, flags)[0],)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def put(self, theta, precision, flags, output):
+        """Store an output string and evict the oldest entries past max_entries"""
+        key, angle = self.key(theta, precision, flags)
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)',
+                (key, angle, flag_precision(flags, precision), ' '.join(flags), output, time.time()),
+            )
+            excess = len(self) - self.max_entries
+            if excess > 0:
+                conn.execute(
+                    'DELETE FROM results WHERE key IN '
+                    '(SELECT key FROM results ORDER BY last_used ASC LIMIT ?)',
+                    (excess,),
+                )
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM results')
+
+    def stats(self):
+        return {'entries': len(self), 'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __getstate__(self):
+        # Connections cannot cross process boundaries; reopen lazily
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        return state
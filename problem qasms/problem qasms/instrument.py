@@ -0,0 +1,155 @@
+import atexit
+import contextlib
+import json
+import os
+import threading
+import time
+
+
+# Set to a path to record every run of a script and write <path> (JSON)
+# and <path minus .json>.trace.json (Chrome trace) at exit
+TRACE_ENV = 'PIPELINE_TRACE'
+
+_recorder = None
+
+
+class Recorder:
+    """
+    Timing spans and counters of one profiled run.
+
+    Spans are complete intervals with their thread and nesting depth;
+    counters are running totals, also sampled over time for the trace
+    viewer.  Span appends from GridSynth worker threads are single list
+    appends; counter updates read and write a total, so they take a lock.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.counters = {}
+        self.samples = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def now(self):
+        return (time.perf_counter() - self.origin) * 1e6
+
+    def count(self, name, value):
+        with self._lock:
+            total = self.counters.get(name, 0) + value
+            self.counters[name] = total
+            self.samples.append((self.now(), name, total))
+
+    def to_dict(self):
+        """JSON-ready spans (microseconds) and counter totals"""
+        return {
+            'spans': [{'name': name, 'start_us': start, 'duration_us': duration,
+                       'thread': thread, 'depth': depth, 'args': args}
+                      for name, start, duration, thread, depth, args in self.spans],
+            'counters': dict(self.counters),
+        }
+
+    def chrome_trace(self):
+        """Trace Event Format dict for chrome://tracing or Perfetto"""
+        pid = os.getpid()
+        events = [{'name': name, 'ph': 'X', 'ts': start, 'dur': duration,
+                   'pid': pid, 'tid': thread, 'args': args}
+                  for name, start, duration, thread, _, args in self.spans]
+        events += [{'name': name, 'ph': 'C', 'ts': ts, 'pid': pid, 'args': {name: total}}
+                   for ts, name, total in self.samples]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save(self, path):
+        """Write path (JSON summary) and the matching .trace.json Chrome trace"""
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1)
+        with open(trace_path(path), 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+
+class _Span:
+    __slots__ = ('recorder', 'name', 'args', 'start', 'depth')
+
+    def __init__(self, recorder, name, args):
+        self.recorder = recorder
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        local = self.recorder._local
+        self.depth = getattr(local, 'depth', 0)
+        local.depth = self.depth + 1
+        self.start = self.recorder.now()
+        return self
+
+    def __exit__(self, *exc):
+        recorder = self.recorder
+        recorder.spans.append((self.name, self.start, recorder.now() - self.start,
+                               threading.get_ident(), self.depth, self.args))
+        recorder._local.depth = self.depth
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, **args):
+    """Context manager timing a stage; a shared no-op while recording is off"""
+    if _recorder is None:
+        return _NULL_SPAN
+    return _Span(_recorder, name, args)
+
+
+def count(name, value=1):
+    """Add value to a counter; does nothing while recording is off"""
+    if _recorder is not None:
+        _recorder.count(name, value)
+
+
+@contextlib.contextmanager
+def stage(timings, name, **args):
+    """span() that also stores the stage's wall time in timings[name] (seconds)"""
+    start = time.perf_counter()
+    with span(name, **args):
+        yield
+    timings[name] = time.perf_counter() - start
+
+
+def enable():
+    """Start a fresh recording and return its Recorder"""
+    global _recorder
+    _recorder = Recorder()
+    return _recorder
+
+
+def trace_path(path):
+    root = path[:-5] if path.endswith('.json') else path
+    return root + '.trace.json'
+
+
+@contextlib.contextmanager
+def recording(path=None):
+    """Record the enclosed block and save it to path (if given) afterwards"""
+    global _recorder
+    previous = _recorder
+    _recorder = recorder = Recorder()
+    try:
+        yield recorder
+    finally:
+        _recorder = previous
+        if path:
+            recorder.save(path)
+
+
+if os.environ.get(TRACE_ENV):
+    atexit.register(lambda recorder, path: recorder.save(path), enable(), os.environ[TRACE_ENV])
@@ -0,0 +1,237 @@
+import sys
+import numpy as np
+from two_qubit_words import H, S, SDG, X, Y, Z, I2
+
+
+CLIFFORD_GATES = {'h': H, 's': S, 'sdg': SDG, 'x': X, 'y': Y, 'z': Z, 'id': I2}
+SINGLE_QUBIT_GATES = set(CLIFFORD_GATES) | {'t', 'tdg'}
+PAULIS = {'X': X, 'Y': Y, 'Z': Z}
+
+
+def _phase_key(M):
+    """Hashable key of a 2x2 matrix modulo global phase"""
+    flat = M.ravel()
+    pivot = flat[np.argmax(np.abs(flat) > 1e-9)]
+    N = flat * (abs(pivot) / pivot)
+    return tuple(np.round(N.real, 6) + 0) + tuple(np.round(N.imag, 6) + 0)
+
+
+def _build_clifford_group():
+    """
+    The 24 single-qubit Cliffords mod phase, with multiplication tables.
+
+    Elements are found breadth-first from H, S and S^dag, so words[i] is a
+    shortest time-ordered word for element i.
+    """
+    mats = [I2]
+    words = [[]]
+    index = {_phase_key(I2): 0}
+    frontier = [0]
+    while frontier:
+        nxt = []
+        for i in frontier:
+            for name in ('h', 's', 'sdg'):
+                M = CLIFFORD_GATES[name] @ mats[i]
+                key = _phase_key(M)
+                if key not in index:
+                    index[key] = len(mats)
+                    mats.append(M)
+                    words.append(words[i] + [name])
+                    nxt.append(len(mats) - 1)
+        frontier = nxt
+
+    def lookup(M):
+        return index[_phase_key(M)]
+
+    mul = [[lookup(a @ b) for b in mats] for a in mats]
+    # conj[c][P] = (Q, sign) with C P C^dag = sign * Q
+    conj = []
+    for C in mats:
+        row = {}
+        for p, P in PAULIS.items():
+            M = C @ P @ C.conj().T
+            for q, Q in PAULIS.items():
+                for sign in (1, -1):
+                    if np.allclose(M, sign * Q):
+                        row[p] = (q, sign)
+        conj.append(row)
+    return mats, words, mul, conj, lookup
+
+
+CLIFFORD_MATRICES, CLIFFORD_WORDS, CLIFFORD_MUL, CLIFFORD_CONJ, clifford_index = _build_clifford_group()
+GATE_INDEX = {name: clifford_index(M) for name, M in CLIFFORD_GATES.items()}
+
+# V_P maps Z to P; the pi/8 rotation about P is R_P = V_P T V_P^dag and
+# R_P^2 = S_P = V_P S V_P^dag is Clifford
+_FRAMES = {'Z': I2, 'X': H, 'Y': S @ H}
+S_AXIS = {p: clifford_index(V @ S @ V.conj().T) for p, V in _FRAMES.items()}
+SDG_AXIS = {p: clifford_index(V @ SDG @ V.conj().T) for p, V in _FRAMES.items()}
+IDENTITY = clifford_index(I2)
+H_INDEX = GATE_INDEX['h']
+# (SH)^dag = H S^dag, left over after writing R_Y as the syllable SHT
+SH_DAG = clifford_index(H @ SDG)
+
+
+def axis_form(gates):
+    """
+    Reduce a time-ordered single-qubit H/S/T word to R_P1 ... R_Pk C.
+
+    Gates are right-multiplied in reverse time order.  A T meets the
+    current Clifford C as C T = R_Q C (Q = C Z C^dag, a sign becoming an
+    extra S_Q^dag); a rotation about the same axis as the last one merges
+    into the Clifford S_Q, otherwise it is appended.  Consecutive axes
+    therefore differ, which makes the form unique and T-optimal.  O(1)
+    table lookups per gate.
+
+    Returns (axes, clifford_index) in matrix order.
+    """
+    axes = []
+    C = IDENTITY
+    for name in reversed(gates):
+        if name in GATE_INDEX:
+            C = CLIFFORD_MUL[C][GATE_INDEX[name]]
+            continue
+        if name not in ('t', 'tdg'):
+            raise ValueError(f"not a single-qubit Clifford+T gate: {name!r}")
+        q, sign = CLIFFORD_CONJ[C]['Z']
+        if sign < 0:
+            C = CLIFFORD_MUL[SDG_AXIS[q]][C]
+        if axes and axes[-1] == q:
+            axes.pop()
+            C = CLIFFORD_MUL[S_AXIS[q]][C]
+        else:
+            axes.append(q)
+        if name == 'tdg':
+            # T^dag = T S^dag
+            C = CLIFFORD_MUL[C][GATE_INDEX['sdg']]
+    return axes, C
+
+
+def matsumoto_amano(gates):
+    """
+    Matsumoto-Amano normal form (T|e)(HT|SHT)* C of a single-qubit word.
+
+    Returns (syllables, clifford_word): syllables in matrix order, each
+    'T', 'HT' or 'SHT', and a shortest time-ordered word for C.
+    """
+    axes, C = axis_form(gates)
+    syllables = []
+    K = IDENTITY
+    for p in axes:
+        # K R_P = R_Q K, with -Q written as R_Q S_Q^dag
+        q, sign = CLIFFORD_CONJ[K][p]
+        if sign < 0:
+            K = CLIFFORD_MUL[SDG_AXIS[q]][K]
+        if q == 'Z':
+            syllables.append('T')
+        elif q == 'X':
+            syllables.append('HT')
+            K = CLIFFORD_MUL[H_INDEX][K]
+        else:
+            syllables.append('SHT')
+            K = CLIFFORD_MUL[SH_DAG][K]
+    return syllables, CLIFFORD_WORDS[CLIFFORD_MUL[K][C]]
+
+
+# Syllables in time order: HT applies T first
+SYLLABLE_GATES = {'T': ['t'], 'HT': ['t', 'h'], 'SHT': ['t', 'h', 's']}
+
+
+def normal_form_gates(gates):
+    """Time-ordered gate names of the Matsumoto-Amano normal form"""
+    syllables, clifford = matsumoto_amano(gates)
+    # matrix order A_1 ... A_k C is applied right to left
+    out = list(clifford)
+    for syllable in reversed(syllables):
+        out += SYLLABLE_GATES[syllable]
+    return out
+
+
+def t_count(names):
+    return sum(1 for name in names if name in ('t', 'tdg'))
+
+
+def compress_circuit(gates):
+    """
+    Rewrite every single-qubit Clifford+T run of a circuit in normal form.
+
+    gates are (name, params, qubits) tuples.  Runs are collected per qubit
+    and flushed when another gate touches the qubit, so the circuit is read
+    once.  A run is replaced only if that lowers its T-count, or its length
+    at equal T-count.
+    """
+    out = []
+    runs = {}
+
+    def flush(q):
+        run = runs.pop(q, None)
+        if not run:
+            return
+        names = [name for name, _, _ in run]
+        new = normal_form_gates(names)
+        if (t_count(new), len(new)) < (t_count(names), len(names)):
+            run = [(name, (), (q,)) for name in new]
+        out.extend(run)
+
+    for gate in gates:
+        name, params, qubits = gate
+        if len(qubits) == 1 and name in SINGLE_QUBIT_GATES:
+            runs.setdefault(qubits[0], []).append(gate)
+            continue
+        for q in qubits:
+            flush(q)
+        out.append(gate)
+    for q in list(runs):
+        flush(q)
+    return out
+
+
+def optimize_qasm(lines):
+    """Normal-form every single-qubit run of a QASM circuit; returns (qasm_text, report)"""
+    from qasm_stream import iter_qasm_gates
+    from phase_folding import gates_to_qasm
+
+    diagnostics = []
+    registers = {}
+    gates = list(iter_qasm_gates(lines, diagnostics, registers))
+    compressed = compress_circuit(gates)
+    names = [name for name, _, _ in gates]
+    new_names = [name for name, _, _ in compressed]
+    report = {
+        't_count_before': t_count(names),
+        't_count_after': t_count(new_names),
+        'gates_before': len(gates),
+        'gates_after': len(compressed),
+        'diagnostics': [f"line {l}: {m}" for l, m in diagnostics],
+    }
+    return gates_to_qasm(compressed, registers), report
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Matsumoto-Amano normal form for single-qubit Clifford+T runs")
+    parser.add_argument('qasm')
+    parser.add_argument('-o', '--output', help="write the rewritten QASM here instead of stdout")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        with open(args.qasm) as f:
+            text, report = optimize_qasm(f)
+    except ValueError as e:
+        print(f"✗ {args.qasm}: {e}", file=sys.stderr)
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+
+    for line in report['diagnostics']:
+        print(f"  ! {line}", file=sys.stderr)
+    print(f"T-count {report['t_count_before']} -> {report['t_count_after']}, "
+          f"gates {report['gates_before']} -> {report['gates_after']} "
+          f"({elapsed * 1e3:.1f} ms)", file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
@@ -0,0 +1,307 @@
+import sys
+import numpy as np
+from phase_polynomial import (evaluate_phase_polynomial, mobius_transform, phase_polynomial_terms,
+                              solve_phase_polynomial)
+from phase_folding import PHASE_GATES, T_ONLY_GATES
+from pauli_compiler import gates_to_qasm, gate_counts
+
+
+def _phase(gates, table, q, c):
+    gates += [(g, (q,)) for g in table[c % 8]]
+
+
+def linear_synth(state, n):
+    """
+    CNOTs taking wire parities state[q] (bitmasks over x) back to x_q.
+
+    Gaussian elimination, column by column: at most n^2 CNOTs.
+    """
+    state = list(state)
+    gates = []
+
+    def cx(c, t):
+        state[t] ^= state[c]
+        gates.append(('cx', (c, t)))
+
+    for col in range(n):
+        bit = 1 << col
+        if not state[col] & bit:
+            pivot = next(r for r in range(col + 1, n) if state[r] & bit)
+            cx(pivot, col)
+        for r in range(n):
+            if r != col and state[r] & bit:
+                cx(col, r)
+    return gates
+
+
+def gray_synth(n, terms, t_only=False):
+    """
+    Ancilla-free CNOT + phase network for sum_a c_a (a.x mod 2) * pi/4.
+
+    GraySynth (Amy, Azimzadeh, Mosca): the parities are split recursively
+    on the qubit that most of them agree on, and within a group CNOTs onto
+    one target wire clear the bits that every parity in the group shares,
+    so neighbouring parities are reached with one CNOT each, as in a Gray
+    code.  A phase is placed as soon as a wire carries its parity, and
+    the remaining linear map is undone by Gaussian elimination at the end.
+
+    terms are (parity_mask, coefficient mod 8) pairs; returns (name, qubits)
+    gates.  Phases use T / T^dag only if t_only, else also S, S^dag and Z.
+    """
+    table = T_ONLY_GATES if t_only else PHASE_GATES
+    gates = []
+    state = [1 << q for q in range(n)]
+
+    masks = np.array([a for a, c in terms if a and c % 8], dtype=np.int64)
+    coeffs = {a: c % 8 for a, c in terms if a and c % 8}
+    # v[k]: parity k in the basis of the current wire values
+    v = masks.copy()
+    alive = np.ones(len(v), dtype=bool)
+
+    def emit_ready(q):
+        ready = np.flatnonzero(alive & (v == 1 << q))
+        for k in ready:
+            _phase(gates, table, q, coeffs[int(masks[k])])
+        alive[ready] = False
+
+    def cx(c, t):
+        # wire t becomes w_t + w_c, so parities with bit t pick up bit c
+        state[t] ^= state[c]
+        v[:] ^= ((v >> t) & 1) << c
+        gates.append(('cx', (c, t)))
+        emit_ready(t)
+
+    for q in range(n):
+        emit_ready(q)
+
+    stack = [(np.flatnonzero(alive), list(range(n)), None)]
+    while stack:
+        group, rows, target = stack.pop()
+        group = group[alive[group]]
+        if not len(group):
+            continue
+        if target is not None:
+            while True:
+                shared = int(np.bitwise_and.reduce(v[group]))
+                if not shared >> target & 1:
+                    # CNOTs from other groups moved the target bit; split again
+                    target = None
+                    break
+                shared &= ~(1 << target)
+                if not shared:
+                    break
+                cx((shared & -shared).bit_length() - 1, target)
+                group = group[alive[group]]
+                if not len(group):
+                    break
+            if not len(group):
+                continue
+        if not rows:
+            continue
+        ones = [int(((v[group] >> j) & 1).sum()) for j in rows]
+        best = max(range(len(rows)), key=lambda r: max(ones[r], len(group) - ones[r]))
+        j = rows[best]
+        rest = rows[:best] + rows[best + 1:]
+        bit = ((v[group] >> j) & 1).astype(bool)
+        stack.append((group[bit], rest, j if target is None else target))
+        stack.append((group[~bit], rest, target))
+
+    # Anything the recursion left over gets its own CNOT ladder
+    for k in np.flatnonzero(alive):
+        t = int(v[k]).bit_length() - 1
+        while alive[k]:
+            rest = int(v[k]) & ~(1 << t)
+            cx((rest & -rest).bit_length() - 1, t)
+
+    return gates + linear_synth(state, n)
+
+
+def clifford_part(f, odd, n):
+    """
+    (linear, cz) with f - f(0) - sum_a odd[a] (a.x) = 2 sum_i linear[i] x_i
+    + 4 sum_{(i, j) in cz} x_i x_j (mod 8).
+
+    The rest is even-valued, so halved it is a Z4 function of degree <= 2
+    with even quadratic coefficients: S powers and CZs.  cz is a bitmask
+    over the pairs in pair_index(n) order.
+    """
+    coeffs = np.zeros(1 << n, dtype=np.int64)
+    for a, c in odd.items():
+        coeffs[a] = c
+    rest = (f - f[0] - evaluate_phase_polynomial(coeffs)) % 8
+    m = mobius_transform(rest // 2, modulus=4)
+    linear = [int(m[1 << i]) for i in range(n)]
+    cz = 0
+    for k, (i, j) in enumerate(pair_index(n)):
+        if m[(1 << i) | (1 << j)] == 2:
+            cz |= 1 << k
+    return linear, cz
+
+
+def pair_index(n):
+    """Qubit pairs (i < j) in the bit order of a CZ mask"""
+    return [(i, j) for i in range(n) for j in range(i + 1, n)]
+
+
+def _clique(a, n):
+    """Bitmask of the pairs inside parity a"""
+    return sum(1 << k for k, (i, j) in enumerate(pair_index(n)) if a >> i & 1 and a >> j & 1)
+
+
+def diagonal_terms(f_target, optimize=True, t_only=False, max_exhaustive=12):
+    """
+    Parity terms for exp(i pi f(x) / 4) with few multi-qubit parities.
+
+    The odd coefficients from solve_phase_polynomial fix the T-count; the
+    even rest is rewritten as S powers and CZs rather than kept on the
+    solver's canonical high-weight parities.  Adding 2 to an odd c_a
+    keeps its T and toggles the CZs on every pair inside a, so the CZ set
+    is reduced over GF(2) by these cliques (Gaussian elimination), then
+    greedily while a single toggle still removes more CZs than it adds.
+    Each remaining CZ becomes 4 x_i x_j = 2 x_i + 2 x_j + 6 (x_i + x_j).
+    Finally 4 is added to those odd c_a where that shortens the phase
+    gates (counted in the table chosen by t_only), over all subsets of up
+    to max_exhaustive multi-qubit terms and greedily beyond.  Returns ({parity_mask: coefficient}, n).
+    """
+    coeffs, _, _ = solve_phase_polynomial(f_target, optimize=optimize)
+    n = len(coeffs).bit_length() - 1
+    f = np.asarray(f_target, dtype=np.int64) % 8
+    odd = {a: c for a, c in phase_polynomial_terms(coeffs) if c % 2}
+    _, cz = clifford_part(f, odd, n)
+
+    cliques = {a: _clique(a, n) for a in odd}
+    # pivot bit -> (clique combination, set of terms it toggles)
+    basis = {}
+    for a, vec in cliques.items():
+        used = {a}
+        for pivot in sorted(basis, reverse=True):
+            bvec, bused = basis[pivot]
+            if vec >> pivot & 1:
+                vec ^= bvec
+                used ^= bused
+        if vec:
+            basis[vec.bit_length() - 1] = (vec, used)
+    shifted = set()
+    for pivot in sorted(basis, reverse=True):
+        vec, used = basis[pivot]
+        if cz >> pivot & 1:
+            cz ^= vec
+            shifted ^= used
+    improved = True
+    while improved:
+        improved = False
+        for a, vec in cliques.items():
+            if 2 * bin(cz & vec).count('1') > bin(vec).count('1'):
+                cz ^= vec
+                shifted ^= {a}
+                improved = True
+    for a in shifted:
+        odd[a] = (odd[a] + 2) % 8
+
+    linear, cz = clifford_part(f, odd, n)
+    terms = dict(odd)
+    for i in range(n):
+        terms[1 << i] = terms.get(1 << i, 0) + 2 * linear[i]
+    for k, (i, j) in enumerate(pair_index(n)):
+        if cz >> k & 1:
+            terms[(1 << i) | (1 << j)] = terms.get((1 << i) | (1 << j), 0) + 6
+            terms[1 << i] += 2
+            terms[1 << j] += 2
+
+    # Adding 4 to an odd c_a adds 4 to the single-qubit phase of each of
+    # its qubits and leaves the CZs alone
+    table = T_ONLY_GATES if t_only else PHASE_GATES
+    length = np.array([len(table[c]) for c in range(8)])
+    multi = [a for a in odd if a & (a - 1)]
+    single = np.array([terms[1 << i] % 8 for i in range(n)], dtype=np.int64)
+    coeff = np.array([terms[a] % 8 for a in multi], dtype=np.int64)
+    B = np.array([[a >> i & 1 for i in range(n)] for a in multi], dtype=np.int64).reshape(-1, n)
+    if len(multi) <= max_exhaustive:
+        Y = (np.arange(1 << len(multi))[:, None] >> np.arange(len(multi))) & 1
+        cost = (length[(coeff + 4 * Y) % 8].sum(axis=1)
+                + length[(single + 4 * (Y @ B)) % 8].sum(axis=1))
+        shift = Y[int(np.argmin(cost))]
+    else:
+        shift = np.zeros(len(multi), dtype=np.int64)
+        current = single.copy()
+        improved = True
+        while improved:
+            improved = False
+            for k in range(len(multi)):
+                moved = (current + 4 * B[k]) % 8
+                delta = (length[(coeff[k] + 4 - 4 * shift[k]) % 8] - length[(coeff[k] + 4 * shift[k]) % 8]
+                         + length[moved].sum() - length[current].sum())
+                if delta < 0:
+                    shift[k] ^= 1
+                    current = moved
+                    improved = True
+    for a, y in zip(multi, shift):
+        terms[a] += 4 * int(y)
+    single = (single + 4 * (shift @ B)) % 8
+    for i in range(n):
+        terms[1 << i] = int(single[i])
+    return {a: c % 8 for a, c in terms.items() if c % 8}, n
+
+
+def synthesize_diagonal(f_target, optimize=True, t_only=False):
+    """
+    Clifford+T circuit for the diagonal unitary exp(i pi f(x) / 4).
+
+    f_target lists f(x) mod 8 for x = 0 .. 2^n - 1 (bit i of x is q[i]).
+    The parities come from diagonal_terms and the network from
+    gray_synth; the global phase f(0) is dropped.  Returns (gates, n).
+    """
+    terms, n = diagonal_terms(f_target, optimize, t_only)
+    return gray_synth(n, sorted(terms.items()), t_only), n
+
+
+def diagonal_phases(gates, n):
+    """f(x) mod 8 of a CNOT + phase network, by tracking wire parities"""
+    from phase_folding import PHASES
+    x = np.arange(1 << n, dtype=np.int64)
+    wires = [(x >> q) & 1 for q in range(n)]
+    f = np.zeros(1 << n, dtype=np.int64)
+    for name, qubits in gates:
+        if name == 'cx':
+            c, t = qubits
+            wires[t] = wires[t] ^ wires[c]
+        else:
+            f += PHASES[name] * wires[qubits[0]]
+    return f % 8
+
+
+def load_phase_table(path):
+    """f(x) values from a JSON list or whitespace / comma separated integers"""
+    with open(path) as f:
+        text = f.read()
+    return [int(tok) for tok in text.replace('[', ' ').replace(']', ' ').replace(',', ' ').split()]
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Synthesize a diagonal unitary exp(i pi f(x)/4) as a CNOT+T parity network")
+    parser.add_argument('table', help="file with f(x) mod 8 for x = 0 .. 2^n - 1")
+    parser.add_argument('-o', '--output', help="write QASM here instead of stdout")
+    parser.add_argument('--t-only', action='store_true', help="write phases with T / T^dag only")
+    parser.add_argument('--no-optimize', action='store_true', help="skip the Reed-Muller T-count search")
+    args = parser.parse_args()
+
+    f_target = load_phase_table(args.table)
+    start = time.perf_counter()
+    gates, n = synthesize_diagonal(f_target, not args.no_optimize, args.t_only)
+    elapsed = time.perf_counter() - start
+
+    f = np.asarray(f_target) % 8
+    ok = np.array_equal((diagonal_phases(gates, n) - f + f[0]) % 8, np.zeros_like(f))
+    counts = gate_counts(gates)
+    print(f"{n} qubits: T-count {counts.get('t', 0) + counts.get('tdg', 0)}, "
+          f"CNOTs {counts.get('cx', 0)}, {len(gates)} gates ({elapsed * 1e3:.1f} ms) "
+          f"{'✓' if ok else '✗'}", file=sys.stderr)
+    text = gates_to_qasm(gates, n)
+    if args.output:
+        with open(args.output, 'w') as out:
+            out.write(text)
+    else:
+        sys.stdout.write(text)
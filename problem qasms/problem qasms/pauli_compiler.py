@@ -0,0 +1,551 @@
+import numpy as np
+from scipy import sparse
+from pauli_program import load_pauli_program, pauli_masks
+from phase_polynomial import evaluate_phase_polynomial, phase_polynomial_terms, solve_phase_polynomial
+
+
+ONE = np.uint64(1)
+INVERSE = {'h': 'h', 'cx': 'cx', 't': 'tdg', 'tdg': 't', 's': 'sdg', 'sdg': 's'}
+# Gates outside {H, T, T†, CNOT} written as T powers
+EXPANSION = {'s': ['t', 't'], 'sdg': ['tdg', 'tdg']}
+# Rows of the anticommutation graph built per vectorized chunk
+GRAPH_CHUNK = 256
+
+
+def _bits(a, q):
+    """Bit q of every mask in a, as uint64 0/1"""
+    return (a >> np.uint64(q)) & ONE
+
+
+class PauliTable:
+    """
+    Pauli rotations exp(-i k pi/8 P) packed as symplectic bit masks.
+
+    x, z are uint64 arrays (bit q <-> qubit q), sign is the (-1)^sign
+    prefactor with Y = iXZ written as a single letter (the
+    Aaronson-Gottesman convention) and k the angle in units of pi/8.
+    h, s and cx conjugate every row at once, P -> G P G^dag, and append
+    the gate to self.gates, so the table doubles as the Clifford frame.
+    """
+
+    def __init__(self, n, x, z, sign, k):
+        if n > 64:
+            raise ValueError(f"at most 64 qubits fit a uint64 mask, got {n}")
+        self.n = n
+        self.x = np.asarray(x, dtype=np.uint64)
+        self.z = np.asarray(z, dtype=np.uint64)
+        self.sign = np.asarray(sign, dtype=np.uint64)
+        self.k = np.asarray(k, dtype=np.int64)
+        self.gates = []
+
+    @classmethod
+    def from_terms(cls, n, terms):
+        """Table for [(pauli, theta)] as returned by load_pauli_program"""
+        masks = np.array([pauli_masks(p) for p, _ in terms], dtype=np.uint64).reshape(-1, 2)
+        k = np.array([theta * 8 / np.pi for _, theta in terms])
+        if not np.allclose(k, np.round(k)):
+            raise ValueError("angles must be multiples of pi/8")
+        return cls(n, masks[:, 0], masks[:, 1], np.zeros(len(terms)), np.round(k))
+
+    def __len__(self):
+        return len(self.k)
+
+    def select(self, start, stop):
+        return PauliTable(self.n, self.x[start:stop], self.z[start:stop],
+                          self.sign[start:stop], self.k[start:stop])
+
+    def take(self, index):
+        """Table of the rows at index (an int array), in that order"""
+        return PauliTable(self.n, self.x[index], self.z[index], self.sign[index], self.k[index])
+
+    def h(self, q):
+        xq, zq = _bits(self.x, q), _bits(self.z, q)
+        self.sign ^= xq & zq
+        flip = (xq ^ zq) << np.uint64(q)
+        self.x ^= flip
+        self.z ^= flip
+        self.gates.append(('h', (q,)))
+
+    def s(self, q):
+        xq, zq = _bits(self.x, q), _bits(self.z, q)
+        self.sign ^= xq & zq
+        self.z ^= xq << np.uint64(q)
+        self.gates.append(('s', (q,)))
+
+    def cx(self, c, t):
+        xc, zc = _bits(self.x, c), _bits(self.z, c)
+        xt, zt = _bits(self.x, t), _bits(self.z, t)
+        self.sign ^= xc & zt & (xt ^ zc ^ ONE)
+        self.x ^= xc << np.uint64(t)
+        self.z ^= zt << np.uint64(c)
+        self.gates.append(('cx', (c, t)))
+
+    def cz(self, a, b):
+        self.h(b)
+        self.cx(a, b)
+        self.h(b)
+
+    def merged(self):
+        """
+        Fold rotations on identical Paulis into one (valid when they commute).
+
+        Angles add mod 8 (k = 8 is a global phase of -1); zero rotations
+        are dropped.
+        """
+        if not len(self):
+            return self
+        rows, inverse = np.unique(np.stack([self.x, self.z], axis=1), axis=0, return_inverse=True)
+        signed = np.where(self.sign == 1, -self.k, self.k)
+        total = np.zeros(len(rows), dtype=np.int64)
+        np.add.at(total, inverse.ravel(), signed)
+        total %= 8
+        keep = total != 0
+        return PauliTable(self.n, rows[keep, 0], rows[keep, 1], np.zeros(keep.sum()), total[keep])
+
+
+def symplectic_basis(x, z, n):
+    """
+    Basis of the span of the rows (x, z), by vectorized elimination.
+
+    One pass per bit position XORs the pivot row into every row with that
+    bit set, so the cost is O(n * rows) word operations.
+    """
+    x, z = x.copy(), z.copy()
+    basis = []
+    for b in range(2 * n):
+        col = _bits(x, b) if b < n else _bits(z, b - n)
+        rows = np.flatnonzero(col)
+        if not rows.size:
+            continue
+        px, pz = x[rows[0]], z[rows[0]]
+        x[rows] ^= px
+        z[rows] ^= pz
+        basis.append((int(px), int(pz)))
+    return basis
+
+
+def anticommute(x1, z1, x2, z2):
+    """Symplectic product of Pauli masks: 1 where the operators anticommute"""
+    return np.bitwise_count((x1 & z2) ^ (z1 & x2)) & 1
+
+
+def all_commute(x, z, n):
+    """True when every pair of rows commutes (checked on a basis of the span)"""
+    basis = symplectic_basis(x, z, n)
+    bx = np.array([b[0] for b in basis], dtype=np.uint64)
+    bz = np.array([b[1] for b in basis], dtype=np.uint64)
+    return not anticommute(bx[:, None], bz[:, None], bx[None, :], bz[None, :]).any()
+
+
+def commuting_blocks(x, z, n):
+    """
+    Split a rotation sequence into consecutive mutually commuting runs.
+
+    Inside a run the order is free, so equal Paulis can be merged; a run
+    ends at the first term that anticommutes with it.  Membership is
+    tested against a basis of the run's span (at most 2n masks).
+    """
+    m = len(x)
+    if m == 0:
+        return []
+    if all_commute(x, z, n):
+        return [(0, m)]
+    blocks = []
+    start = 0
+    basis = []
+    mask = (1 << n) - 1
+    for i, (xi, zi) in enumerate(zip(x.tolist(), z.tolist())):
+        if any(((xi & (b >> n)) ^ (zi & b & mask)).bit_count() & 1 for b in basis):
+            blocks.append((start, i))
+            start, basis = i, []
+        # basis holds x | z << n with distinct leading bits, largest first
+        w = xi | (zi << n)
+        for b in basis:
+            w = min(w, w ^ b)
+        if w:
+            basis.append(w)
+            basis.sort(reverse=True)
+    blocks.append((start, m))
+    return blocks
+
+
+def anticommutation_graph(x, z, chunk=GRAPH_CHUNK):
+    """
+    Sparse DAG of the anticommuting pairs, edge i -> j for i < j.
+
+    Symplectic products are taken a block of rows at a time against all
+    later rows in reused buffers, so memory is O(chunk * rows) plus the
+    edges and no Python loop runs per pair.  The flat nonzero positions
+    of a block come row by row, which is already CSR order.  Returns an (m, m) scipy CSR
+    matrix of ones.
+    """
+    m = len(x)
+    indptr = np.zeros(m + 1, dtype=np.int64)
+    indices = []
+    a = np.empty((chunk, m), dtype=np.uint64)
+    b = np.empty((chunk, m), dtype=np.uint64)
+    for lo in range(0, m, chunk):
+        hi = min(m, lo + chunk)
+        ab, bb = a[:hi - lo, :m - lo], b[:hi - lo, :m - lo]
+        np.bitwise_and(x[lo:hi, None], z[None, lo:], out=ab)
+        np.bitwise_and(z[lo:hi, None], x[None, lo:], out=bb)
+        np.bitwise_xor(ab, bb, out=ab)
+        odd = (np.bitwise_count(ab) & 1).view(bool)
+        odd[np.tril_indices(hi - lo, 0, m - lo)] = False
+        indptr[lo + 1:hi + 1] = np.count_nonzero(odd, axis=1)
+        indices.append((np.flatnonzero(odd) % (m - lo) + lo).astype(np.int32))
+    indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32)
+    data = np.ones(len(indices), dtype=np.int8)
+    return sparse.csr_matrix((data, indices, np.cumsum(indptr)), shape=(m, m))
+
+
+def rotation_layers(x, z, n):
+    """
+    Schedule a rotation sequence into layers of mutually commuting terms.
+
+    A term may move past any term it commutes with, so every linear
+    extension of the anticommutation DAG gives the same product.  Layers
+    are the as-soon-as-possible levels of that DAG (Kahn's algorithm, one
+    vectorized frontier per level): two terms in a layer commute, and the
+    layer count is the longest anticommuting chain, the fewest possible.
+    Returns a list of sorted index arrays.
+    """
+    m = len(x)
+    if m == 0:
+        return []
+    if all_commute(x, z, n):
+        return [np.arange(m)]
+    graph = anticommutation_graph(x, z)
+    indegree = np.bincount(graph.indices, minlength=m)
+    frontier = np.flatnonzero(indegree == 0)
+    layers = []
+    while frontier.size:
+        layers.append(frontier)
+        indegree[frontier] = -1
+        indegree -= np.bincount(graph[frontier].indices, minlength=m)
+        frontier = np.flatnonzero(indegree == 0)
+    return layers
+
+
+def diagonalize(table):
+    """
+    Map a commuting table to Z-type Paulis with H, S and CNOT.
+
+    Each round takes the row with the lightest X part, gathers its X
+    support onto one pivot qubit with CNOTs, turns a Y there into X with S,
+    clears the remaining Z support with CZs, and finishes with H.  Every
+    other row commutes with the pivot X, so the pivot qubit stays free of X
+    for good; at most n rounds.
+    """
+    done = 0
+    while True:
+        weights = np.bitwise_count(table.x)
+        if not weights.any():
+            return table
+        row = int(np.argmin(np.where(weights > 0, weights, 65)))
+        xr = int(table.x[row])
+        p = (xr & -xr).bit_length() - 1
+        for j in range(table.n):
+            if j != p and (xr >> j) & 1:
+                table.cx(p, j)
+        if (int(table.z[row]) >> p) & 1:
+            table.s(p)
+        zr = int(table.z[row]) & ~done
+        for j in range(table.n):
+            if j != p and (zr >> j) & 1:
+                table.cz(p, j)
+        table.h(p)
+        done |= 1 << p
+
+
+def diagonal_coefficients(table):
+    """
+    Parity coefficients c_a (mod 8) of a diagonalized table.
+
+    exp(-i k pi/8 (+-Z_a)) is, up to global phase, the phase
+    exp(+-i k pi/4 (a.x mod 2)), i.e. coefficient +-k in units of T.
+    The empty parity a = 0 (an identity term) is a global phase and
+    is dropped.
+    """
+    coeffs = {}
+    for a, sign, k in zip(table.z.tolist(), table.sign.tolist(), table.k.tolist()):
+        c = -k if sign else k
+        coeffs[a] = (coeffs.get(a, 0) + c) % 8
+    return {a: c for a, c in coeffs.items() if a and c}
+
+
+def optimize_coefficients(coeffs, n, max_qubits=10):
+    """
+    Re-solve the phase polynomial to lower the number of odd coefficients.
+
+    Uses the Reed-Muller search in phase_polynomial.py, so only for
+    n <= max_qubits; returns the input if it does not improve it.
+    """
+    odd = sum(c % 2 for c in coeffs.values())
+    # a Reed-Muller flip touches at least 15 parities, so it needs 8 odd ones to help
+    if n > max_qubits or odd < 8:
+        return coeffs
+    dense = np.zeros(1 << n, dtype=np.int64)
+    for a, c in coeffs.items():
+        dense[a] = c
+    new, t_count, _ = solve_phase_polynomial(evaluate_phase_polynomial(dense))
+    if t_count >= odd:
+        return coeffs
+    return dict(phase_polynomial_terms(new))
+
+
+def independent_sets(parities, n):
+    """
+    Greedy first-fit split of parity masks into linearly independent sets.
+
+    Each set keeps a GF(2) basis with distinct leading bits, so a set holds
+    at most n parities and the test for a new one is n XORs.
+    """
+    sets, bases = [], []
+    for a in parities:
+        for members, basis in zip(sets, bases):
+            w = a
+            for b in basis:
+                w = min(w, w ^ b)
+            if w:
+                members.append(a)
+                basis.append(w)
+                basis.sort(reverse=True)
+                break
+        else:
+            sets.append([a])
+            bases.append([a])
+    return sets
+
+
+def parallel_phase_gates(odd, n):
+    """
+    CNOT + T gates for odd parity phases, one T layer per independent set.
+
+    Linearly independent parities can sit on distinct wires at once
+    (Tpar, Amy-Maslov-Mosca), so the parities are split into independent
+    sets and each set costs T-depth 1.  A set is loaded by rewriting one
+    wire per parity: with the parity written in the current wire basis,
+    CNOTs from the other wires of that combination onto a wire not yet
+    holding a parity of the set.  The inverse of the wire basis is kept
+    column-wise, so a CNOT c -> t costs one XOR on each side.  The wires
+    are returned to x_q by Gaussian elimination at the end.
+    odd maps parity masks to +1 (T) or 7 (T^dag); the empty parity is a
+    global phase and is skipped, so every parity has a wire to land on.
+    """
+    from parity_network import linear_synth
+    wires = [1 << q for q in range(n)]
+    inverse = [1 << q for q in range(n)]
+    gates = []
+
+    def cx(c, t):
+        wires[t] ^= wires[c]
+        inverse[c] ^= inverse[t]
+        gates.append(('cx', (c, t)))
+
+    for members in independent_sets(sorted(a for a in odd if a), n):
+        loaded = set()
+        for a in members:
+            coords = [q for q in range(n) if (a & inverse[q]).bit_count() & 1]
+            free = [q for q in coords if q not in loaded]
+            t = min(free, key=lambda q: (wires[q] != a, wires[q].bit_count()))
+            for c in coords:
+                if c != t:
+                    cx(c, t)
+            loaded.add(t)
+        for t in sorted(loaded):
+            gates.append(('t' if odd[wires[t]] == 1 else 'tdg', (t,)))
+    return gates + linear_synth(wires, n)
+
+
+def diagonal_gates(coeffs, n, parallel=True):
+    """
+    {H, T, T^dag, CNOT} gates for the phase polynomial sum_a c_a (a.x mod 2).
+
+    An odd coefficient on a multi-qubit parity is split into +-1 (one T on
+    a CNOT-computed parity) plus an even rest.  Even parts expand to
+    single-qubit phases and CZs (for even e, e (a.x) = e sum x_i
+    - 2e sum x_i x_j mod 8), and the single-qubit phases are collected
+    per qubit into one T power.  With parallel the odd parities are
+    placed by parallel_phase_gates for low T-depth, otherwise each gets
+    its own CNOT ladder.
+    """
+    linear = [0] * n
+    cz = set()
+    odd = []
+    for a, c in sorted(coeffs.items()):
+        bits = [i for i in range(n) if (a >> i) & 1]
+        if len(bits) == 1:
+            linear[bits[0]] += c
+            continue
+        r = 0
+        if c % 2:
+            r = 1 if c % 8 in (1, 3) else 7
+            odd.append((bits, r))
+        e = (c - r) % 8
+        for i in bits:
+            linear[i] += e
+        if (e // 2) % 2:
+            for u, i in enumerate(bits):
+                for j in bits[u + 1:]:
+                    cz ^= {(i, j)}
+
+    gates = []
+    if parallel and odd:
+        gates += parallel_phase_gates({sum(1 << i for i in bits): r for bits, r in odd}, n)
+        odd = []
+    # Group parities by target so that neighbouring CNOT ladders cancel
+    for bits, r in sorted(odd, key=lambda br: (br[0][-1], br[0])):
+        target = bits[-1]
+        ladder = [('cx', (i, target)) for i in bits[:-1]]
+        gates += ladder
+        gates.append(('t' if r == 1 else 'tdg', (target,)))
+        gates += ladder[::-1]
+    for i, j in sorted(cz):
+        gates += [('h', (j,)), ('cx', (i, j)), ('h', (j,))]
+    for q, c in enumerate(linear):
+        c %= 8
+        gates += [('t', (q,))] * c if c <= 4 else [('tdg', (q,))] * (8 - c)
+    return gates
+
+
+def inverse_gates(gates):
+    return [(INVERSE[name], qubits) for name, qubits in reversed(gates)]
+
+
+def expand_gates(gates):
+    """Rewrite S / S^dag as T powers so only H, T, T^dag and CNOT remain"""
+    out = []
+    for name, qubits in gates:
+        out += [(g, qubits) for g in EXPANSION.get(name, [name])]
+    return out
+
+
+def cancel_adjacent(gates):
+    """
+    Remove gate pairs G G^dag with nothing in between on their qubits.
+
+    Keeps a stack of live gates per qubit, so cascades like
+    'h cx cx h' collapse completely in one linear pass.
+    """
+    out = []
+    stacks = {}
+    for name, qubits in gates:
+        last = [stacks.get(q, [None])[-1] if stacks.get(q) else None for q in qubits]
+        i = last[0]
+        if (i is not None and all(j == i for j in last)
+                and out[i][1] == qubits and out[i][0] == INVERSE.get(name)):
+            out[i] = None
+            for q in qubits:
+                stacks[q].pop()
+            continue
+        for q in qubits:
+            stacks.setdefault(q, []).append(len(out))
+        out.append((name, qubits))
+    return [g for g in out if g is not None]
+
+
+def compile_pauli_rotations(n, terms, optimize=True, schedule=True, parallel=True):
+    """
+    Compile prod_j exp(-i theta_j P_j) (first term applied first) to gates.
+
+    Terms are grouped into mutually commuting blocks: with schedule, the
+    fewest layers allowed by the anticommuting pairs (rotation_layers),
+    else consecutive runs (commuting_blocks).  Each block is merged on
+    identical Paulis, diagonalized by one Clifford frame C, and the
+    diagonal is emitted as a phase polynomial; the block becomes C, D,
+    C^dag.  parallel is passed on to diagonal_gates.
+    Returns a list of (name, qubits) over {h, t, tdg, cx}.
+    """
+    table = PauliTable.from_terms(n, terms)
+    if schedule:
+        blocks = [table.take(index) for index in rotation_layers(table.x, table.z, n)]
+    else:
+        blocks = [table.select(start, stop) for start, stop in commuting_blocks(table.x, table.z, n)]
+    gates = []
+    for block in blocks:
+        block = block.merged()
+        diagonalize(block)
+        coeffs = diagonal_coefficients(block)
+        if optimize:
+            coeffs = optimize_coefficients(coeffs, n)
+        gates += block.gates + diagonal_gates(coeffs, n, parallel) + inverse_gates(block.gates)
+    return cancel_adjacent(expand_gates(cancel_adjacent(gates)))
+
+
+def gates_to_qasm(gates, n):
+    lines = ["OPENQASM 2.0;", 'include "qelib1.inc";', "", f"qreg q[{n}];", ""]
+    for name, qubits in gates:
+        lines.append(f"{name} " + ", ".join(f"q[{q}]" for q in qubits) + ";")
+    return "\n".join(lines) + "\n"
+
+
+def gate_counts(gates):
+    counts = {}
+    for name, _ in gates:
+        counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+def t_depth(gates, n):
+    """Number of T / T^dag layers, counting each qubit's gates in order"""
+    levels = [0] * n
+    for name, qubits in gates:
+        level = max(levels[q] for q in qubits) + (name in ('t', 'tdg'))
+        for q in qubits:
+            levels[q] = level
+    return max(levels, default=0)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Compile a Pauli-rotation program to Clifford+T QASM")
+    parser.add_argument('program', help="JSON like challenge12.json")
+    parser.add_argument('-o', '--output', help="QASM output path")
+    parser.add_argument('--no-optimize', action='store_true', help="skip the Reed-Muller T-count search")
+    parser.add_argument('--no-schedule', action='store_true',
+                        help="keep consecutive commuting runs instead of scheduling into layers")
+    parser.add_argument('--no-parallel', action='store_true', help="one CNOT ladder per T instead of T layers")
+    parser.add_argument('--verify', action='store_true', help="check the result with tensor_sim")
+    parser.add_argument('--samples', type=int, default=0,
+                        help="verify on this many random states instead of the full unitary")
+    args = parser.parse_args()
+
+    n, terms = load_pauli_program(args.program)
+    print("=" * 80)
+    print(f"PAULI ROTATION COMPILER: {args.program} ({n} qubits, {len(terms)} terms)")
+    print("=" * 80)
+
+    start = time.perf_counter()
+    gates = compile_pauli_rotations(n, terms, optimize=not args.no_optimize,
+                                    schedule=not args.no_schedule, parallel=not args.no_parallel)
+    elapsed = time.perf_counter() - start
+
+    counts = gate_counts(gates)
+    if not args.no_schedule:
+        table = PauliTable.from_terms(n, terms)
+        print(f"  Rotation layers: {len(rotation_layers(table.x, table.z, n))}")
+    print(f"  T-count: {counts.get('t', 0) + counts.get('tdg', 0)}")
+    print(f"  T-depth: {t_depth(gates, n)}")
+    print(f"  CNOTs: {counts.get('cx', 0)}")
+    print(f"  Total gates: {len(gates)}")
+    print(f"  Compile time: {elapsed:.3f} s")
+
+    if args.verify:
+        from tensor_sim import simulate_gates, pauli_program_residual, sampled_pauli_fidelity
+        circuit = ((name, (), qubits) for name, qubits in gates)
+        if args.samples:
+            fidelity = sampled_pauli_fidelity(circuit, n, terms, args.samples)
+            label = f"Fidelity ({args.samples} random states)"
+        else:
+            W = pauli_program_residual(simulate_gates(circuit, n), n, terms)
+            fidelity = abs(np.trace(W)) / W.shape[0]
+            label = "Fidelity"
+        print(f"  {label}: {fidelity:.10f} {'✓' if fidelity > 1 - 1e-9 else '✗'}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(gates_to_qasm(gates, n))
+        print(f"  ✓ Wrote {args.output}")
@@ -0,0 +1,85 @@
+import json
+import numpy as np
+
+
+def load_pauli_program(path):
+    """
+    Load a Pauli-rotation program like challenge12.json.
+
+    Returns (n, terms) with terms a list of (pauli, theta) meaning
+    exp(-i * theta * P); pauli[i] acts on qubit i and theta = k * pi/8 for
+    angle_unit "pi/8".
+    """
+    with open(path) as f:
+        data = json.load(f)
+    unit = data.get('angle_unit', 'pi/8')
+    if unit != 'pi/8':
+        raise ValueError(f"unsupported angle_unit {unit!r}")
+    terms = [(t['pauli'], t['k'] * np.pi / 8) for t in data['terms']]
+    n = data['n']
+    for pauli, _ in terms:
+        if len(pauli) != n or set(pauli) - set('IXYZ'):
+            raise ValueError(f"bad Pauli string {pauli!r} for n={n}")
+    return n, terms
+
+
+def pauli_masks(pauli):
+    """(x_mask, z_mask) with bit i set where pauli[i] has an X or Z part"""
+    x = z = 0
+    for i, p in enumerate(pauli):
+        if p in 'XY':
+            x |= 1 << i
+        if p in 'ZY':
+            z |= 1 << i
+    return x, z
+
+
+def pauli_phases(n, pauli):
+    """
+    (x_mask, phase vector) with P|j> = phase[j] |j ^ x_mask>.
+
+    Y = iXZ, so phase[j] = i^#Y (-1)^popcount(j & z_mask).
+    """
+    x, z = pauli_masks(pauli)
+    parity = np.bitwise_count(np.arange(1 << n, dtype=np.int64) & z) & 1
+    return x, (1j ** pauli.count('Y')) * (1 - 2 * parity.astype(np.int8))
+
+
+def apply_pauli_rotations(psi, n, terms):
+    """
+    Apply exp(-i theta P) for each (pauli, theta) in program order, in place.
+
+    exp(-i theta P) = cos(theta) - i sin(theta) P, and P is an index
+    permutation j -> j ^ x_mask times a phase vector, so every term is
+    one gather and two multiply-adds over psi: O(2^n) per column with no
+    Pauli matrix formed.  Diagonal terms (no X or Y) skip the gather.
+    psi is a state of length 2^n or a (2^n, m) stack of columns.
+    """
+    cols = psi.reshape(1 << n, -1)
+    buf = np.empty_like(cols)
+    idx = np.arange(1 << n, dtype=np.int64)
+    for pauli, theta in terms:
+        x, phase = pauli_phases(n, pauli)
+        phase = phase * (-1j * np.sin(theta))
+        if x == 0:
+            cols *= (np.cos(theta) + phase)[:, None]
+            continue
+        # (P psi)[j] = phase[j ^ x] psi[j ^ x]
+        perm = idx ^ x
+        np.take(cols, perm, axis=0, out=buf)
+        buf *= phase[perm][:, None]
+        cols *= np.cos(theta)
+        cols += buf
+    return psi
+
+
+def pauli_program_unitary(n, terms):
+    """Full 2^n x 2^n unitary of a Pauli-rotation program, column by column"""
+    return apply_pauli_rotations(np.eye(1 << n, dtype=complex), n, terms)
+
+
+def random_states(n, count, seed=None):
+    """(2^n, count) Haar-random states as columns"""
+    rng = np.random.default_rng(seed)
+    psi = rng.standard_normal((1 << n, count)) + 1j * rng.standard_normal((1 << n, count))
+    return psi / np.linalg.norm(psi, axis=0)
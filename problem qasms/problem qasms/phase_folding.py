@@ -0,0 +1,183 @@
+import sys
+import numpy as np
+from qasm_stream import iter_qasm_gates, T_GATES, CNOT_GATES
+from tensor_sim import eval_param
+
+
+# Diagonal gates as multiples of pi/4 on |1>
+PHASES = {'t': 1, 's': 2, 'z': 4, 'sdg': 6, 'tdg': 7}
+# Diagonal gates that are kept where they are and leave the parities alone
+PASS_THROUGH = {'barrier', 'id', 'cz'}
+
+# Shortest way to write a phase of c * pi/4, with and without S / Z
+PHASE_GATES = {0: [], 1: ['t'], 2: ['s'], 3: ['s', 't'], 4: ['z'],
+               5: ['sdg', 'tdg'], 6: ['sdg'], 7: ['tdg']}
+T_ONLY_GATES = {c: ['t'] * c if c <= 4 else ['tdg'] * (8 - c) for c in range(8)}
+# Operations that need classical registers, which the QASM writer does not carry
+NON_UNITARY = {'measure', 'reset'}
+
+
+def phase_multiple(name, params):
+    """Phase of a single-qubit diagonal gate in units of pi/4, or None"""
+    if name in PHASES:
+        return PHASES[name]
+    if name in ('rz', 'p', 'u1') and params:
+        k = eval_param(params[0]) * 4 / np.pi
+        if abs(k - round(k)) < 1e-9:
+            # rz differs from p only by a global phase
+            return int(round(k)) % 8
+    return None
+
+
+def fold_phases(gates, t_only=False):
+    """
+    Merge phase gates that act on the same parity, in one linear pass.
+
+    Each wire carries an affine parity (mask over path variables, constant
+    bit): CNOT, X and SWAP update the parities, and H or any other
+    non-diagonal gate gives its qubits fresh variables.  Every phase gate
+    adds c * pi/4 to the term of its parity; the first occurrence of a
+    term is kept for the total and later ones are deleted.  A phase factor
+    moved between points where its parity is the same leaves the path
+    sum, and so the unitary up to global phase, unchanged.
+
+    gates are (name, params, qubits) tuples; returns the reduced list.
+    Merged phases are written with T, S and Z, or with T / T^dag only if
+    t_only is set.
+    """
+    wires = {}
+    fresh = 0
+    out = []
+    # parity mask -> [total, slot in out, qubit, constant bit at the slot]
+    terms = {}
+
+    def wire(q):
+        nonlocal fresh
+        if q not in wires:
+            wires[q] = (1 << fresh, 0)
+            fresh += 1
+        return wires[q]
+
+    for name, params, qubits in gates:
+        c = phase_multiple(name, params) if len(qubits) == 1 else None
+        if c is not None:
+            q = qubits[0]
+            mask, const = wire(q)
+            # a phase c on NOT(a) is -c on a, up to global phase
+            c = -c if const else c
+            if mask in terms:
+                terms[mask][0] += c
+            else:
+                terms[mask] = [c, len(out), q, const]
+                out.append(None)
+            continue
+
+        if name in CNOT_GATES:
+            (mc, cc), (mt, ct) = wire(qubits[0]), wire(qubits[1])
+            wires[qubits[1]] = (mt ^ mc, ct ^ cc)
+        elif name == 'x':
+            mask, const = wire(qubits[0])
+            wires[qubits[0]] = (mask, const ^ 1)
+        elif name == 'swap':
+            a, b = wire(qubits[0]), wire(qubits[1])
+            wires[qubits[0]], wires[qubits[1]] = b, a
+        elif name not in PASS_THROUGH:
+            for q in qubits:
+                wires[q] = (1 << fresh, 0)
+                fresh += 1
+        out.append((name, params, qubits))
+
+    table = T_ONLY_GATES if t_only else PHASE_GATES
+    for total, slot, q, const in terms.values():
+        out[slot] = [(g, (), (q,)) for g in table[(-total if const else total) % 8]]
+
+    result = []
+    for item in out:
+        if isinstance(item, list):
+            result.extend(item)
+        else:
+            result.append(item)
+    return result
+
+
+def t_count(gates):
+    return sum(1 for name, _, _ in gates if name in T_GATES)
+
+
+def gates_to_qasm(gates, registers):
+    """
+    OpenQASM 2.0 text for global-index gates over the given registers.
+
+    Only quantum registers are written, so measure / reset (whose classical
+    targets the gate tuples do not keep) raise ValueError rather than come
+    out as invalid QASM.
+    """
+    for name, _, qubits in gates:
+        if name in NON_UNITARY:
+            raise ValueError(f"'{name}' on qubit {qubits[0]} is not supported: classical registers "
+                             "and measurement targets are not carried over")
+    labels = {}
+    lines = ["OPENQASM 2.0;", 'include "qelib1.inc";', ""]
+    for reg, (offset, size) in registers.items():
+        lines.append(f"qreg {reg}[{size}];")
+        for i in range(size):
+            labels[offset + i] = f"{reg}[{i}]"
+    lines.append("")
+    for name, params, qubits in gates:
+        head = f"{name}({', '.join(params)})" if params else name
+        lines.append(f"{head} " + ", ".join(labels[q] for q in qubits) + ";")
+    return "\n".join(lines) + "\n"
+
+
+def optimize_qasm(lines, t_only=None):
+    """
+    Phase-fold a QASM circuit; returns (qasm_text, report).
+
+    By default merged phases use S / Z only if the input already does, so
+    an {H, T, T^dag, CNOT} circuit stays in that gate set.
+    """
+    diagnostics = []
+    registers = {}
+    gates = list(iter_qasm_gates(lines, diagnostics, registers))
+    if t_only is None:
+        t_only = not any(name in ('s', 'sdg', 'z') for name, _, _ in gates)
+    folded = fold_phases(gates, t_only=t_only)
+    report = {
+        't_count_before': t_count(gates),
+        't_count_after': t_count(folded),
+        'gates_before': len(gates),
+        'gates_after': len(folded),
+        'diagnostics': [f"line {l}: {m}" for l, m in diagnostics],
+    }
+    return gates_to_qasm(folded, registers), report
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Merge T gates on equal parities (phase folding)")
+    parser.add_argument('qasm')
+    parser.add_argument('-o', '--output', help="write the optimized QASM here instead of stdout")
+    parser.add_argument('--t-only', action='store_true', help="write merged phases with T / T^dag only")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        with open(args.qasm) as f:
+            text, report = optimize_qasm(f, t_only=True if args.t_only else None)
+    except ValueError as e:
+        print(f"✗ {args.qasm}: {e}", file=sys.stderr)
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+
+    for line in report['diagnostics']:
+        print(f"  ! {line}", file=sys.stderr)
+    print(f"T-count {report['t_count_before']} -> {report['t_count_after']}, "
+          f"gates {report['gates_before']} -> {report['gates_after']} "
+          f"({elapsed * 1e3:.1f} ms)", file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
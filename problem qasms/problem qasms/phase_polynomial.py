@@ -0,0 +1,198 @@
+import numpy as np
+from itertools import product
+
+
+def _as_table(f_target, modulus=8):
+    """Check a 2^n phase table and return it as an int64 array mod modulus"""
+    f = np.asarray(f_target, dtype=np.int64) % modulus
+    size = f.shape[0]
+    if f.ndim != 1 or size < 2 or size & (size - 1):
+        raise ValueError(f"phase table must have 2^n entries, got shape {f.shape}")
+    return f, size.bit_length() - 1
+
+
+def mobius_transform(values, modulus=8):
+    """
+    Subset Mobius transform over Z_modulus.
+
+    Maps a truth table f(x) to the coefficients m_S of its multilinear form
+    f(x) = sum_S m_S * prod_{i in S} x_i, where S and x share the bitmask
+    convention (bit i of the index <-> x_{i+1} <-> q[i]).
+    """
+    m = np.array(values, dtype=np.int64) % modulus
+    n = m.shape[0].bit_length() - 1
+    for i in range(n):
+        view = m.reshape(-1, 2, 1 << i)
+        view[:, 1, :] -= view[:, 0, :]
+    return m % modulus
+
+
+def superset_sum(values, modulus=8):
+    """Superset-sum (zeta) transform: out[T] = sum_{S containing T} values[S]"""
+    out = np.array(values, dtype=np.int64)
+    n = out.shape[0].bit_length() - 1
+    for i in range(n):
+        view = out.reshape(-1, 2, 1 << i)
+        view[:, 0, :] += view[:, 1, :]
+    return out % modulus
+
+
+def walsh_hadamard(values):
+    """Unnormalized integer Walsh-Hadamard transform, O(n * 2^n)"""
+    out = np.array(values, dtype=np.int64)
+    n = out.shape[0].bit_length() - 1
+    for i in range(n):
+        view = out.reshape(-1, 2, 1 << i)
+        a = view[:, 0, :].copy()
+        view[:, 0, :] += view[:, 1, :]
+        view[:, 1, :] = a - view[:, 1, :]
+    return out
+
+
+def popcounts(size):
+    """Popcount of every index in range(size)"""
+    counts = np.zeros(size, dtype=np.int64)
+    bit = 1
+    while bit < size:
+        counts[bit:2 * bit] = counts[:bit] + 1
+        bit <<= 1
+    return counts
+
+
+def evaluate_phase_polynomial(coeffs, modulus=8):
+    """
+    Evaluate f(x) = sum_a c_a * (a.x mod 2) for every x in one transform.
+
+    Uses a.x mod 2 = (1 - (-1)^(a.x)) / 2, so f = (sum(c) - WHT(c)) / 2.
+    """
+    c = np.asarray(coeffs, dtype=np.int64).copy()
+    c[0] = 0
+    return ((c.sum() - walsh_hadamard(c)) // 2) % modulus
+
+
+def _kernel_generators(n):
+    """Masks S (|S| >= 4) whose parity sets {T : 0 < T subset of S} flip T parity freely"""
+    counts = popcounts(1 << n)
+    return [int(s) for s in np.flatnonzero(counts >= 4)[::-1]]
+
+
+def _flip_pattern(size, s):
+    """Boolean mask of all nonzero submasks of s"""
+    idx = np.arange(size)
+    pattern = (idx & s) == idx
+    pattern[0] = False
+    return pattern
+
+
+def _minimize_odd(odd, n, exhaustive_max_generators, greedy_max_qubits):
+    """
+    Reduce the number of odd coefficients by adding kernel elements.
+
+    The odd parts can be shifted by any codeword of the punctured Reed-Muller
+    code RM(n-4, n)*; this returns the chosen generators.  Exhaustive for
+    small n, greedy descent up to greedy_max_qubits, canonical beyond that.
+    """
+    gens = _kernel_generators(n)
+    if not gens or n > greedy_max_qubits:
+        return []
+    size = 1 << n
+    patterns = np.array([_flip_pattern(size, s) for s in gens])
+
+    if len(gens) <= exhaustive_max_generators:
+        choices = np.array(list(product((0, 1), repeat=len(gens))), dtype=np.int64)
+        flips = (choices @ patterns.astype(np.int64)) % 2
+        weights = (flips ^ odd[None, :]).sum(axis=1)
+        best = int(np.argmin(weights))
+        return [s for s, y in zip(gens, choices[best]) if y]
+
+    chosen = set()
+    current = odd.copy()
+    improved = True
+    while improved:
+        improved = False
+        for s, pattern in zip(gens, patterns):
+            ones = int(current[pattern].sum())
+            if 2 * ones > int(pattern.sum()):
+                current[pattern] ^= 1
+                chosen ^= {s}
+                improved = True
+    return sorted(chosen, reverse=True)
+
+
+def solve_phase_polynomial(f_target, optimize=True,
+                           exhaustive_max_generators=10, greedy_max_qubits=10):
+    """
+    Find parity coefficients c_a (mod 8) with f(x) = f(0) + sum_a c_a (a.x mod 2).
+
+    f_target lists 4*phi(x)/pi mod 8 for x = 0 .. 2^n - 1.  The table is
+    taken to the monomial basis with a Mobius transform, each monomial of
+    degree d is rewritten as 2^(1-d) times an alternating sum of parities,
+    and the parity coefficients are collected with a superset-sum transform,
+    all in O(n * 2^n).  With optimize=True the T-count is then reduced over
+    the remaining Reed-Muller freedom.
+
+    Returns (coeffs, t_count, global_phase) where coeffs[a] is the
+    coefficient of parity mask a (coeffs[0] is always 0) and global_phase
+    is f(0).  Raises ValueError if f has no CNOT+T phase polynomial.
+    """
+    f, n = _as_table(f_target)
+    size = 1 << n
+    global_phase = int(f[0])
+    m = mobius_transform(f - global_phase)
+
+    counts = popcounts(size)
+    degree = np.maximum(counts - 1, 0)
+    bad = np.flatnonzero((m % (1 << np.minimum(degree, 3))) != 0)
+    if bad.size:
+        s = int(bad[0])
+        raise ValueError(
+            f"not a Clifford+T phase polynomial: monomial {s:0{n}b} has "
+            f"coefficient {m[s]}, which is not divisible by {1 << min(degree[s], 3)}"
+        )
+
+    # m_S / 2^(|S|-1), canonical representative (zero for |S| >= 4)
+    quotient = np.where(degree < 3, m >> np.minimum(degree, 3), 0)
+    sign = np.where(counts % 2 == 1, 1, -1)
+    coeffs = (sign * superset_sum(quotient)) % 8
+    coeffs[0] = 0
+
+    if optimize:
+        odd = (coeffs % 2).astype(np.int64)
+        for s in _minimize_odd(odd, n, exhaustive_max_generators, greedy_max_qubits):
+            coeffs = (coeffs + sign * _flip_pattern(size, s)) % 8
+        coeffs[0] = 0
+
+    t_count = int(np.count_nonzero(coeffs % 2))
+    return coeffs, t_count, global_phase
+
+
+def parity_label(a, n):
+    """Human-readable parity, e.g. 'x1 ⊕ x3' for a = 0b101"""
+    bits = [f"x{i + 1}" for i in range(n) if (a >> i) & 1]
+    return " ⊕ ".join(bits) if bits else "0"
+
+
+def phase_polynomial_terms(coeffs):
+    """List of (parity_mask, coefficient) for every nonzero coefficient"""
+    coeffs = np.asarray(coeffs)
+    return [(int(a), int(coeffs[a])) for a in np.flatnonzero(coeffs % 8)]
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    rng = np.random.default_rng(0)
+    size = 1 << n
+    c = rng.integers(0, 8, size)
+    c[0] = 0
+    f = evaluate_phase_polynomial(c)
+
+    start = time.perf_counter()
+    coeffs, t_count, _ = solve_phase_polynomial(f)
+    elapsed = time.perf_counter() - start
+
+    assert np.array_equal(evaluate_phase_polynomial(coeffs), f)
+    print(f"n={n}: T-count {t_count} (random input had {np.count_nonzero(c % 2)}), "
+          f"{elapsed * 1e3:.2f} ms")
@@ -1,5 +1,9 @@
 import numpy as np
-from itertools import combinations, product
+import os
+from phase_polynomial import solve_phase_polynomial, phase_polynomial_terms
+from parity_network import synthesize_diagonal, gates_to_qasm, gate_counts
+
+qasm_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "problem11part3.qasm")
 
 # Target f(x) values from the problem
 # f(x) = 4φ(x)/π where φ(x) is given in the problem
@@ -59,52 +63,22 @@ for idx, func_str in enumerate(linear_funcs_str):
     print(f"  L{idx:2d}: a={a:04b} = {func_str}")
 print()
 
-# Search for minimal T-count representation
-best_solution = None
-best_t_count = float('inf')
-best_k = float('inf')
-
-print("Searching for optimal phase polynomial representation...")
+# Solve for the phase polynomial directly with Mobius / superset-sum
+# transforms over Z8 instead of searching combinations of terms
+print("Solving for optimal phase polynomial representation...")
 print("f(x) = Σ c_i·L_i(x) mod 8, minimize # of odd c_i (T-count)")
 print()
 
-# Try increasing number of terms
-for k in range(1, 7):  # Try 1 to 6 terms
-    print(f"Searching with k={k} terms...")
-    
-    for combo in combinations(range(15), k):
-        # Try all coefficient combinations 0-7
-        for c_vals in product(range(8), repeat=k):
-            # Skip if all coefficients are 0
-            if all(c == 0 for c in c_vals):
-                continue
-                
-            # Check if this combination matches f_target for all x
-            valid = True
-            for x in range(16):
-                total = 0
-                for idx, c in zip(combo, c_vals):
-                    total += c * linear_funcs[idx][x]
-                if total % 8 != f_target[x]:
-                    valid = False
-                    break
-            
-            if valid:
-                # Count T-gates = number of odd coefficients
-                t_count = sum(1 for c in c_vals if c % 2 == 1)
-                
-                # Check if this is better than current best
-                if t_count < best_t_count or (t_count == best_t_count and k < best_k):
-                    best_t_count = t_count
-                    best_k = k
-                    best_solution = (k, combo, c_vals, t_count)
-                    
-                    print(f"  Found: T-count={t_count}, k={k}")
-                    
-                    # For very good solutions, show details
-                    if t_count <= 5:
-                        print(f"    Terms: {combo}")
-                        print(f"    Coeffs: {c_vals}")
+best_solution = None
+try:
+    coeffs, t_count, _ = solve_phase_polynomial(f_target)
+    terms = phase_polynomial_terms(coeffs)
+    combo = tuple(a - 1 for a, _ in terms)
+    c_vals = tuple(c for _, c in terms)
+    best_solution = (len(terms), combo, c_vals, t_count)
+    print(f"  Found: T-count={t_count}, k={len(terms)}")
+except ValueError as e:
+    print(f"  {e}")
 
 print()
 print("=" * 70)
@@ -162,36 +136,24 @@ if best_solution:
     else:
         print("❌ SOME MISMATCHES!")
     
-    # Circuit construction hints
+    # Synthesize the CNOT+T parity network and write it as QASM.  The
+    # table lists |x1 x2 x3 x4> with x1 on q[0], so qubits are relabelled
+    # from the LSB-first convention of parity_network
     print()
     print("=" * 70)
-    print("CIRCUIT CONSTRUCTION:")
+    print("CIRCUIT CONSTRUCTION (GraySynth parity network, no ancilla):")
     print("=" * 70)
-    print("For each term c·L(x):")
-    print("  1. Use CNOTs to compute L(x) into an ancilla qubit")
-    print("  2. Apply Rz(cπ/4) on the ancilla:")
-    for c in sorted(set(c_vals)):
-        if c != 0:
-            phase = c * np.pi / 4
-            if c == 1:
-                gate = "t     (T gate)"
-            elif c == 3:
-                gate = "t t t (T³ = S·T)"
-            elif c == 5:
-                gate = "tdg tdg tdg (T†³)"
-            elif c == 7:
-                gate = "tdg    (T† gate)"
-            elif c % 2 == 0:
-                gate = f"Clifford (e.g., S={c} for c=2)"
-            else:
-                gate = f"Rz({phase:.3f}π)"
-            print(f"     c={c}: {gate}")
-    print("  3. Uncompute L(x) (reverse CNOTs)")
-    print()
-    print(f"Total resources: T-count={t_count}, CNOTs≈{3*k} (with ancilla)")
+    gates, n = synthesize_diagonal(f_target)
+    gates = [(name, tuple(n - 1 - q for q in qubits)) for name, qubits in gates]
+    counts = gate_counts(gates)
+    print(f"Total resources: T-count={counts.get('t', 0) + counts.get('tdg', 0)}, "
+          f"CNOTs={counts.get('cx', 0)}, gates={len(gates)}")
+    with open(qasm_path, 'w') as f:
+        f.write(gates_to_qasm(gates, n))
+    print(f"✓ Wrote {qasm_path}")
     
 else:
-    print("❌ NO SOLUTION FOUND up to k=6 terms.")
+    print("❌ NO SOLUTION FOUND: f(x) is not a CNOT+T phase polynomial.")
     print("   Check if f_target array is correct.")
 
 print("=" * 70)
\ No newline at end of file
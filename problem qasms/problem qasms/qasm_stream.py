@@ -0,0 +1,248 @@
+import json
+import os
+from collections import OrderedDict
+import re
+import sys
+
+
+TOKEN_RE = re.compile(r'([;{}])')
+GATE_RE = re.compile(r'^([A-Za-z_]\w*)\s*(?:\(([^)]*)\))?\s*(.*)$')
+ARG_RE = re.compile(r'^([A-Za-z_]\w*)\s*(?:\[\s*(\d+)\s*\])?$')
+QREG_RE = re.compile(r'^qreg\s+([A-Za-z_]\w*)\s*\[\s*(\d+)\s*\]$')
+QUBIT_RE = re.compile(r'^qubit\s*(?:\[\s*(\d+)\s*\])?\s+([A-Za-z_]\w*)$')
+
+HEADER_KEYWORDS = ('OPENQASM', 'include', 'creg', 'bit')
+# A keyword counts only as a whole word: 'bit[2] c' but not 'bitflip q[0]'
+HEADER_RE = re.compile(r'^(?:%s)(?=[\s\[]|$)' % '|'.join(HEADER_KEYWORDS))
+# Distinct statement texts whose parse is memoized (least recently used go first)
+PARSE_CACHE_SIZE = 4096
+T_GATES = {'t', 'tdg'}
+CNOT_GATES = {'cx', 'CX', 'cnot'}
+# Gates that do not take a layer in the depth count
+NON_OPS = {'barrier'}
+
+
+def iter_statements(lines):
+    """
+    Yield (lineno, statement, terminated) from OpenQASM text.
+
+    Comments are dropped, several statements per line and statements split
+    over lines are handled, and brace-delimited gate definitions are kept
+    as one statement.  Only the current statement is held in memory;
+    terminated is False for trailing text with no closing ';'.
+    """
+    buf = ''
+    start = None
+    depth = 0
+    for lineno, line in enumerate(lines, 1):
+        for piece in TOKEN_RE.split(line.split('//', 1)[0]):
+            if start is None and piece.strip():
+                start = lineno
+            if piece == ';' and depth == 0:
+                if buf.strip():
+                    yield start, buf.strip(), True
+                buf, start = '', None
+                continue
+            buf += piece
+            if piece == '{':
+                depth += 1
+            elif piece == '}':
+                depth -= 1
+                if depth == 0:
+                    yield start, buf.strip(), True
+                    buf, start = '', None
+        if buf:
+            buf += '\n'
+    if buf.strip():
+        yield start, buf.strip(), False
+
+
+def _parse_args(text, registers):
+    """Global qubit indices for an argument list, or None if any is unknown"""
+    qubits = []
+    for arg in text.split(','):
+        m = ARG_RE.match(arg.strip())
+        if not m or m.group(1) not in registers:
+            return None
+        offset, size = registers[m.group(1)]
+        if m.group(2) is None:
+            qubits.append(list(range(offset, offset + size)))
+        elif int(m.group(2)) < size:
+            qubits.append(offset + int(m.group(2)))
+        else:
+            return None
+    return qubits
+
+
+def _broadcast(qubits):
+    """Expand whole-register arguments: 'h q;' -> one gate per qubit"""
+    widths = {len(q) for q in qubits if isinstance(q, list)}
+    if not widths:
+        return [qubits]
+    if len(widths) > 1:
+        return None
+    n = widths.pop()
+    return [[q[i] if isinstance(q, list) else q for q in qubits] for i in range(n)]
+
+
+def _parse_statement(text, registers):
+    """Classify one whitespace-normalized statement as (kind, payload)"""
+    if HEADER_RE.match(text):
+        return 'header', None
+    if text.startswith(('gate ', 'opaque ')):
+        return 'gatedef', text.split()[1]
+    m = QREG_RE.match(text)
+    if m:
+        return 'reg', (m.group(1), int(m.group(2)))
+    m = QUBIT_RE.match(text)
+    if m:
+        return 'reg', (m.group(2), int(m.group(1) or 1))
+    m = GATE_RE.match(text.split('->', 1)[0].rstrip())
+    if not m or not m.group(3):
+        return None, None
+    qubits = _parse_args(m.group(3), registers)
+    gates = _broadcast(qubits) if qubits is not None else None
+    if gates is None:
+        return None, None
+    params = tuple(p.strip() for p in m.group(2).split(',')) if m.group(2) else ()
+    return 'gate', (m.group(1), params, gates)
+
+
+def iter_qasm_gates(lines, diagnostics=None, registers=None):
+    """
+    Stream gates from OpenQASM 2/3 text as (name, params, qubits) tuples.
+
+    qubits are global indices in declaration order across all quantum
+    registers (filled into registers as name -> (offset, size)).
+    Statements that cannot be understood are skipped and reported in
+    diagnostics as (lineno, message) instead of raising.
+    """
+    if diagnostics is None:
+        diagnostics = []
+    if registers is None:
+        registers = {}
+    n_qubits = sum(size for _, size in registers.values())
+    # Circuits repeat the same few statements; parse each text once, but
+    # keep only a bounded LRU so memory does not grow with the file
+    parsed = OrderedDict()
+
+    for lineno, statement, terminated in iter_statements(lines):
+        if not terminated:
+            diagnostics.append((lineno, f"trailing text without ';': {statement[:60]!r}"))
+            continue
+        text = ' '.join(statement.split())
+        if text in parsed:
+            parsed.move_to_end(text)
+            kind, payload = parsed[text]
+        else:
+            kind, payload = parsed[text] = _parse_statement(text, registers)
+            if len(parsed) > PARSE_CACHE_SIZE:
+                parsed.popitem(last=False)
+        if kind is None and '\n' in statement:
+            # Recover a statement that follows stray text on earlier lines
+            parts = statement.split('\n')
+            for i in range(1, len(parts)):
+                kind, payload = _parse_statement(' '.join(' '.join(parts[i:]).split()), registers)
+                if kind is not None:
+                    skipped = ' '.join(parts[:i]).strip()
+                    diagnostics.append((lineno, f"skipped non-QASM text: {skipped[:60]!r}"))
+                    break
+
+        if kind is None:
+            diagnostics.append((lineno, f"unrecognized statement: {statement[:60]!r}"))
+        elif kind == 'gatedef':
+            diagnostics.append((lineno, f"custom gate definition treated as opaque: {payload}"))
+        elif kind == 'reg':
+            name, size = payload
+            registers[name] = (n_qubits, size)
+            n_qubits += size
+            parsed.clear()
+        elif kind == 'gate':
+            name, params, gates = payload
+            for qs in gates:
+                yield name, params, tuple(qs)
+
+
+def analyze_qasm(lines, name=None):
+    """
+    One-pass resource counts for an OpenQASM 2/3 circuit.
+
+    Tracks, per qubit, the current layer and T-layer and a gate histogram,
+    so memory is constant per qubit whatever the circuit length.  Returns a
+    JSON-ready dict with T-count, T-depth, CNOT count, depth, gate counts,
+    per-qubit histograms and diagnostics.
+    """
+    diagnostics = []
+    registers = {}
+    layer = {}
+    t_layer = {}
+    per_qubit = {}
+    counts = {}
+
+    for gate, _, qubits in iter_qasm_gates(lines, diagnostics, registers):
+        counts[gate] = counts.get(gate, 0) + 1
+        for q in qubits:
+            hist = per_qubit.setdefault(q, {})
+            hist[gate] = hist.get(gate, 0) + 1
+        level = max(layer.get(q, 0) for q in qubits)
+        t_level = max(t_layer.get(q, 0) for q in qubits)
+        if gate not in NON_OPS:
+            level += 1
+        if gate in T_GATES:
+            t_level += 1
+        for q in qubits:
+            layer[q] = level
+            t_layer[q] = t_level
+
+    labels = {}
+    for reg, (offset, size) in registers.items():
+        for i in range(size):
+            labels[offset + i] = f"{reg}[{i}]"
+
+    return {
+        'file': name,
+        'qubits': len(labels),
+        't_count': sum(counts.get(g, 0) for g in T_GATES),
+        't_depth': max(t_layer.values(), default=0),
+        'cnot_count': sum(counts.get(g, 0) for g in CNOT_GATES),
+        'depth': max(layer.values(), default=0),
+        'total_gates': sum(n for g, n in counts.items() if g not in NON_OPS),
+        'gate_counts': counts,
+        'per_qubit': {labels.get(q, str(q)): hist for q, hist in sorted(per_qubit.items())},
+        'diagnostics': [f"line {lineno}: {msg}" for lineno, msg in diagnostics],
+    }
+
+
+def analyze_qasm_file(path):
+    """analyze_qasm on a file, streamed line by line"""
+    with open(path, encoding='utf-8', errors='replace') as f:
+        return analyze_qasm(f, name=path)
+
+
+def iter_qasm_paths(paths):
+    """Expand directories into the .qasm files below them"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in sorted(os.walk(path)):
+                for fname in sorted(files):
+                    if fname.endswith('.qasm'):
+                        yield os.path.join(root, fname)
+        else:
+            yield path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="T-count, T-depth, CNOT count and depth of QASM files")
+    parser.add_argument('paths', nargs='+', help=".qasm files or directories")
+    parser.add_argument('-o', '--output', help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    reports = [analyze_qasm_file(path) for path in iter_qasm_paths(args.paths)]
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(reports, f, indent=2)
+    else:
+        json.dump(reports, sys.stdout, indent=2)
+        print()
@@ -3,7 +3,9 @@
 
 import numpy as np
 from qiskit import QuantumCircuit, transpile
-from itertools import product
+from qiskit.quantum_info import Operator
+from itertools import combinations_with_replacement, product
+from two_qubit_words import gate_matrix, meet_in_the_middle
 
 
 base_circuit_list = [
@@ -20,12 +22,22 @@ base_circuit_list = [
 ]
 
 
+# Problem 9 target (same matrix as testproblem9.py)
+U_target = np.array([
+    [1, 0, 0, 0],
+    [0, 0, (-1+1j)/2, (1+1j)/2],
+    [0, 1j, 0, 0],
+    [0, 0, (-1+1j)/2, (-1-1j)/2]
+], dtype=complex)
+
+
 single_qubits = ['h', 't', 'tdg', 's', 'sdg']
 cx_options = [None, ('cx', 0, 1), ('cx', 1, 0)]
 all_gates = single_qubits + cx_options
 
 
 max_extra_gates = 1000
+max_mitm_depth = 12
 
 def build_qiskit_circuit(gate_list):
     qc = QuantumCircuit(2)
@@ -38,7 +50,7 @@ def build_qiskit_circuit(gate_list):
 
 def compute_unitary(gate_list):
     qc = build_qiskit_circuit(gate_list)
-    return qc.unitary().data
+    return Operator(qc).data
 
 def list_to_qasm(gate_list):
     lines = ["OPENQASM 2.0;", 'include "qelib1.inc";', 'qreg q[2];']
@@ -49,34 +61,97 @@ def list_to_qasm(gate_list):
             lines.append(f"{g[0]} q[{g[1]}];")
     return "\n".join(lines)
 
-found = False
-insertion_points = len(base_circuit_list) + 1
-
-
-for n_extra in range(1, max_extra_gates + 1):
-    for positions in product(range(insertion_points), repeat=n_extra):
-        for gates in product(all_gates, repeat=n_extra):
-            candidate = base_circuit_list.copy()
-            # Insert extra gates in reverse order to not shift positions
-            for pos, g in sorted(zip(positions, gates), reverse=True):
-                if g is not None:
-                    if isinstance(g, str):
-                        # single-qubit gate: default qubit 0 for simplicity
-                        candidate.insert(pos, (g, 0))
-                    else:
-                        # cx gate
-                        candidate.insert(pos, g)
-            # Compute unitary
-            U_candidate = compute_unitary(candidate)
-            if np.allclose(U_candidate, U_target, atol=1e-2):
-                print("Found matching circuit!")
-                print(list_to_qasm(candidate))
-                found = True
-                break
-        if found:
-            break
-    if found:
-        break
-
-if not found:
-    print("No matching circuit found with given extra gates and search depth.")
+def insertion_gates():
+    """all_gates as gate tuples; single-qubit gates go on qubit 0, None is skipped"""
+    return [(g, 0) if isinstance(g, str) else g for g in all_gates if g is not None]
+
+
+def prefix_suffix_products(gate_list):
+    """
+    prefix[p] = U(gate_list[:p]) and suffix[p] = U(gate_list[p:]) for every insertion point p
+    """
+    mats = [gate_matrix(g) for g in gate_list]
+    prefix = np.empty((len(mats) + 1, 4, 4), dtype=complex)
+    suffix = np.empty((len(mats) + 1, 4, 4), dtype=complex)
+    prefix[0] = suffix[-1] = np.eye(4)
+    for i, M in enumerate(mats):
+        prefix[i + 1] = M @ prefix[i]
+    for i in range(len(mats) - 1, -1, -1):
+        suffix[i] = suffix[i + 1] @ mats[i]
+    return prefix, suffix
+
+
+def insertion_hits(positions, gate_mats, prefix, suffix, U_target, bound, max_batch=5):
+    """
+    Yield every gate choice (g_1..g_k) at sorted positions that matches U_target.
+
+    With prefix and suffix products of the base circuit, inserting gates
+    g_1..g_k at positions p_1 <= .. <= p_k gives
+        U = suffix[p_k] g_k U(p_{k-1}, p_k) ... g_1 prefix[p_1],
+    where U(a, b) = prefix[b] prefix[a]^dag is the base segment between
+    them.  The last max_batch gates are evaluated as one batched
+    (G^b, 4, 4) product; earlier ones are looped over, so memory stays
+    bounded for deep insertions.  Choices come in lexicographic order.
+    """
+    k, G = len(positions), len(gate_mats)
+    fixed = max(0, k - max_batch)
+    segments = [prefix[b] @ prefix[a].conj().T for a, b in zip(positions, positions[1:])]
+    for head in product(range(G), repeat=fixed):
+        A = prefix[positions[0]][None]
+        for i in range(k):
+            if i:
+                A = segments[i - 1] @ A
+            if i < fixed:
+                A = gate_mats[head[i]] @ A
+            else:
+                # choice index = previous index * G + g, so g_1 is most significant
+                A = np.einsum('gij,cjk->cgik', gate_mats, A).reshape(-1, 4, 4)
+        A = suffix[positions[-1]] @ A
+        for idx in np.flatnonzero((np.abs(A - U_target) <= bound).all(axis=(1, 2))):
+            yield head + tuple(int(c) for c in np.unravel_index(idx, (G,) * (k - fixed)))
+
+
+def insert_gates(positions, choice, gates):
+    """base_circuit_list with gates[choice[i]] inserted at positions[i]"""
+    candidate = base_circuit_list.copy()
+    # Insert from the back so earlier positions (and ties) stay in order
+    for pos, g in reversed(list(zip(positions, choice))):
+        candidate.insert(pos, gates[g])
+    return candidate
+
+
+def insertion_search(U_target, max_extra_gates, atol=1e-2, rtol=1e-5):
+    """
+    Insert extra gates into base_circuit_list until it matches U_target.
+
+    Candidates are evaluated from cached prefix and suffix products of the
+    base circuit (see insertion_hits), so a single insertion costs O(1)
+    instead of a full circuit rebuild.  The match test is
+    np.allclose(U, U_target, atol) as before; returns the first matching
+    gate list (fewest insertions first) or None.
+    """
+    U_target = np.asarray(U_target, dtype=complex)
+    gates = insertion_gates()
+    gate_mats = np.array([gate_matrix(g) for g in gates])
+    prefix, suffix = prefix_suffix_products(base_circuit_list)
+    bound = atol + rtol * np.abs(U_target)
+
+    for n_extra in range(1, max_extra_gates + 1):
+        for positions in combinations_with_replacement(range(len(prefix)), n_extra):
+            for choice in insertion_hits(positions, gate_mats, prefix, suffix, U_target, bound):
+                return insert_gates(positions, choice, gates)
+    return None
+
+
+if __name__ == "__main__":
+    # Meet-in-the-middle over hashed half-length words first: each split is
+    # one table lookup of U_target W^-1 instead of a circuit rebuild
+    candidate = meet_in_the_middle(U_target, max_mitm_depth)
+    if candidate is None:
+        candidate = insertion_search(U_target, max_extra_gates)
+
+    if candidate is not None:
+        print("Found matching circuit!")
+        print(list_to_qasm(candidate))
+    else:
+        print("No matching circuit found with given extra gates and search depth.")
@@ -0,0 +1,330 @@
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import product
+import numpy as np
+
+
+# Work per shard, in candidate circuits
+DEFAULT_SHARD_CANDIDATES = 1 << 22
+MAX_SOLUTIONS = 100
+
+
+def load_target(path=None):
+    """The problem 9 target, or a 4x4 matrix from a .npy file"""
+    if path:
+        return np.load(path)
+    from scriptfor9withquantum import U_target
+    return U_target
+
+
+def t_count(names):
+    return sum(1 for name in names if name in ('t', 'tdg'))
+
+
+def unrank_multiset(n, k, rank):
+    """
+    The rank-th k-tuple of combinations_with_replacement(range(n), k).
+
+    Combinatorial number system: the tuples starting with v that extend
+    a nondecreasing prefix number comb(n - v + r - 1, r) for r places
+    left, so each place is fixed by skipping whole blocks, in O(n k).
+    """
+    combo = []
+    v = 0
+    for i in range(k):
+        r = k - i - 1
+        while True:
+            block = math.comb(n - v + r - 1, r)
+            if rank < block:
+                break
+            rank -= block
+            v += 1
+        combo.append(v)
+    return tuple(combo)
+
+
+def multisets_from(n, k, start, count):
+    """count tuples of combinations_with_replacement(range(n), k) from index start"""
+    if start >= math.comb(n + k - 1, k):
+        return
+    combo = list(unrank_multiset(n, k, start))
+    for _ in range(count):
+        yield tuple(combo)
+        i = k - 1
+        while i >= 0 and combo[i] == n - 1:
+            i -= 1
+        if i < 0:
+            return
+        combo[i:] = [combo[i] + 1] * (k - i)
+
+
+class InsertionSearch:
+    """
+    Shards of scriptfor9withquantum.py's insertion search.
+
+    Shard (k, j) holds the j-th block of sorted position tuples for k
+    inserted gates; blocks are sized so that each shard tests about
+    shard_candidates circuits.
+    """
+
+    kind = 'insertion'
+
+    def __init__(self, max_extra_gates, target=None, shard_candidates=DEFAULT_SHARD_CANDIDATES):
+        import scriptfor9withquantum as s9
+        from two_qubit_words import gate_matrix
+        self.params = {'max_extra_gates': max_extra_gates, 'target': target,
+                       'shard_candidates': shard_candidates}
+        self.s9 = s9
+        self.U_target = np.asarray(load_target(target), dtype=complex)
+        self.bound = 1e-2 + 1e-5 * np.abs(self.U_target)
+        self.gates = s9.insertion_gates()
+        self.gate_mats = np.array([gate_matrix(g) for g in self.gates])
+        self.prefix, self.suffix = s9.prefix_suffix_products(s9.base_circuit_list)
+
+    def _block(self, k):
+        return max(1, self.params['shard_candidates'] // len(self.gates) ** k)
+
+    def shards(self):
+        slots = len(self.prefix)
+        for k in range(1, self.params['max_extra_gates'] + 1):
+            for j in range(math.ceil(math.comb(slots + k - 1, k) / self._block(k))):
+                yield (k, j)
+
+    def level(self, shard):
+        return shard[0]
+
+    def run(self, shard):
+        k, j = shard
+        size = self._block(k)
+        # Start at the shard's first tuple instead of skipping j * size of them
+        combos = multisets_from(len(self.prefix), k, j * size, size)
+        candidates = 0
+        solutions = []
+        for positions in combos:
+            candidates += len(self.gates) ** k
+            for choice in self.s9.insertion_hits(positions, self.gate_mats, self.prefix,
+                                                 self.suffix, self.U_target, self.bound):
+                gates = self.s9.insert_gates(positions, choice, self.gates)
+                solutions.append({
+                    'cost': [k, t_count(g[0] for g in gates)],
+                    'order': [k, j, len(solutions)],
+                    'gates': [list(g) for g in gates],
+                })
+        return candidates, solutions
+
+
+class SweepSearch:
+    """
+    Shards of testproblem9.py's product sweep.
+
+    Every distinct CX pattern the script tries is swept once; shard j
+    covers a block of seq_q0 indices against all seq_q1 and patterns.
+    """
+
+    kind = 'sweep'
+    GATES = ['h', 's', 'sdg', 't', 'tdg']
+    PATTERNS = [[], ['cx_01'], ['cx_10']] + [list(p) for p in product(['cx_01', 'cx_10'], repeat=2)]
+
+    def __init__(self, depth, target=None, tol=0.01, shard_candidates=DEFAULT_SHARD_CANDIDATES):
+        self.params = {'depth': depth, 'target': target, 'tol': tol,
+                       'shard_candidates': shard_candidates}
+        self.target = np.asarray(load_target(target), dtype=complex)
+        self.n = len(self.GATES) ** depth
+        self.rows = max(1, shard_candidates // (self.n * len(self.PATTERNS)))
+
+    def shards(self):
+        for j in range(math.ceil(self.n / self.rows)):
+            yield (j,)
+
+    def level(self, shard):
+        return 0
+
+    def run(self, shard):
+        from batched_sweep import sweep_matches
+        (j,) = shard
+        first, last = j * self.rows, min((j + 1) * self.rows, self.n)
+        depth = self.params['depth']
+        matches = sweep_matches(self.target, self.GATES, depth, self.PATTERNS,
+                                tol=self.params['tol'], rows=(first, last))
+        solutions = []
+        for i0, i1, p in matches:
+            q0 = self._sequence(i0)
+            q1 = self._sequence(i1)
+            solutions.append({
+                'cost': [t_count(q0) + t_count(q1), len(self.PATTERNS[p])],
+                'order': [i0, i1, p],
+                'q0': q0, 'q1': q1, 'cx': self.PATTERNS[p],
+            })
+        return (last - first) * self.n * len(self.PATTERNS), solutions
+
+    def _sequence(self, index):
+        digits = np.unravel_index(index, (len(self.GATES),) * self.params['depth'])
+        return [self.GATES[d] for d in digits]
+
+
+SEARCHES = {'insertion': InsertionSearch, 'sweep': SweepSearch}
+
+# One search object per worker process, built on first use
+_worker_searches = {}
+
+
+def _run_shard(kind, params, shard):
+    key = (kind, json.dumps(params, sort_keys=True))
+    if key not in _worker_searches:
+        _worker_searches[key] = SEARCHES[kind](**params)
+    return shard, _worker_searches[key].run(shard)
+
+
+class Checkpoint:
+    """
+    Completed shards and best solutions of one search, kept in a JSON file.
+
+    Writes go to a temporary file that replaces the old one, so an
+    interruption never leaves a half-written checkpoint.
+    """
+
+    def __init__(self, path, kind, params):
+        self.path = path
+        self.state = {'kind': kind, 'params': params, 'done': [], 'candidates': 0,
+                      'elapsed': 0.0, 'solutions': []}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            if saved['kind'] != kind or saved['params'] != params:
+                raise ValueError(f"{path} belongs to a different search: "
+                                 f"{saved['kind']} {saved['params']}")
+            self.state = saved
+        self.done = {tuple(s) for s in self.state['done']}
+
+    def record(self, shard, candidates, solutions):
+        self.done.add(tuple(shard))
+        self.state['done'].append(list(shard))
+        self.state['candidates'] += candidates
+        best = self.state['solutions'] + solutions
+        best.sort(key=lambda s: (s['cost'], s['order']))
+        self.state['solutions'] = best[:MAX_SOLUTIONS]
+
+    def best_level(self):
+        sols = self.state['solutions']
+        return sols[0]['order'][0] if sols and self.state['kind'] == 'insertion' else None
+
+    def save(self, elapsed):
+        self.state['elapsed'] = elapsed
+        if not self.path:
+            return
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+
+
+def run_search(search, checkpoint_path=None, workers=None, first=False,
+               save_interval=30.0, progress_interval=10.0):
+    """
+    Run a sharded search on a process pool, checkpointing as shards finish.
+
+    Shards already in the checkpoint are skipped, so rerunning the same
+    command resumes.  Shards are submitted lazily with at most 2 per
+    worker in flight.  With first=True shards at a higher level (more
+    inserted gates) than the best solution so far are not started.
+    Returns the checkpoint state.
+    """
+    workers = workers or os.cpu_count() or 1
+    ckpt = Checkpoint(checkpoint_path, search.kind, search.params)
+    start = time.perf_counter() - ckpt.state['elapsed']
+    session_start = time.perf_counter()
+    session_candidates = 0
+    last_save = last_report = time.perf_counter()
+    pending = set()
+    shards = (s for s in search.shards() if s not in ckpt.done)
+
+    def report():
+        rate = session_candidates / max(time.perf_counter() - session_start, 1e-9)
+        sols = ckpt.state['solutions']
+        best = sols[0]['cost'] if sols else None
+        print(f"  [{len(ckpt.done)} shards] {ckpt.state['candidates']:,} candidates, "
+              f"{rate:.3g}/s, {len(sols)} solutions, best cost {best}", flush=True)
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < 2 * workers:
+                shard = next(shards, None)
+                if shard is None:
+                    exhausted = True
+                    break
+                level = ckpt.best_level()
+                if first and level is not None and search.level(shard) > level:
+                    exhausted = True
+                    break
+                pending.add(executor.submit(_run_shard, search.kind, search.params, shard))
+            if not pending:
+                break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                shard, (candidates, solutions) = future.result()
+                ckpt.record(shard, candidates, solutions)
+                session_candidates += candidates
+            now = time.perf_counter()
+            if now - last_save >= save_interval:
+                ckpt.save(now - start)
+                last_save = now
+            if now - last_report >= progress_interval:
+                report()
+                last_report = now
+    except KeyboardInterrupt:
+        print("\n✗ Interrupted; completed shards are saved, rerun to resume", flush=True)
+        executor.shutdown(wait=False, cancel_futures=True)
+        ckpt.save(time.perf_counter() - start)
+        raise
+    executor.shutdown()
+    ckpt.save(time.perf_counter() - start)
+    report()
+    return ckpt.state
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sharded, resumable brute-force search for problem 9")
+    sub = parser.add_subparsers(dest='kind', required=True)
+    ins = sub.add_parser('insertion', help="scriptfor9withquantum.py insertion search")
+    ins.add_argument('--max-extra', type=int, default=4, help="largest number of inserted gates")
+    ins.add_argument('--first', action='store_true', help="stop after the level of the first solution")
+    sw = sub.add_parser('sweep', help="testproblem9.py product sweep")
+    sw.add_argument('--depth', type=int, default=5)
+    sw.add_argument('--tol', type=float, default=0.01)
+    for p in (ins, sw):
+        p.add_argument('--target', help=".npy target (default: problem 9)")
+        p.add_argument('--checkpoint', help="checkpoint JSON (default: <kind>_search.ckpt.json)")
+        p.add_argument('--workers', type=int, help="processes (default: all cores)")
+        p.add_argument('--shard-candidates', type=int, default=DEFAULT_SHARD_CANDIDATES)
+    args = parser.parse_args()
+
+    if args.kind == 'insertion':
+        search = InsertionSearch(args.max_extra, args.target, args.shard_candidates)
+    else:
+        search = SweepSearch(args.depth, args.target, args.tol, args.shard_candidates)
+    path = args.checkpoint or f"{args.kind}_search.ckpt.json"
+
+    print("=" * 80)
+    print(f"SHARDED {args.kind.upper()} SEARCH {search.params}")
+    print(f"Checkpoint: {path}")
+    print("=" * 80)
+    try:
+        state = run_search(search, path, args.workers, first=getattr(args, 'first', False))
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+    if state['solutions']:
+        print(f"\n✓ {len(state['solutions'])} solution(s); best:")
+        best = state['solutions'][0]
+        for key, value in best.items():
+            print(f"  {key}: {value}")
+    else:
+        print("\n✗ No solution in the searched space")
@@ -0,0 +1,283 @@
+import math
+import sys
+import time
+import numpy as np
+from pauli_program import apply_pauli_rotations, pauli_phases, random_states
+from qasm_stream import CNOT_GATES, NON_OPS, iter_qasm_gates
+from tensor_sim import eval_param
+
+
+# Clifford gates outside the tableau's primitive set, as primitive
+# sequences in time order (equal up to global phase)
+CLIFFORD_WORDS = {
+    'sx': ('h', 's', 'h'),
+    'sxdg': ('h', 'sdg', 'h'),
+    'cy': ('sdg@1', 'cx', 's@1'),
+}
+INVERSE = {'s': 'sdg', 'sdg': 's'}
+# Non-Clifford gates as (axis, angle) pushes in time order:
+# exp(-i angle(params) axis), up to global phase
+ROTATIONS = {
+    't': (('Z', lambda p: np.pi / 8),),
+    'tdg': (('Z', lambda p: -np.pi / 8),),
+    'rz': (('Z', lambda p: p[0] / 2),),
+    'p': (('Z', lambda p: p[0] / 2),),
+    'u1': (('Z', lambda p: p[0] / 2),),
+    'rx': (('X', lambda p: p[0] / 2),),
+    'ry': (('Y', lambda p: p[0] / 2),),
+    # u3(theta, phi, lam) = Rz(phi) Ry(theta) Rz(lam)
+    'u3': (('Z', lambda p: p[2] / 2), ('Y', lambda p: p[0] / 2), ('Z', lambda p: p[1] / 2)),
+    'u': (('Z', lambda p: p[2] / 2), ('Y', lambda p: p[0] / 2), ('Z', lambda p: p[1] / 2)),
+    'u2': (('Z', lambda p: p[1] / 2), ('Y', lambda p: np.pi / 4), ('Z', lambda p: p[0] / 2)),
+}
+# Programs up to this many qubits are checked on every basis state
+MAX_EXACT_QUBITS = 10
+SAMPLES = 8
+
+
+class Tableau:
+    """
+    Aaronson-Gottesman tableau of a Clifford C in the Heisenberg picture.
+
+    Row q holds C^dag X_q C and row n + q holds C^dag Z_q C as
+    i^k X^x Z^z, with x and z bit-packed into Python ints (bit j for
+    qubit j).  Appending a gate G to the circuit maps every row to the
+    old rows of G^dag P G, so each gate costs O(1) word-parallel row
+    operations: O(n / 64) words, independent of the circuit so far.
+    """
+
+    def __init__(self, n):
+        self.n = n
+        self.k = [0] * (2 * n)
+        self.x = [1 << q for q in range(n)] + [0] * n
+        self.z = [0] * n + [1 << q for q in range(n)]
+
+    def _multiply(self, a, b, phase=0):
+        """Row a <- i^phase (row a)(row b)"""
+        k, x, z = self.k, self.x, self.z
+        # Z^za X^xb = (-1)^popcount(za & xb) X^xb Z^za
+        k[a] = (k[a] + k[b] + phase + 2 * (z[a] & x[b]).bit_count()) & 3
+        x[a] ^= x[b]
+        z[a] ^= z[b]
+
+    def apply(self, name, qubits):
+        """Append a primitive Clifford gate (h, s, sdg, x, y, z, cx, cz, swap, id)"""
+        n, k = self.n, self.k
+        a = qubits[0]
+        if name == 'h':
+            self.k[a], self.k[n + a] = self.k[n + a], self.k[a]
+            self.x[a], self.x[n + a] = self.x[n + a], self.x[a]
+            self.z[a], self.z[n + a] = self.z[n + a], self.z[a]
+        elif name == 's':
+            # S^dag X S = -Y = i^3 X Z
+            self._multiply(a, n + a, 3)
+        elif name == 'sdg':
+            self._multiply(a, n + a, 1)
+        elif name == 'x':
+            k[n + a] ^= 2
+        elif name == 'z':
+            k[a] ^= 2
+        elif name == 'y':
+            k[a] ^= 2
+            k[n + a] ^= 2
+        elif name in CNOT_GATES:
+            # X_c -> X_c X_t, Z_t -> Z_c Z_t
+            b = qubits[1]
+            self._multiply(a, b)
+            self._multiply(n + b, n + a)
+        elif name == 'cz':
+            b = qubits[1]
+            self._multiply(a, n + b)
+            self._multiply(b, n + a)
+        elif name == 'swap':
+            b = qubits[1]
+            for rows in (self.k, self.x, self.z):
+                rows[a], rows[b] = rows[b], rows[a]
+                rows[n + a], rows[n + b] = rows[n + b], rows[n + a]
+        elif name != 'id':
+            raise ValueError(f"{name!r} is not a primitive Clifford gate")
+
+    def row(self, axis, q):
+        """C^dag P_q C as (pauli string, sign) for axis 'X', 'Y' or 'Z'"""
+        n = self.n
+        if axis == 'Y':
+            # Y = i X Z
+            k = (self.k[q] + self.k[n + q] + 1 + 2 * (self.z[q] & self.x[n + q]).bit_count()) & 3
+            x, z = self.x[q] ^ self.x[n + q], self.z[q] ^ self.z[n + q]
+        else:
+            r = q if axis == 'X' else n + q
+            k, x, z = self.k[r], self.x[r], self.z[r]
+        pauli = ''.join('IXZY'[(x >> j & 1) | (z >> j & 1) << 1] for j in range(n))
+        # X Z = -i Y, so i^k X^x Z^z = i^(k - #Y) (pauli string)
+        sign = 1 - ((k - (x & z).bit_count()) & 3)
+        return pauli, sign
+
+    def is_identity(self):
+        """True if C is the identity up to global phase"""
+        identity = Tableau(self.n)
+        return not any(self.k) and self.x == identity.x and self.z == identity.z
+
+
+def clifford_word(name, qubits):
+    """Primitive (name, qubits) gates for a Clifford gate, or None if it is not one"""
+    if name in CLIFFORD_WORDS:
+        return [(g.split('@')[0], (qubits[int(g.split('@')[1])],) if '@' in g else qubits)
+                for g in CLIFFORD_WORDS[name]]
+    if name in ('h', 's', 'sdg', 'x', 'y', 'z', 'cz', 'swap', 'id') or name in CNOT_GATES:
+        return [(name, qubits)]
+    return None
+
+
+def push_rotations(gates, n, tableau=None):
+    """
+    Collapse the Clifford gates of a circuit into a tableau.
+
+    A rotation exp(-i theta P_q) after a Clifford prefix C equals
+    C exp(-i theta C^dag P_q C), so every non-Clifford gate is pushed to
+    the front as a rotation about a Pauli read off the tableau, and the
+    circuit is C_total prod_j exp(-i theta_j P_j) up to global phase.
+    Returns (tableau of C_total, Pauli program terms in time order,
+    primitive Clifford gates).  Gates without a rule raise ValueError.
+    """
+    tableau = tableau or Tableau(n)
+    terms = []
+    clifford = []
+    for name, params, qubits in gates:
+        if name in NON_OPS:
+            continue
+        word = clifford_word(name, qubits)
+        if word is not None:
+            for gate in word:
+                tableau.apply(*gate)
+            clifford += word
+            continue
+        if name not in ROTATIONS:
+            raise ValueError(f"cannot push {name!r} through the Clifford frame")
+        p = [eval_param(x) if isinstance(x, str) else x for x in params]
+        for axis, angle in ROTATIONS[name]:
+            pauli, sign = tableau.row(axis, qubits[0])
+            terms.append((pauli, sign * angle(p)))
+    return tableau, terms, clifford
+
+
+def inverse_clifford(gates):
+    return [(INVERSE.get(name, name), qubits) for name, qubits in reversed(gates)]
+
+
+def clifford_equivalent(gates_a, gates_b, n):
+    """
+    Exact equivalence up to global phase of two Clifford circuits.
+
+    Runs A followed by B^-1 through one tableau and checks for the identity.
+    """
+    tableau, terms, _ = push_rotations(gates_a, n)
+    _, terms_b, clifford_b = push_rotations(gates_b, n, Tableau(n))
+    if terms or terms_b:
+        raise ValueError("circuits are not Clifford; use verify_equivalent")
+    for gate in inverse_clifford(clifford_b):
+        tableau.apply(*gate)
+    return tableau.is_identity()
+
+
+def merge_rotations(terms):
+    """Pauli program with neighbouring rotations about the same Pauli combined"""
+    merged = []
+    for pauli, theta in terms:
+        if merged and merged[-1][0] == pauli:
+            theta += merged.pop()[1]
+        if abs(math.remainder(theta, 2 * np.pi)) > 1e-12:
+            merged.append((pauli, theta))
+    return merged
+
+
+def apply_pauli(psi, n, pauli, sign=1):
+    """sign * P psi for a (2^n, m) stack of columns"""
+    x, phase = pauli_phases(n, pauli)
+    perm = np.arange(1 << n, dtype=np.int64) ^ x
+    return (sign * phase[perm])[:, None] * psi[perm]
+
+
+def verify_equivalent(gates_a, gates_b, n, samples=None, seed=0, tol=1e-8):
+    """
+    Equivalence up to global phase of two circuits over the same n qubits.
+
+    Both circuits are collapsed to C W with C a tableau and W the pushed
+    Pauli rotations.  Without rotations the tableaux decide exactly.
+    Otherwise A = B iff V = W_A W_B^dag equals D = C_A^dag C_B up to
+    phase, i.e. iff V P V^dag = D P D^dag for every generator P; the
+    right side is a row of the tableau of A then B^-1, so only V is
+    simulated densely, on every basis state up to MAX_EXACT_QUBITS and
+    on samples random states beyond.  Returns a JSON-ready dict.
+    """
+    start = time.perf_counter()
+    tableau, terms_a, clifford_a = push_rotations(gates_a, n)
+    _, terms_b, clifford_b = push_rotations(gates_b, n, Tableau(n))
+    for gate in inverse_clifford(clifford_b):
+        tableau.apply(*gate)
+    report = {'qubits': n, 'clifford_gates': [len(clifford_a), len(clifford_b)],
+              'rotations': [len(terms_a), len(terms_b)]}
+    if not terms_a and not terms_b:
+        report['equivalent'] = tableau.is_identity()
+        report['method'] = 'tableau'
+    else:
+        program = merge_rotations([(pauli, -theta) for pauli, theta in reversed(terms_b)] + terms_a)
+        exact = samples is None and n <= MAX_EXACT_QUBITS
+        psi = np.eye(1 << n, dtype=complex) if exact else random_states(n, samples or SAMPLES, seed)
+        V_psi = apply_pauli_rotations(psi.copy(), n, program)
+        if tableau.is_identity():
+            # V must be a phase: compare against the best-fitting one
+            overlap = np.vdot(psi, V_psi)
+            error = np.abs(V_psi - overlap / abs(overlap) * psi).max() if abs(overlap) > tol else 1.0
+        else:
+            error = 0.0
+            for axis in 'XZ':
+                for q in range(n):
+                    pauli, sign = tableau.row(axis, q)
+                    P = 'I' * q + axis + 'I' * (n - q - 1)
+                    if exact:
+                        # V P = (P V^T)^T, as X_q and Z_q are symmetric
+                        lhs = apply_pauli(V_psi.T, n, P).T
+                    else:
+                        lhs = apply_pauli_rotations(apply_pauli(psi, n, P), n, program)
+                    rhs = apply_pauli(V_psi, n, pauli, sign)
+                    error = max(error, np.abs(lhs - rhs).max())
+        report['equivalent'] = bool(error < tol)
+        report['max_error'] = float(error)
+        report['method'] = ('tableau + pauli program, exact' if exact
+                            else f"tableau + pauli program, {psi.shape[1]} samples")
+    report['seconds'] = time.perf_counter() - start
+    return report
+
+
+def read_qasm_gates(path):
+    """(gates, n, diagnostics) of a QASM file"""
+    registers = {}
+    diagnostics = []
+    with open(path) as f:
+        gates = list(iter_qasm_gates(f, diagnostics, registers))
+    return gates, sum(size for _, size in registers.values()), diagnostics
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check two QASM circuits for equivalence with a stabilizer tableau")
+    parser.add_argument('qasm')
+    parser.add_argument('reference')
+    parser.add_argument('--samples', type=int, help="check the non-Clifford part on this many random states")
+    args = parser.parse_args()
+
+    gates_a, n, diag_a = read_qasm_gates(args.qasm)
+    gates_b, m, diag_b = read_qasm_gates(args.reference)
+    for path, diagnostics in ((args.qasm, diag_a), (args.reference, diag_b)):
+        for lineno, message in diagnostics:
+            print(f"  {path} line {lineno}: {message}")
+    if n != m:
+        print(f"✗ {args.qasm} has {n} qubits but {args.reference} has {m}")
+        sys.exit(1)
+    report = verify_equivalent(gates_a, gates_b, n, args.samples)
+    mark = '✓' if report['equivalent'] else '✗'
+    print(f"{mark} {args.qasm} {'≡' if report['equivalent'] else '≢'} {args.reference} "
+          f"({n} qubits, {report['method']}, {report['seconds'] * 1e3:.2f} ms)")
+    print(f"  Clifford gates: {report['clifford_gates']}, pushed rotations: {report['rotations']}")
+    sys.exit(0 if report['equivalent'] else 1)
@@ -0,0 +1,341 @@
+import ast
+import itertools
+import json
+import operator
+import sys
+import numpy as np
+from two_qubit_words import SINGLE_QUBIT_MATRICES
+from qasm_stream import iter_qasm_gates
+from pauli_program import load_pauli_program, apply_pauli_rotations, random_states
+
+
+_OPS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+    ast.Div: operator.truediv, ast.Pow: operator.pow,
+    ast.USub: operator.neg, ast.UAdd: operator.pos,
+}
+
+
+def eval_param(text):
+    """Evaluate a QASM parameter expression such as '-2*pi/7'"""
+    def ev(node):
+        if isinstance(node, ast.Expression):
+            return ev(node.body)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return node.value
+        if isinstance(node, ast.Name) and node.id in ('pi', 'π'):
+            return np.pi
+        if isinstance(node, ast.BinOp) and type(node.op) in _OPS:
+            return _OPS[type(node.op)](ev(node.left), ev(node.right))
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _OPS:
+            return _OPS[type(node.op)](ev(node.operand))
+        raise ValueError(f"unsupported parameter expression {text!r}")
+    return float(ev(ast.parse(text.strip(), mode='eval')))
+
+
+def single_qubit_matrix(name, params=()):
+    """2x2 matrix for a named single-qubit gate"""
+    if name in SINGLE_QUBIT_MATRICES:
+        return SINGLE_QUBIT_MATRICES[name]
+    p = [eval_param(x) if isinstance(x, str) else x for x in params]
+    if name == 'rz':
+        return np.diag([np.exp(-0.5j * p[0]), np.exp(0.5j * p[0])])
+    if name in ('p', 'u1'):
+        return np.diag([1, np.exp(1j * p[0])])
+    if name == 'rx':
+        c, s = np.cos(p[0] / 2), np.sin(p[0] / 2)
+        return np.array([[c, -1j * s], [-1j * s, c]])
+    if name == 'ry':
+        c, s = np.cos(p[0] / 2), np.sin(p[0] / 2)
+        return np.array([[c, -s], [s, c]], dtype=complex)
+    if name == 'sx':
+        return np.array([[1 + 1j, 1 - 1j], [1 - 1j, 1 + 1j]]) / 2
+    if name == 'sxdg':
+        return np.array([[1 - 1j, 1 + 1j], [1 + 1j, 1 - 1j]]) / 2
+    if name in ('u', 'u3', 'U'):
+        theta, phi, lam = p
+        c, s = np.cos(theta / 2), np.sin(theta / 2)
+        return np.array([[c, -np.exp(1j * lam) * s],
+                         [np.exp(1j * phi) * s, np.exp(1j * (phi + lam)) * c]])
+    if name == 'u2':
+        phi, lam = p
+        return np.array([[1, -np.exp(1j * lam)],
+                         [np.exp(1j * phi), np.exp(1j * (phi + lam))]]) / np.sqrt(2)
+    raise ValueError(f"unsupported single-qubit gate {name!r}")
+
+
+# Controlled gates as control -> 2x2 target matrix name
+CONTROLLED = {'cx': 'x', 'CX': 'x', 'cnot': 'x', 'cy': 'y', 'cz': 'z', 'ch': 'h',
+              'cp': 'p', 'cu1': 'p', 'crx': 'rx', 'cry': 'ry', 'crz': 'rz'}
+
+
+_scratch = {}
+
+
+def _buffers(shape):
+    """Two reusable scratch arrays; fresh 2^n-sized temporaries per gate cost page faults"""
+    if shape not in _scratch:
+        if len(_scratch) > 16:
+            _scratch.clear()
+        _scratch[shape] = (np.empty(shape, dtype=complex), np.empty(shape, dtype=complex))
+    return _scratch[shape]
+
+
+def _apply_1q(v, m, axis=1):
+    """Apply 2x2 m in place along one length-2 axis of the view v"""
+    s0 = [slice(None)] * v.ndim
+    s1 = [slice(None)] * v.ndim
+    s0[axis], s1[axis] = 0, 1
+    x0, x1 = v[tuple(s0)], v[tuple(s1)]
+    if m[0, 1] == 0 and m[1, 0] == 0:
+        if m[0, 0] != 1:
+            x0 *= m[0, 0]
+        if m[1, 1] != 1:
+            x1 *= m[1, 1]
+        return
+    a, b = _buffers(x0.shape)
+    np.copyto(a, x0)
+    if m[0, 0] == m[0, 1] == m[1, 0] == -m[1, 1]:
+        # Hadamard-like: sum and difference, then one scale
+        x0 += x1
+        np.subtract(a, x1, out=x1)
+        if m[0, 0] != 1:
+            x0 *= m[0, 0]
+            x1 *= m[0, 0]
+    elif m[0, 0] == 0 and m[1, 1] == 0:
+        np.multiply(x1, m[0, 1], out=x0)
+        np.multiply(a, m[1, 0], out=x1)
+    else:
+        x0 *= m[0, 0]
+        np.multiply(x1, m[0, 1], out=b)
+        x0 += b
+        x1 *= m[1, 1]
+        np.multiply(a, m[1, 0], out=b)
+        x1 += b
+
+
+def _view_1q(psi, n, q):
+    """View rows of psi as (high bits, qubit q, low bits x batch)"""
+    return psi.reshape(1 << (n - 1 - q), 2, -1)
+
+
+def _view_2q(psi, n, a, b):
+    """View rows of psi with separate axes for qubits a and b"""
+    hi, lo = max(a, b), min(a, b)
+    v = psi.reshape(1 << (n - 1 - hi), 2, 1 << (hi - lo - 1), 2, -1)
+    axis = {hi: 1, lo: 3}
+    return v, axis[a], axis[b]
+
+
+def _slice(ndim, *fixed):
+    """Index tuple fixing (axis, value) pairs and keeping every other axis"""
+    sl = [slice(None)] * ndim
+    for axis, value in fixed:
+        sl[axis] = value
+    return tuple(sl)
+
+
+def apply_gate(psi, n, name, params, qubits):
+    """
+    Apply one gate to psi in place.
+
+    psi has shape (2^n, batch): a statevector (batch 1) or the columns of a
+    unitary being built.  Qubit q is bit q of the row index (Qiskit order).
+    Each gate touches only the axes of its qubits; no 2^n x 2^n matrix is
+    formed.
+    """
+    if name in ('barrier', 'id', 'measure', 'reset'):
+        return psi
+    if len(qubits) == 1:
+        _apply_1q(_view_1q(psi, n, qubits[0]), single_qubit_matrix(name, params))
+        return psi
+    if len(qubits) != 2:
+        raise ValueError(f"unsupported gate {name!r} on {len(qubits)} qubits")
+
+    c, t = qubits
+    v, ac, at = _view_2q(psi, n, c, t)
+    if name == 'swap':
+        x10 = v[_slice(5, (ac, 1), (at, 0))]
+        x01 = v[_slice(5, (ac, 0), (at, 1))]
+        a = x10.copy()
+        x10[...] = x01
+        x01[...] = a
+    elif name == 'rzz':
+        theta = eval_param(params[0]) if isinstance(params[0], str) else params[0]
+        for bc in (0, 1):
+            for bt in (0, 1):
+                v[_slice(5, (ac, bc), (at, bt))] *= np.exp(-0.5j * theta * (1 if bc == bt else -1))
+    elif name in CONTROLLED:
+        # Restrict to control = 1 and apply the target matrix along its axis
+        sub = v[_slice(5, (ac, 1))]
+        _apply_1q(sub, single_qubit_matrix(CONTROLLED[name], params), at - (at > ac))
+    else:
+        raise ValueError(f"unsupported two-qubit gate {name!r}")
+    return psi
+
+
+def identity_tensor(n):
+    """Columns of the 2^n identity, the starting point for a unitary"""
+    return np.eye(1 << n, dtype=complex)
+
+
+def simulate_gates(gates, n, psi=None):
+    """
+    Apply (name, params, qubits) gates to psi (default: identity columns).
+
+    Runs of single-qubit gates on one qubit are multiplied into one 2x2
+    first, so a long 't h s t h ...' string costs a single pass over psi.
+    """
+    if psi is None:
+        psi = identity_tensor(n)
+    pending = {}
+
+    def flush(q):
+        m = pending.pop(q, None)
+        if m is not None:
+            _apply_1q(_view_1q(psi, n, q), m)
+
+    for name, params, qubits in gates:
+        if len(qubits) == 1 and name not in ('barrier', 'measure', 'reset'):
+            q = qubits[0]
+            m = single_qubit_matrix(name, params)
+            pending[q] = m @ pending[q] if q in pending else m
+            continue
+        for q in qubits:
+            flush(q)
+        apply_gate(psi, n, name, params, qubits)
+    for q in list(pending):
+        flush(q)
+    return psi
+
+
+def circuit_gates(qc):
+    """(name, params, qubits) tuples from a Qiskit QuantumCircuit"""
+    for inst in qc.data:
+        params = tuple(float(p) for p in inst.operation.params)
+        yield inst.operation.name, params, tuple(qc.find_bit(q).index for q in inst.qubits)
+
+
+def qasm_unitary(lines, diagnostics=None):
+    """
+    Unitary of a QASM circuit, simulated gate by gate.
+
+    Returns (U, n).  Gates are streamed, so only the 2^n x 2^n result is held.
+    """
+    registers = {}
+    gates = iter_qasm_gates(lines, diagnostics, registers)
+    # the register size is only known once the declarations are read
+    first = next(gates, None)
+    n = sum(size for _, size in registers.values())
+    if first is None:
+        return identity_tensor(n), n
+    return simulate_gates(itertools.chain([first], gates), n), n
+
+
+def trace_fidelity(U, V):
+    """|Tr(V^dag U)| / d, the fidelity printed by QiskitProblem10.py"""
+    return abs(np.vdot(V, U)) / U.shape[0]
+
+
+def process_fidelity(U, V):
+    """|Tr(V^dag U)|^2 / d^2"""
+    return trace_fidelity(U, V) ** 2
+
+
+def pauli_program_residual(U, n, terms):
+    """
+    U_target^dag U for U_target = prod_j exp(-i theta_j P_j).
+
+    The inverse rotations are applied in place to a copy of U, so the
+    target matrix is never formed.
+    """
+    W = np.array(U, dtype=complex)
+    return apply_pauli_rotations(W, n, [(pauli, -theta) for pauli, theta in reversed(terms)])
+
+
+def sampled_pauli_fidelity(gates, n, terms, samples=16, seed=0):
+    """
+    Estimate |Tr(U_target^dag U)| / 2^n from random input states.
+
+    For Haar-random psi, E<psi|A|psi> = Tr(A) / 2^n, so the mean overlap
+    of program(psi) with circuit(psi) estimates the trace fidelity to
+    about 1/sqrt(samples * 2^n).  Only (2^n, samples) arrays are held,
+    which keeps 14+ qubit programs in reach.
+    """
+    psi = random_states(n, samples, seed)
+    phi = simulate_gates(gates, n, psi.copy())
+    apply_pauli_rotations(psi, n, terms)
+    return abs(np.vdot(psi, phi)) / samples
+
+
+def verify_qasm(path, target=None, pauli_program=None, samples=None, reference=None):
+    """
+    Fidelity of a QASM file against a target matrix or a Pauli program.
+
+    target is a 2^n x 2^n array (or .npy path); pauli_program is a JSON
+    path like challenge12.json.  With samples set, a Pauli program is
+    checked on that many random states instead of the full unitary.
+    reference is another QASM file: Clifford gates are collapsed into a
+    stabilizer tableau (stabilizer.py) and only the non-Clifford
+    rotations are simulated, so no 2^n x 2^n unitary is formed.
+    Returns a JSON-ready dict.
+    """
+    diagnostics = []
+    if reference is not None:
+        from stabilizer import read_qasm_gates, verify_equivalent
+        gates, n, diagnostics = read_qasm_gates(path)
+        ref_gates, m, _ = read_qasm_gates(reference)
+        if m != n:
+            raise ValueError(f"{path} has {n} qubits but {reference} has {m}")
+        report = {'file': path, 'qubits': n, 'reference': reference,
+                  'diagnostics': [f"line {l}: {m}" for l, m in diagnostics]}
+        report.update(verify_equivalent(gates, ref_gates, n, samples))
+        return report
+    if samples and pauli_program is not None:
+        registers = {}
+        with open(path) as f:
+            gates = list(iter_qasm_gates(f, diagnostics, registers))
+        n = sum(size for _, size in registers.values())
+    else:
+        with open(path) as f:
+            U, n = qasm_unitary(f, diagnostics)
+    report = {'file': path, 'qubits': n,
+              'diagnostics': [f"line {l}: {m}" for l, m in diagnostics]}
+    if pauli_program is not None and samples:
+        m, terms = load_pauli_program(pauli_program)
+        if m != n:
+            raise ValueError(f"{path} has {n} qubits but {pauli_program} has {m}")
+        fid = sampled_pauli_fidelity(gates, n, terms, samples)
+        report['samples'] = samples
+    elif pauli_program is not None:
+        m, terms = load_pauli_program(pauli_program)
+        if m != n:
+            raise ValueError(f"{path} has {n} qubits but {pauli_program} has {m}")
+        W = pauli_program_residual(U, n, terms)
+        fid = abs(np.trace(W)) / W.shape[0]
+    elif target is not None:
+        if isinstance(target, str):
+            target = np.load(target)
+        fid = trace_fidelity(U, np.asarray(target))
+    else:
+        return report
+    report['trace_fidelity'] = float(fid)
+    report['process_fidelity'] = float(fid ** 2)
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Verify QASM circuits against a target")
+    parser.add_argument('qasm', nargs='+')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--target', help=".npy file with the target unitary")
+    group.add_argument('--pauli', help="Pauli-rotation program JSON (e.g. challenge12.json)")
+    group.add_argument('--reference', help="QASM circuit to check equivalence against via a stabilizer tableau")
+    parser.add_argument('--samples', type=int, help="check --pauli or --reference on this many random states")
+    args = parser.parse_args()
+
+    reports = [verify_qasm(p, args.target, args.pauli, args.samples, args.reference) for p in args.qasm]
+    json.dump(reports, sys.stdout, indent=2)
+    print()
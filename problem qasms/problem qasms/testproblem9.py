@@ -1,7 +1,7 @@
 import numpy as np
 import itertools
-from qiskit import QuantumCircuit
-from qiskit.quantum_info import Operator
+from batched_sweep import sweep_matches
+from two_qubit_words import cost_ordered_search
 
 
 target = np.array([
@@ -19,59 +19,40 @@ single_qubit_gates = ['h','s','sdg','t','tdg']
 two_qubit_gates = ['cx_01','cx_10']  # cx_01: q0->q1, cx_10: q1->q0
 
 
-max_depth = 3  
-max_cx = 1000     e
+max_depth = 5
+max_cx = 1000
+# Cost-ordered search over local-Clifford cosets: T-count first, then CNOTs
+max_bfs_t = 3
+max_bfs_cx = 3
 
-def apply_gate(qc, gate, qubits):
-    if gate == 'h':
-        qc.h(qubits)
-    elif gate == 's':
-        qc.s(qubits)
-    elif gate == 'sdg':
-        qc.sdg(qubits)
-    elif gate == 't':
-        qc.t(qubits)
-    elif gate == 'tdg':
-        qc.tdg(qubits)
-    elif gate == 'cx_01':
-        qc.cx(0,1)
-    elif gate == 'cx_10':
-        qc.cx(1,0)
+
+word, cost, table = cost_ordered_search(target, max_bfs_t, max_bfs_cx)
+print(f"Cosets searched with T <= {max_bfs_t}, CX <= {max_bfs_cx}: {len(table)}")
+if word is not None:
+    print(f"Cheapest match (T-count, CX count) = {cost}:", word)
 
 
 single_sequences = list(itertools.product(single_qubit_gates, repeat=max_depth))
+n_sequences = len(single_sequences)
 total_tests = 0
 matches = []
 
 
-for seq_q0 in single_sequences:
-    for seq_q1 in single_sequences:
-        
-        for num_cx in range(max_cx+1):
-            if num_cx == 0:
-                cx_patterns = [[]]
-            elif num_cx == 1:
-                cx_patterns = [['cx_01'], ['cx_10']]
-            else:
-                cx_patterns = list(itertools.product(two_qubit_gates, repeat=2))
-
-            for cx_seq in cx_patterns:
-                # Build candidate circuit
-                qc = QuantumCircuit(2)
-                for g in seq_q0:
-                    apply_gate(qc, g, 0)
-                for g in seq_q1:
-                    apply_gate(qc, g, 1)
-                for g in cx_seq:
-                    apply_gate(qc, g, None)
-                
-                # Evaluate unitary
-                U = Operator(qc).data
-                total_tests += 1
-
-                # Check if it approximates target
-                if np.allclose(U, target, atol=tol):
-                    matches.append((seq_q0, seq_q1, cx_seq))
+# Patterns repeat from num_cx = 2 on, so larger num_cx would only re-test them
+for num_cx in range(min(max_cx, 2)+1):
+    if num_cx == 0:
+        cx_patterns = [[]]
+    elif num_cx == 1:
+        cx_patterns = [['cx_01'], ['cx_10']]
+    else:
+        cx_patterns = list(itertools.product(two_qubit_gates, repeat=2))
+
+    # Every (seq_q0, seq_q1) pair for these patterns is tested in one batch
+    hits = sweep_matches(target, single_qubit_gates, max_depth, cx_patterns, tol=tol)
+    total_tests += n_sequences * n_sequences * len(cx_patterns)
+
+    for i0, i1, p in hits:
+        matches.append((single_sequences[i0], single_sequences[i1], cx_patterns[p]))
 
 print(f"Total candidates tested: {total_tests}")
 print(f"Matches found: {len(matches)}")
@@ -0,0 +1,446 @@
+import hashlib
+from array import array
+import numpy as np
+
+
+# Single-qubit Clifford+T matrices
+H = np.array([[1, 1], [1, -1]], dtype=complex) / np.sqrt(2)
+S = np.diag([1, 1j])
+SDG = np.diag([1, -1j])
+T = np.diag([1, np.exp(1j * np.pi / 4)])
+TDG = np.diag([1, np.exp(-1j * np.pi / 4)])
+X = np.array([[0, 1], [1, 0]], dtype=complex)
+Y = np.array([[0, -1j], [1j, 0]], dtype=complex)
+Z = np.diag([1, -1]).astype(complex)
+I2 = np.eye(2, dtype=complex)
+
+SINGLE_QUBIT_MATRICES = {
+    'h': H, 's': S, 'sdg': SDG, 't': T, 'tdg': TDG,
+    'x': X, 'y': Y, 'z': Z, 'id': I2,
+}
+
+# Qiskit ordering: q[0] is the least significant bit of the basis index
+CX_01 = np.array([
+    [1, 0, 0, 0],
+    [0, 0, 0, 1],
+    [0, 0, 1, 0],
+    [0, 1, 0, 0],
+], dtype=complex)
+CX_10 = np.array([
+    [1, 0, 0, 0],
+    [0, 1, 0, 0],
+    [0, 0, 0, 1],
+    [0, 0, 1, 0],
+], dtype=complex)
+
+# Default 2-qubit Clifford+T gate set in the ('h', 0) / ('cx', 0, 1) format
+# used by base_circuit_list in scriptfor9withquantum.py
+DEFAULT_GATES = (
+    [(g, q) for q in (0, 1) for g in ('h', 's', 'sdg', 't', 'tdg')]
+    + [('cx', 0, 1), ('cx', 1, 0)]
+)
+
+
+def gate_matrix(g):
+    """4x4 matrix of a gate tuple like ('t', 1) or ('cx', 0, 1)"""
+    if g[0] == 'cx':
+        return CX_01 if (g[1], g[2]) == (0, 1) else CX_10
+    m = SINGLE_QUBIT_MATRICES[g[0]]
+    return np.kron(I2, m) if g[1] == 0 else np.kron(m, I2)
+
+
+def word_unitary(word):
+    """Unitary of a gate list applied left to right"""
+    U = np.eye(4, dtype=complex)
+    for g in word:
+        U = gate_matrix(g) @ U
+    return U
+
+
+def dagger(word):
+    """Inverse of a gate list"""
+    inverse = {'s': 'sdg', 'sdg': 's', 't': 'tdg', 'tdg': 't'}
+    return [(inverse.get(g[0], g[0]),) + tuple(g[1:]) for g in reversed(word)]
+
+
+def canonicalize_phase(Us, threshold=1e-3):
+    """
+    Remove global phase from a stack of matrices.
+
+    Each matrix is rotated so that its first entry (row-major) with
+    magnitude above threshold is real and positive.
+    """
+    Us = np.asarray(Us)
+    flat = Us.reshape(Us.shape[0], -1)
+    anchor = np.argmax(np.abs(flat) > threshold, axis=1)
+    ref = flat[np.arange(flat.shape[0]), anchor]
+    phase = ref / np.abs(ref)
+    return Us * phase.conj()[:, None, None]
+
+
+def canonical_keys(Us, decimals=6):
+    """Hashable keys for a stack of matrices, equal up to global phase and rounding"""
+    C = canonicalize_phase(Us).reshape(len(Us), -1)
+    packed = np.concatenate([C.real, C.imag], axis=1).round(decimals) + 0.0
+    return [row.tobytes() for row in packed]
+
+
+def canonical_key(U, decimals=6):
+    """Key of a single matrix, see canonical_keys"""
+    return canonical_keys(np.asarray(U)[None], decimals)[0]
+
+
+def equal_up_to_phase(U, V, atol=1e-6):
+    """True if U = e^{i phi} V within atol"""
+    overlap = np.trace(V.conj().T @ U)
+    if abs(overlap) < 1e-12:
+        return False
+    phase = overlap / abs(overlap)
+    return np.allclose(U, phase * V, atol=atol)
+
+
+def build_word_table(max_length, gates=DEFAULT_GATES, decimals=6):
+    """
+    Breadth-first table of all distinct unitaries reachable in <= max_length gates.
+
+    Returns (keys, words, unitaries): a dict mapping canonical key -> index,
+    the shortest word for each index, and the (N, 4, 4) stack of unitaries.
+    Every distinct operator is expanded only once per level.
+    """
+    gate_mats = np.array([gate_matrix(g) for g in gates])
+
+    words = [[]]
+    unitaries = [np.eye(4, dtype=complex)]
+    keys = {canonical_key(unitaries[0], decimals): 0}
+    frontier = [0]
+
+    for _ in range(max_length):
+        if not frontier:
+            break
+        F = np.array([unitaries[i] for i in frontier])
+        # candidates[f, g] = gate_g @ U_f
+        candidates = np.einsum('gij,fjk->fgik', gate_mats, F).reshape(-1, 4, 4)
+        new_frontier = []
+        for idx, key in enumerate(canonical_keys(candidates, decimals)):
+            if key in keys:
+                continue
+            f, g = divmod(idx, len(gates))
+            keys[key] = len(words)
+            words.append(words[frontier[f]] + [gates[g]])
+            unitaries.append(candidates[idx])
+            new_frontier.append(len(words) - 1)
+        frontier = new_frontier
+
+    return keys, words, np.array(unitaries)
+
+
+def meet_in_the_middle(U_target, max_length, gates=DEFAULT_GATES,
+                       decimals=6, atol=1e-6, table=None):
+    """
+    Find a shortest word W (up to max_length gates) with U(W) = U_target up to phase.
+
+    A table of words up to ceil(max_length / 2) gates is built once; a
+    split W = W1 + W2 means U_target = U(W2) U(W1), so every table entry W1
+    is matched by one hash lookup of U_target U(W1)^dagger.  All lookups are
+    computed as a single batched product.
+
+    Returns the gate list, or None if nothing within max_length matches.
+    Pass table= to reuse a build_word_table result across targets.
+    """
+    half = (max_length + 1) // 2
+    keys, words, unitaries = table or build_word_table(half, gates, decimals)
+    U_target = np.asarray(U_target, dtype=complex)
+
+    residuals = np.einsum('ij,nkj->nik', U_target, unitaries.conj())
+    best = None
+    for idx, key in enumerate(canonical_keys(residuals, decimals)):
+        match = keys.get(key)
+        if match is None:
+            continue
+        length = len(words[idx]) + len(words[match])
+        if length > max_length or (best is not None and length >= len(best)):
+            continue
+        word = words[idx] + words[match]
+        if equal_up_to_phase(word_unitary(word), U_target, atol):
+            best = word
+    return best
+
+
+# Stored plus queued CostOrderedTable entries (one per local-Clifford coset)
+MAX_TABLE_ENTRIES = 1 << 22
+# Size of the 2-qubit local Clifford group C1 x C1 modulo phase
+LOCAL_CLIFFORDS = 24 * 24
+
+# 2-qubit Paulis, index 4 * p1 + p0 with p in (I, X, Y, Z) as in clifford_t_db.py
+PAULIS = np.array([np.kron(a, b) for a in (I2, X, Y, Z) for b in (I2, X, Y, Z)])
+
+
+# Columns vec(P_j); vec(U P U^dag) = (U (x) U*) vec(P) for row-major vec
+PAULI_BASIS = PAULIS.reshape(16, 16).T
+# Fixed odd weights that order candidate row blocks by one wrapping dot product
+ROW_WEIGHTS = np.random.default_rng(2024).integers(1, 1 << 62, 48) | 1
+
+
+def transfer_matrices(Us):
+    """Stacked 16 x 16 Pauli transfer matrices M[i, j] = Tr(P_i U P_j U^dag) / 4"""
+    superop = (Us[:, :, None, :, None] * Us.conj()[:, None, :, None, :]).reshape(len(Us), 16, 16)
+    return (PAULI_BASIS.conj().T @ superop @ PAULI_BASIS).real / 4
+
+
+def _single_qubit_cliffords():
+    """
+    The 24 single-qubit Cliffords as signed permutations of (I, X, Y, Z).
+
+    Returns (perm, sign) arrays of shape (24, 4): conjugation by the
+    Clifford sends P_p to sign[p] * P_perm[p].
+    """
+    paulis = (I2, X, Y, Z)
+    found = {}
+    frontier = [I2]
+    while frontier:
+        nxt = []
+        for C in frontier:
+            M = np.array([[np.trace(P @ C @ Q @ C.conj().T).real / 2 for Q in paulis] for P in paulis])
+            key = np.rint(M).astype(np.int8).tobytes()
+            if key not in found:
+                found[key] = np.rint(M)
+                nxt += [H @ C, S @ C]
+        frontier = nxt
+    perms = np.array([np.argmax(np.abs(M), axis=1) for M in found.values()])
+    signs = np.array([M[np.arange(4), perm] for M, perm in zip(found.values(), perms)])
+    # row p of the transfer matrix of C U is sign * row perm[p] of U's
+    return perms, signs.astype(np.int64)
+
+
+def gate_cost(g):
+    """(T-count, CNOT count) of a gate tuple"""
+    if g[0] in ('t', 'tdg'):
+        return (1, 0)
+    if g[0] == 'cx':
+        return (0, 1)
+    return (0, 0)
+
+
+class CostOrderedTable:
+    """
+    Distinct 2-qubit unitaries in order of (T-count, CNOT count), one per
+    coset {L U} of the free local Cliffords L.
+
+    Unitaries of equal cost form a bucket, and buckets are filled in
+    lexicographic cost order.  A left local Clifford permutes the rows
+    of the Pauli transfer matrix with signs, freely on the three rows of
+    each qubit, so a fixed order on the row triples of a qubit (24
+    candidates each) picks one canonical matrix per coset; its 128-bit
+    digest is the key.  The successors of a coset are g L U for
+    each costed gate g and one L per class of L with the same g L U
+    coset (L ~ L' iff g L L'^dag g^dag is local), about 30 moves in all,
+    queued for the buckets one T or one CNOT further on.  Words are
+    stored as parent / move index arrays (int32 / int16) and the coset
+    representatives as complex128, so the frontier grows with the number
+    of distinct cosets, a 576th of the distinct unitaries.  Stored plus
+    queued entries are capped at max_entries, past which filling raises
+    ValueError instead of exhausting memory.
+
+    The free (cost (0, 0)) gates must generate the local Clifford group,
+    as H, S and S^dag on both qubits do.
+    """
+
+    def __init__(self, max_t, max_cx, gates=DEFAULT_GATES, decimals=5, max_entries=MAX_TABLE_ENTRIES):
+        self.max_t = max_t
+        self.max_cx = max_cx
+        self.max_entries = max_entries
+        self.gates = list(gates)
+        self.decimals = decimals
+        self.keys = {}
+        self.parent = array('i')
+        self.move = array('h')
+        self.ranges = {}
+        self._chunks = []
+        self._queued = 0
+        self._local = self._local_cliffords()
+        self.moves = self._moves()
+        if len(self.moves) > 32767:
+            raise ValueError("at most 32767 moves fit the int16 move index")
+        self._perms, self._signs = _single_qubit_cliffords()
+        identity = np.eye(4, dtype=complex)[None]
+        empty = np.array([-1], dtype=np.int32)
+        self._pending = {(0, 0): [(identity, empty, empty, self.coset_keys(identity))]}
+
+    def __len__(self):
+        return len(self.parent)
+
+    def _local_cliffords(self):
+        """Phase-canonical key -> (shortest free word, matrix) of every local Clifford"""
+        free = [g for g in self.gates if gate_cost(g) == (0, 0)]
+        local = {canonical_key(np.eye(4)): ((), np.eye(4, dtype=complex))}
+        frontier = list(local.values())
+        while frontier:
+            nxt = []
+            for word, U in frontier:
+                for g in free:
+                    V = gate_matrix(g) @ U
+                    key = canonical_key(V)
+                    if key not in local:
+                        local[key] = entry = (word + (g,), V)
+                        nxt.append(entry)
+            frontier = nxt
+        if len(local) != LOCAL_CLIFFORDS or any(g[0] == 'cx' for g in free):
+            raise ValueError("the free gates must generate exactly the 2-qubit local Cliffords")
+        return local
+
+    def _moves(self):
+        """(gate, local word, matrix of g L) for one L per class of every costed gate"""
+        moves = []
+        elements = list(self._local.values())
+        for g in self.gates:
+            if gate_cost(g) == (0, 0):
+                continue
+            G = gate_matrix(g)
+            # L with g L g^dag local; L ~ L' iff L L'^dag lies in this subgroup
+            subgroup = [L for _, L in elements
+                        if canonical_key(G @ L @ G.conj().T) in self._local]
+            covered = set()
+            for word, L in elements:
+                if canonical_key(L) in covered:
+                    continue
+                covered.update(canonical_key(K @ L) for K in subgroup)
+                moves.append((g, word, G @ L))
+        return moves
+
+    def coset_keys(self, Us):
+        """128-bit digests of the canonical transfer matrices of the cosets {L U}"""
+        R = np.rint(transfer_matrices(np.asarray(Us, dtype=complex)) * 10 ** self.decimals).astype(np.int64)
+        n = len(R)
+        perms, signs = self._perms, self._signs
+        choice = []
+        weights = ROW_WEIGHTS.reshape(3, 16).T
+        for stride in (1, 4):
+            # score the X, Y, Z row triple of qubit q under each of its 24
+            # Cliffords; any fixed order of the (distinct) triples picks the same
+            # member of every coset, and a tie could only split a coset
+            projected = R[:, [stride, 2 * stride, 3 * stride]] @ weights
+            score = (projected[:, perms[:, 1:] - 1, np.arange(3)] * signs[:, 1:]).sum(axis=2)
+            choice.append(np.argmin(score, axis=1))
+        g0, g1 = choice
+        rows = (perms[g1][:, :, None] * 4 + perms[g0][:, None, :]).reshape(n, 16)
+        sign = (signs[g1][:, :, None] * signs[g0][:, None, :]).reshape(n, 16)
+        canonical = R[np.arange(n)[:, None], rows] * sign[:, :, None]
+        return [hashlib.blake2b(row.tobytes(), digest_size=16).digest() for row in canonical]
+
+    def buckets(self):
+        """Fill the table one bucket at a time, yielding (t, cx, start, stop) index ranges"""
+        for t in range(self.max_t + 1):
+            for cx in range(self.max_cx + 1):
+                start = len(self)
+                self._fill(t, cx)
+                self.ranges[(t, cx)] = (start, len(self))
+                yield t, cx, start, len(self)
+
+    def build(self):
+        """Fill every bucket up to (max_t, max_cx); returns self"""
+        for _ in self.buckets():
+            pass
+        return self
+
+    def _check_size(self, extra):
+        if len(self) + self._queued + extra > self.max_entries:
+            raise ValueError(f"cost table would exceed {self.max_entries} entries; "
+                             f"lower max_t / max_cx (now {self.max_t} / {self.max_cx})")
+
+    def _add(self, Us, parents, moves, keys):
+        """Store the unseen cosets of a batch; returns their indices and matrices"""
+        self._check_size(len(keys))
+        new = []
+        for i, key in enumerate(keys):
+            if key not in self.keys:
+                self.keys[key] = len(self.parent)
+                self.parent.append(int(parents[i]))
+                self.move.append(int(moves[i]))
+                new.append(i)
+        stored = Us[new]
+        self._chunks.append(stored)
+        return np.arange(len(self.parent) - len(new), len(self.parent)), stored
+
+    def _successors(self, indices, Us, move_ids, chunk_size=1 << 14):
+        """Unseen cosets of move @ U for every (U, move) pair, with parent and move indices"""
+        mats = np.array([self.moves[m][2] for m in move_ids])
+        batches = []
+        total = 0
+        step = max(1, chunk_size // len(move_ids))
+        for lo in range(0, len(indices), step):
+            products = np.einsum('gij,fjk->fgik', mats, Us[lo:lo + step]).reshape(-1, 4, 4)
+            parents = np.repeat(indices[lo:lo + step], len(move_ids))
+            moves = np.tile(move_ids, len(parents) // len(move_ids))
+            keys = self.coset_keys(products)
+            keep = [i for i, key in enumerate(keys) if key not in self.keys]
+            batches.append((products[keep], parents[keep], moves[keep], [keys[i] for i in keep]))
+            total += len(keep)
+            self._check_size(total)
+        Us, parents, moves = (np.concatenate(x) for x in list(zip(*batches))[:3])
+        return Us, parents, moves, [key for batch in batches for key in batch[3]]
+
+    def _fill(self, t, cx):
+        pending = self._pending.pop((t, cx), [])
+        if not pending:
+            return
+        self._queued -= sum(len(batch[3]) for batch in pending)
+        Us, parents, moves = (np.concatenate(x) for x in list(zip(*pending))[:3])
+        keys = [key for batch in pending for key in batch[3]]
+        del pending
+        indices, Us = self._add(Us, parents, moves, keys)
+        if not len(indices):
+            return
+        by_cost = {}
+        for m, (g, _, _) in enumerate(self.moves):
+            by_cost.setdefault(gate_cost(g), []).append(m)
+        for (dt, dcx), move_ids in by_cost.items():
+            step = (t + dt, cx + dcx)
+            if step[0] > self.max_t or step[1] > self.max_cx:
+                continue
+            batch = self._successors(indices, Us, np.array(move_ids))
+            self._check_size(len(batch[3]))
+            self._queued += len(batch[3])
+            self._pending.setdefault(step, []).append(batch)
+
+    def unitaries(self):
+        """(N, 4, 4) complex128 stack of coset representatives, in table order"""
+        return np.concatenate(self._chunks) if self._chunks else np.empty((0, 4, 4), complex)
+
+    def word(self, index):
+        """Gate list reaching the representative of entry index, applied left to right"""
+        steps = []
+        while self.parent[index] >= 0:
+            g, local, _ = self.moves[self.move[index]]
+            steps.append(list(local) + [g])
+            index = self.parent[index]
+        return [g for step in reversed(steps) for g in step]
+
+    def local_word(self, L):
+        """Free-gate word of a local Clifford (up to phase), or None if L is not one"""
+        entry = self._local.get(canonical_key(L))
+        return None if entry is None else list(entry[0])
+
+
+def cost_ordered_search(U_target, max_t, max_cx, gates=DEFAULT_GATES, decimals=5, atol=1e-5,
+                        max_entries=MAX_TABLE_ENTRIES):
+    """
+    Cheapest word (fewest T, then fewest CNOT) with U(W) = U_target up to phase.
+
+    The table is filled bucket by bucket and the target's coset is looked
+    up after each one, so the search stops at the first cost that reaches
+    it; the word is the coset representative's followed by the local
+    Clifford L = U_target R^dag.  Returns (word, (t_count, cx_count), table),
+    with word None if nothing within max_t / max_cx matches.
+    """
+    U_target = np.asarray(U_target, dtype=complex)
+    table = CostOrderedTable(max_t, max_cx, gates, decimals, max_entries)
+    key = table.coset_keys(U_target[None])[0]
+    for t, cx, start, stop in table.buckets():
+        index = table.keys.get(key)
+        if index is None:
+            continue
+        word = table.word(index)
+        local = table.local_word(U_target @ word_unitary(word).conj().T)
+        if local is not None and equal_up_to_phase(word_unitary(word + local), U_target, atol):
+            return word + local, (t, cx), table
+    return None, None, table